@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+录音分析（能量、音高、节奏）与评分。
+
+本模块只包含纯计算逻辑，不依赖任何 Qt 控件，因此可以安全地在后台线程中运行。
+"""
+
+import numpy as np
+
+from audio.features import TakeFeatures
+from audio.melody import melody_similarity
+from audio.rhythm import pick_onset_peaks, rhythm_similarity
+
+# 定义 librosa 分析参数
+LIBROSA_FRAME_LENGTH = 2048 # 分析窗口长度
+LIBROSA_HOP_LENGTH = 512 # 窗口之间的跳跃长度
+
+# 音量阈值 (根据 float32 数据调整)
+RMS_QUIET_THRESHOLD = 0.005 # 能听见的声音阈值
+RMS_MEDIUM_THRESHOLD = 0.03 # 足够响亮的声音阈值
+RMS_LOUD_THRESHOLD = 0.15   # 非常响亮的声音阈值
+
+# 需要在至少 30% 的帧中检测到音高才算有明显的音高
+PITCH_VOICED_PERCENT_THRESHOLD = 30
+# 有参考旋律时，旋律相似度 (0~1) 至少达到该值才算音调唱对了
+MELODY_SCORE_THRESHOLD = 0.5
+# 有参考节奏时，起始点网格互相关得分 (0~1) 至少达到该值才算有节奏感
+RHYTHM_SCORE_THRESHOLD = 0.55
+# 没有参考节奏时使用的典型发声速率（每秒发声点数量），用于估算所需最小发声点数量
+ONSETS_PER_SECOND = 0.8
+
+# 定义星星奖励数量 (根据表现计算)
+STAR_REWARDS = {
+    "excellent": 3, # 表现优秀 (响亮、有音高、有节奏)
+    "good": 2,      # 表现良好 (至少满足两项指标)
+    "ok": 1,        # 表现一般 (至少满足一项可听见的指标)
+    "poor": 0       # 表现不佳 (非常安静或没有可听见的指标)
+}
+
+
+class AnalysisCancelled(Exception):
+    """分析被取消（例如用户重新录音或切换到下一句）时抛出。"""
+
+
+class AnalysisResult:
+    """
+    一次录音分析的结果。
+
+    属性:
+        rms_energy (float): 录音的 RMS 能量。
+        pitch_detected_percentage (float): 检测到音高的帧数百分比。
+        num_onsets (int): 检测到的发声起始点数量。
+        recorded_duration_sec (float): 录音时长（秒）。
+        is_audible / is_loud_enough / is_very_loud (bool): 音量判断结果。
+        melody_score (float | None): 与原曲乐句参考音高轮廓的相似度 (0~1)，没有参考轮廓时为 None。
+        rhythm_score (float | None): 与原曲乐句起始点网格的互相关得分 (0~1)，没有参考网格时为 None。
+        has_discernible_pitch / has_discernible_rhythm (bool): 音高、节奏判断结果。
+        category (str): 表现类别 ("silent", "excellent", "good", "ok", "poor")。
+        stars (int): 本乐句获得的星星数量。
+        message (str): 反馈文本。
+        character_name (str): 建议显示的角色名称。
+    """
+
+    def __init__(self):
+        self.rms_energy = 0.0
+        self.pitch_detected_percentage = 0.0
+        self.num_onsets = 0
+        self.recorded_duration_sec = 0.0
+        self.is_audible = False
+        self.is_loud_enough = False
+        self.is_very_loud = False
+        self.melody_score = None
+        self.rhythm_score = None
+        self.has_discernible_pitch = False
+        self.has_discernible_rhythm = False
+        self.category = "silent"
+        self.stars = STAR_REWARDS["poor"]
+        self.message = ""
+        self.character_name = 'chase'
+
+
+def empty_result():
+    """没有录到任何音频数据时的分析结果。"""
+    result = AnalysisResult()
+    result.category = "silent"
+    result.stars = STAR_REWARDS["poor"] # 0 星
+    result.message = "哎呀，好像没有听到声音，再靠近麦克风一点试试，或者大声一点唱？你发出声音就很棒！"
+    result.character_name = 'chase' # 鼓励尝试的角色
+    return result
+
+
+def apply_melody_score(result, f0, reference_f0):
+    """
+    有参考音高轮廓时，用旋律相似度修正音高判断：既要有足够的浊音帧，也要唱对旋律走向。
+    """
+    if reference_f0 is None or f0 is None or not result.has_discernible_pitch:
+        return
+    result.melody_score = melody_similarity(f0, reference_f0)
+    if result.melody_score is not None:
+        result.has_discernible_pitch = result.melody_score >= MELODY_SCORE_THRESHOLD
+        print(f"Melody score: {result.melody_score:.2f}, Has pitch: {result.has_discernible_pitch}")
+
+
+def apply_rhythm_score(result, onset_envelope, sr, hop_length, reference_grid=None):
+    """
+    根据起始点包络判断节奏。
+
+    有参考起始点网格时，用 FFT 互相关得分判断；否则沿用原来的规则：
+    检测到的起始点数量是否达到录音时长对应的最小数量。
+    """
+    onset_frames = pick_onset_peaks(onset_envelope, sr, hop_length)
+    result.num_onsets = int(onset_frames.size) # 统计发声起始点数量
+    print(f"检测到 {result.num_onsets} 个声音起始点 (Onsets)")
+
+    if reference_grid is not None:
+        result.rhythm_score = rhythm_similarity(onset_envelope, reference_grid, sr, hop_length)
+    if result.rhythm_score is not None:
+        result.has_discernible_rhythm = result.rhythm_score >= RHYTHM_SCORE_THRESHOLD
+        print(f"Rhythm score: {result.rhythm_score:.2f}, Has rhythm: {result.has_discernible_rhythm}")
+        return
+
+    # 简单检查：对于录音时长，是否检测到合理数量的发声点？
+    min_onsets_required = max(1, int(result.recorded_duration_sec * ONSETS_PER_SECOND)) # 至少需要 1 个发声点
+    # 如果检测到的发声点数量达到或超过最小需求，认为有节奏感
+    result.has_discernible_rhythm = result.num_onsets >= min_onsets_required
+    print(f"Recorded duration: {result.recorded_duration_sec:.2f}s, Min onsets required: {min_onsets_required}, Detected onsets: {result.num_onsets}, Has rhythm: {result.has_discernible_rhythm}")
+
+
+class Scorer:
+    """
+    评分项接口。
+
+    每个评分项在 requires 中声明需要的特征 (见 audio.features)，score() 把判断结果写入 AnalysisResult。
+    所有评分项共用同一个 TakeFeatures，同一个特征只计算一次。
+    """
+    name = None
+    requires = () # 需要的特征名称
+    failure_flag = None # 评分出错时记为 False 的结果属性 (None 表示不捕获错误)
+
+    def applies(self, result):
+        """是否需要运行该评分项 (例如声音听不见时不检测音高和节奏)。"""
+        return True
+
+    def score(self, result, features, reference):
+        """
+        参数:
+            result (AnalysisResult): 要填写的分析结果。
+            features (audio.features.TakeFeatures): 共享特征集合，requires 中的特征已经准备好。
+            reference (dict | None): 原曲乐句的参考特征。
+        """
+        raise NotImplementedError
+
+
+class VolumeScorer(Scorer):
+    """音量 (整体 RMS 能量)。"""
+    name = "volume"
+    requires = ("rms",)
+
+    def score(self, result, features, reference):
+        result.rms_energy = float(features.get("rms"))
+        print(f"录音音频 RMS 能量 (float32): {result.rms_energy}")
+        result.is_audible = result.rms_energy > RMS_QUIET_THRESHOLD # 是否能听见
+        result.is_loud_enough = result.rms_energy > RMS_MEDIUM_THRESHOLD # 是否足够响亮
+        result.is_very_loud = result.rms_energy > RMS_LOUD_THRESHOLD # 是否非常响亮
+
+
+class PitchScorer(Scorer):
+    """音高：浊音帧百分比，有参考轮廓时再比对旋律。"""
+    name = "pitch"
+    requires = ("pitch",)
+    failure_flag = "has_discernible_pitch"
+
+    def applies(self, result):
+        return result.is_audible # 只在声音可听见时尝试检测音高
+
+    def score(self, result, features, reference):
+        f0, voiced_flag = features.get("pitch")
+        total_frames = len(voiced_flag) # 总帧数
+        result.pitch_detected_percentage = float(np.count_nonzero(voiced_flag)) / total_frames * 100 if total_frames > 0 else 0.0 # 计算百分比
+        result.has_discernible_pitch = bool(result.pitch_detected_percentage > PITCH_VOICED_PERCENT_THRESHOLD)
+        print(f"Voiced frames percentage: {result.pitch_detected_percentage:.2f}%")
+        apply_melody_score(result, f0, reference.get("f0") if reference else None)
+
+
+class RhythmScorer(Scorer):
+    """节奏：起始点包络，有参考网格时做互相关比对。"""
+    name = "rhythm"
+    requires = ("onset_envelope",)
+    failure_flag = "has_discernible_rhythm"
+
+    def applies(self, result):
+        return result.is_audible # 只在声音可听见时尝试检测节奏
+
+    def score(self, result, features, reference):
+        apply_rhythm_score(result, features.get("onset_envelope"), features.sr, features.hop_length,
+                           reference.get("onset_grid") if reference else None)
+
+
+# 按顺序运行的评分项 (后面的评分项可以依赖前面的判断结果，例如 is_audible)
+SCORERS = (VolumeScorer(), PitchScorer(), RhythmScorer())
+
+def score_take(features, recorded_duration_sec, reference=None, check_cancelled=None, scorers=SCORERS):
+    """
+    在一组共享特征上运行所有评分项，并计算星星和反馈。
+
+    参数:
+        features (audio.features.TakeFeatures): 本次录音的特征集合。
+        recorded_duration_sec (float): 录音时长（秒）。
+        reference (dict, optional): 原曲乐句的参考特征 ("f0"、"onset_grid")，见 audio.reference。
+        check_cancelled (callable, optional): 在各特征计算前调用，任务过期时抛出 AnalysisCancelled。
+        scorers (tuple, optional): 要运行的评分项。
+
+    返回:
+        AnalysisResult: 分析结果。
+    """
+    result = AnalysisResult()
+    result.recorded_duration_sec = recorded_duration_sec
+
+    for scorer in scorers:
+        if not scorer.applies(result):
+            continue
+        try:
+            features.require(scorer.requires, check_cancelled)
+            scorer.score(result, features, reference)
+        except AnalysisCancelled:
+            raise
+        except Exception as e:
+            if scorer.failure_flag is None:
+                raise
+            print(f"{scorer.name} analysis failed (after audible check): {e}")
+            setattr(result, scorer.failure_flag, False) # 分析失败则认为没有通过该项
+
+    if check_cancelled is not None:
+        check_cancelled()
+    classify_performance(result)
+    return result
+
+
+def analyze_recording(audio_data_np_float32, sr, recorded_duration_sec, is_cancelled=None, pitch_engine=None,
+                      reference=None):
+    """
+    分析录制的音频（能量、音高、节奏）并计算星星和反馈。
+
+    参数:
+        audio_data_np_float32 (np.ndarray): 归一化到 [-1.0, 1.0] 的单声道音频。
+        sr (int): 采样率。
+        recorded_duration_sec (float): 录音时长（秒）。
+        is_cancelled (callable, optional): 返回 True 时中止分析，抛出 AnalysisCancelled。
+        pitch_engine (str, optional): 音高检测引擎名称 ("pyin" / "yin")，默认见 audio.pitch。
+        reference (dict, optional): 原曲乐句的参考特征 ("f0"、"onset_grid")，见 audio.reference。
+
+    返回:
+        AnalysisResult: 分析结果。
+    """
+    def check_cancelled():
+        if is_cancelled is not None and is_cancelled():
+            raise AnalysisCancelled()
+
+    features = TakeFeatures(audio_data_np_float32, sr, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH,
+                            pitch_engine=pitch_engine)
+    return score_take(features, recorded_duration_sec, reference, check_cancelled)
+
+
+def classify_performance(result):
+    """根据音量、音高、节奏判断结果确定表现类别、星星数量、反馈文本和角色。"""
+    is_audible = result.is_audible
+    is_loud_enough = result.is_loud_enough
+    is_very_loud = result.is_very_loud
+    has_discernible_pitch = result.has_discernible_pitch
+    has_discernible_rhythm = result.has_discernible_rhythm
+
+    feedback_message = "你尝试啦！" # 默认基础反馈
+    selected_character_name = 'chase' # 默认角色
+
+    # 根据分析结果确定表现类别
+    if not is_audible:
+         category = "silent"
+         stars_earned_for_phrase = STAR_REWARDS["poor"] # 不可听见 -> 0 星
+    elif is_loud_enough and has_discernible_pitch and has_discernible_rhythm:
+         category = "excellent"
+         stars_earned_for_phrase = STAR_REWARDS["excellent"] # 优秀 -> 3 星
+    elif (is_loud_enough and has_discernible_pitch) or \
+         (is_loud_enough and has_discernible_rhythm) or \
+         (has_discernible_pitch and has_discernible_rhythm and not is_very_loud): # 良好 (至少满足两项指标，且不非常响亮，避免与 Excellent 重叠)
+         category = "good"
+         stars_earned_for_phrase = STAR_REWARDS["good"] # 良好 -> 2 星
+    else: # 可听见，但未达到良好的标准 (可能只满足一项或没有满足，但至少能听到声音)
+         category = "ok"
+         stars_earned_for_phrase = STAR_REWARDS["ok"] # 一般 -> 1 星
+
+    # 根据表现类别和具体指标选择反馈信息和角色
+    if category == "silent":
+         feedback_message = "哎呀，好像没有听到声音，再大声一点试试？我很期待听到你的歌声！"
+         selected_character_name = 'chase' # 鼓励尝试的角色
+    elif category == "excellent":
+         feedback_message = "哇！太棒了！你唱得又响亮、又有音调、还有节奏感！你真是一位小歌星！"
+         selected_character_name = 'marshall' # 自信/有活力的角色
+    elif category == "good":
+         if is_loud_enough and has_discernible_pitch:
+              feedback_message = "声音响亮，旋律也很棒！你唱得真好听！"
+              selected_character_name = 'skye' # 有音乐感/甜美的角色
+         elif is_loud_enough and has_discernible_rhythm:
+              feedback_message = "声音响亮，而且发声很有节奏感！跟着拍子唱太酷啦！"
+              selected_character_name = 'marshall' # 有活力的角色
+         else: # 可听见，有音高有节奏，但不非常响亮
+              feedback_message = "声音小小的，但唱得很有音调和节奏呢！轻轻地唱也很棒！"
+              selected_character_name = 'skye' # 有音乐感/甜美的角色
+    else: # category == "ok"
+         if is_very_loud: # 如果声音非常响亮
+              feedback_message = "哇！你的声音真洪亮！太有活力了！"
+              selected_character_name = 'marshall' # 有活力的角色
+         else: # 不非常响亮，检查其他指标
+             if is_loud_enough or has_discernible_pitch or has_discernible_rhythm:
+                  feedback_message = "你发出声音啦！很棒！我们听到你唱了！" # 基础尝试的反馈
+             else: # 可听见，但没有满足响亮/音高/节奏的阈值
+                  feedback_message = "你尝试啦，很棒！我听到你发出声音了！再大声、再有音调一点点试试看？"
+             selected_character_name = 'chase' # 鼓励尝试的角色
+
+    result.category = category
+    result.stars = stars_earned_for_phrase
+    result.message = feedback_message
+    result.character_name = selected_character_name
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+在后台线程池中运行录音分析，并通过信号把结果送回 GUI 线程。
+"""
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from audio.analysis import AnalysisCancelled
+
+
+class AnalysisSignals(QObject):
+    """分析任务使用的信号 (QRunnable 不是 QObject，不能直接定义信号)。"""
+    finished = pyqtSignal(int, object) # 分析完成 (参数为任务代号、AnalysisResult)
+    failed = pyqtSignal(int, str) # 分析出错 (参数为任务代号、错误信息)
+
+
+class AnalysisTask(QRunnable):
+    """
+    一次录音分析任务。
+
+    参数:
+        generation (int): 提交任务时的代号，用于丢弃过期结果。
+        analyze (callable): 实际执行分析的函数，接受 is_cancelled 回调并返回 AnalysisResult。
+        is_cancelled (callable): 返回 True 表示该任务已过期，应尽快中止。
+    """
+
+    def __init__(self, generation, analyze, is_cancelled):
+        super().__init__()
+        self.generation = generation
+        self._analyze = analyze
+        self._is_cancelled = is_cancelled
+        self.signals = AnalysisSignals()
+
+    def run(self):
+        # 任务在排队期间可能已经过期，直接放弃
+        if self._is_cancelled():
+            return
+        try:
+            result = self._analyze(self._is_cancelled)
+        except AnalysisCancelled:
+            print(f"分析任务 {self.generation} 已取消。")
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.finished.emit(self.generation, result)
+
+
+class AnalysisRunner(QObject):
+    """
+    管理录音分析任务的提交、取消和结果分发。
+
+    每次提交都会生成新的代号；只有最新代号的结果才会通过 result_ready 发出，
+    旧任务要么在检查点被中止，要么结果被直接丢弃。
+    """
+    result_ready = pyqtSignal(object, object) # 最新任务的结果 (参数为提交时的上下文、AnalysisResult)
+    analysis_failed = pyqtSignal(object, str) # 最新任务出错 (参数为提交时的上下文、错误信息)
+
+    def __init__(self, parent=None, max_threads=1):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads) # 分析任务很重，一个线程足够，避免与 GUI 争抢 CPU
+        self._generation = 0
+        self._contexts = {} # 代号 -> 提交时的上下文
+
+    @property
+    def generation(self):
+        """当前（最新）任务代号。"""
+        return self._generation
+
+    def submit(self, analyze, context=None):
+        """
+        提交一个分析任务，并使之前所有未完成的任务过期。
+
+        参数:
+            analyze (callable): 分析函数，签名为 analyze(is_cancelled) -> AnalysisResult。
+            context (object, optional): 随结果一起返回的上下文（例如乐句索引）。
+
+        返回:
+            int: 新任务的代号。
+        """
+        self.cancel()
+        generation = self._generation
+        self._contexts[generation] = context
+
+        task = AnalysisTask(generation, analyze, lambda: self._generation != generation)
+        task.signals.finished.connect(self._on_task_finished)
+        task.signals.failed.connect(self._on_task_failed)
+        self._pool.start(task)
+        return generation
+
+    def cancel(self):
+        """使所有进行中或排队中的任务过期，其结果将被丢弃。"""
+        self._generation += 1
+        self._contexts.clear()
+        self._pool.clear() # 移除尚未开始的任务
+
+    def wait_for_done(self, msecs=-1):
+        """等待线程池中的任务结束（用于关闭窗口时的清理）。"""
+        return self._pool.waitForDone(msecs)
+
+    def _on_task_finished(self, generation, result):
+        if generation != self._generation:
+            print(f"丢弃过期的分析结果 (任务 {generation}，当前 {self._generation})。")
+            return
+        context = self._contexts.pop(generation, None)
+        self.result_ready.emit(context, result)
+
+    def _on_task_failed(self, generation, error_message):
+        if generation != self._generation:
+            return
+        context = self._contexts.pop(generation, None)
+        self.analysis_failed.emit(context, error_message)
+
+
+class BackgroundTask(QRunnable):
+    """在全局线程池中执行一个不需要返回结果的函数（例如预取缓存）。"""
+
+    def __init__(self, func, *args):
+        super().__init__()
+        self._func = func
+        self._args = args
+
+    def run(self):
+        try:
+            self._func(*self._args)
+        except Exception as e:
+            print(f"后台任务执行失败: {e}")
+
+
+def run_in_background(func, *args):
+    """把 func(*args) 提交到 Qt 全局线程池执行。"""
+    QThreadPool.globalInstance().start(BackgroundTask(func, *args))
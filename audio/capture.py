@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+回调模式的麦克风采集。
+
+输入流在进入学习界面时打开并一直保持 (预热)，录音只打开/关闭采集闸门。
+PyAudio 在它自己的音频线程里调用 CallbackCapture 的回调，回调只把样本写入一个
+单生产者/单消费者 (SPSC) 环形缓冲区；GUI 线程定期把缓冲区里的新样本取走，写入录音缓冲区
+并交给增量分析器。界面卡顿 (动画、布局) 时样本暂存在环形缓冲区中，不会丢失；
+缓冲区真的写满时丢弃的样本数和次数会被记录下来，而不是像 exception_on_overflow=False 那样静默忽略。
+
+回调中没有锁：每次打开闸门都创建一个新的 _GateTake 并整体发布，回调每个缓冲区只读取一次当前的闸门，
+过期闸门的样本由消费者跳过 (只移动自己的读取位置)，GUI 线程不会让音频线程等待。
+"""
+
+import threading
+
+import numpy as np
+import pyaudio
+
+RING_BUFFER_SECONDS = 2.0 # 环形缓冲区能暂存的音频时长 (GUI 线程最长可以卡顿这么久而不丢样本)
+
+
+class SampleRingBuffer:
+    """
+    单生产者/单消费者的 int16 环形缓冲区。
+
+    生产者 (音频回调线程) 只调用 write()，消费者 (GUI 线程) 只调用 drain()。
+    读写位置是只增不减的样本计数，各自只由一方修改，因此不需要加锁
+    (CPython 中整数赋值是原子的)。缓冲区写满时丢弃新样本并记为一次溢出。
+
+    参数:
+        capacity (int): 缓冲区容量 (样本数)。
+    """
+
+    def __init__(self, capacity):
+        self._data = np.zeros(int(capacity), dtype=np.int16)
+        self._write_pos = 0 # 累计写入的样本数 (只由生产者修改)
+        self._read_pos = 0 # 累计读出的样本数 (只由消费者修改)
+        self.overruns = 0 # 缓冲区写满的次数 (只由生产者修改)
+        self.dropped_samples = 0 # 因写满而丢弃的样本数 (只由生产者修改)
+
+    @property
+    def capacity(self):
+        """缓冲区容量 (样本数)。"""
+        return self._data.size
+
+    @property
+    def available(self):
+        """等待读出的样本数。"""
+        return self._write_pos - self._read_pos
+
+    @property
+    def write_position(self):
+        """累计写入的样本数。"""
+        return self._write_pos
+
+    def write(self, samples):
+        """
+        写入样本 (生产者调用)。
+
+        返回:
+            int: 实际写入的样本数 (缓冲区空间不足时少于 samples.size)。
+        """
+        capacity = self._data.size
+        count = min(samples.size, capacity - (self._write_pos - self._read_pos))
+        if count < samples.size:
+            self.overruns += 1
+            self.dropped_samples += samples.size - count
+        if count <= 0:
+            return 0
+        start = self._write_pos % capacity
+        first = min(count, capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if count > first: # 绕回缓冲区开头
+            self._data[:count - first] = samples[first:count]
+        self._write_pos += count # 数据写完后才更新位置，消费者不会读到未写完的样本
+        return count
+
+    def drain(self, consumer):
+        """
+        把所有等待读出的样本交给 consumer (消费者调用)。
+
+        consumer 会被调用一到两次 (数据绕回时)，参数是缓冲区内部的只读视图，
+        只在调用期间有效，需要保存时应自行复制。
+
+        返回:
+            int: 读出的样本数。
+        """
+        capacity = self._data.size
+        count = self._write_pos - self._read_pos
+        if count <= 0:
+            return 0
+        start = self._read_pos % capacity
+        first = min(count, capacity - start)
+        consumer(self._data[start:start + first])
+        if count > first:
+            consumer(self._data[:count - first])
+        self._read_pos += count
+        return count
+
+    def discard_until(self, position):
+        """丢弃累计写入位置 position 之前尚未读出的样本 (消费者调用)。"""
+        if position > self._read_pos:
+            self._read_pos = min(position, self._write_pos)
+
+    def reset(self):
+        """清空缓冲区和计数 (只能在生产者停止后调用)。"""
+        self._write_pos = 0
+        self._read_pos = 0
+        self.overruns = 0
+        self.dropped_samples = 0
+
+
+class _GateTake:
+    """
+    一次打开的采集闸门 (一次录音)。
+
+    open_gate() 创建新对象并通过一次属性赋值发布，之后 GUI 线程只设置 stop_time 和 done，
+    回调只填写 start_sample、stop_sample 和 ring_start。计数的基准用来得到本次录音的溢出次数。
+    """
+
+    def __init__(self, start_time, overruns, dropped_samples, input_overflows):
+        self.start_time = start_time # 请求打开闸门的流时间（秒）
+        self.stop_time = None # 请求关闭闸门的流时间（秒）
+        self.done = threading.Event() # 回调已处理到关闭时间 (或闸门被强制关闭)
+        self.start_sample = None # 闸门打开处在样本时钟中的位置 (由回调填写)
+        self.stop_sample = None # 闸门关闭处在样本时钟中的位置 (由回调填写)
+        self.ring_start = None # 回调第一次写入本次样本之前环形缓冲区的写入位置
+        self.base_overruns = overruns
+        self.base_dropped_samples = dropped_samples
+        self.base_input_overflows = input_overflows
+
+
+class CallbackCapture:
+    """
+    用 PyAudio 回调模式采集单声道 int16 音频。
+
+    输入流可以长时间保持打开 (预热)，录音只是打开/关闭一个采集闸门：
+    open_gate() 记下当前的流时间，回调根据每个缓冲区第一个样本的 ADC 时间换算出闸门在
+    缓冲区中的精确样本位置，只把闸门打开期间的样本写入 SampleRingBuffer。
+    因此开始录音不需要等待设备打开，第一个音节也不会被截掉。
+    溢出计数 (overruns、dropped_samples、input_overflows) 都只统计最近一次打开闸门以来的部分。
+
+    参数:
+        audio (pyaudio.PyAudio): PyAudio 实例。
+        rate (int): 采样率。
+        frames_per_buffer (int): 每次回调的帧数。
+        input_device_index (int, optional): 输入设备索引。
+        ring_seconds (float, optional): 环形缓冲区时长（秒）。
+    """
+
+    def __init__(self, audio, rate, frames_per_buffer, input_device_index=None, ring_seconds=RING_BUFFER_SECONDS):
+        self._audio = audio
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.input_device_index = input_device_index
+        self.ring = SampleRingBuffer(int(rate * ring_seconds))
+        self._input_overflows = 0 # 驱动报告的输入溢出次数 (回调来不及被调用时发生，只由回调修改)
+        self._stream = None
+        self._samples_delivered = 0 # 输入流打开以来回调收到的样本总数 (样本时钟)
+        self._take = None # 当前的采集闸门 (_GateTake)，None 表示从未打开
+
+    @property
+    def is_open(self):
+        """输入流是否已打开。"""
+        return self._stream is not None
+
+    @property
+    def is_gate_open(self):
+        """是否正在采集 (闸门已打开且尚未关闭)。"""
+        take = self._take
+        return take is not None and not take.done.is_set()
+
+    @property
+    def overruns(self):
+        """环形缓冲区写满的次数 (GUI 线程长时间没有取走样本)。"""
+        take = self._take
+        return self.ring.overruns - (take.base_overruns if take is not None else 0)
+
+    @property
+    def dropped_samples(self):
+        """因环形缓冲区写满而丢弃的样本数。"""
+        take = self._take
+        return self.ring.dropped_samples - (take.base_dropped_samples if take is not None else 0)
+
+    @property
+    def input_overflows(self):
+        """驱动报告的输入溢出次数。"""
+        take = self._take
+        return self._input_overflows - (take.base_input_overflows if take is not None else 0)
+
+    @property
+    def gate_start_time(self):
+        """最近一次打开闸门的流时间（秒）。"""
+        take = self._take
+        return take.start_time if take is not None else None
+
+    @property
+    def gate_stop_time(self):
+        """最近一次关闭闸门的流时间（秒）。"""
+        take = self._take
+        return take.stop_time if take is not None else None
+
+    @property
+    def start_sample(self):
+        """最近一次闸门打开处在样本时钟中的位置 (回调处理到之前为 None)。"""
+        take = self._take
+        return take.start_sample if take is not None else None
+
+    @property
+    def stop_sample(self):
+        """最近一次闸门关闭处在样本时钟中的位置 (回调处理到之前为 None)。"""
+        take = self._take
+        return take.stop_sample if take is not None else None
+
+    def open(self):
+        """打开输入流并开始接收回调 (闸门保持关闭，失败时抛出 PyAudio 的异常)。"""
+        if self._stream is not None:
+            return
+        self._samples_delivered = 0
+        self._stream = self._audio.open(format=pyaudio.paInt16,
+                                        channels=1,
+                                        rate=self.rate,
+                                        input=True,
+                                        frames_per_buffer=self.frames_per_buffer,
+                                        input_device_index=self.input_device_index,
+                                        stream_callback=self._callback)
+        self._stream.start_stream()
+
+    def close(self):
+        """关闭闸门并释放输入流。环形缓冲区中尚未取走的样本仍然可以 drain()。"""
+        stream = self._stream
+        self._stream = None
+        take = self._take
+        if take is not None:
+            take.done.set()
+        if stream is None:
+            return
+        try:
+            stream.stop_stream()
+        finally:
+            stream.close()
+
+    def open_gate(self):
+        """
+        从当前时刻开始采集。
+
+        返回:
+            float: 闸门打开的流时间（秒）。
+        """
+        if self._stream is None:
+            raise RuntimeError("输入流尚未打开")
+        previous = self._take
+        if previous is not None:
+            previous.done.set()
+        # 整体发布新的闸门，不等待回调；上一次闸门残留在环形缓冲区中的样本由 drain() 跳过
+        take = _GateTake(self._stream.get_time(), self.ring.overruns, self.ring.dropped_samples, self._input_overflows)
+        self._take = take
+        return take.start_time
+
+    def close_gate(self, timeout=None):
+        """
+        在当前时刻停止采集，并等待回调处理完关闭时间之前的样本。
+
+        参数:
+            timeout (float, optional): 最长等待时间（秒），默认为两个回调周期。
+
+        返回:
+            float | None: 闸门关闭的流时间（秒）；闸门没有打开时为 None。
+        """
+        take = self._take
+        if take is None or take.done.is_set():
+            return None
+        take.stop_time = self._stream.get_time() if self._stream is not None else None
+        if take.stop_time is None:
+            take.done.set()
+            return None
+        if timeout is None:
+            timeout = 2.0 * self.frames_per_buffer / self.rate
+        if not take.done.wait(timeout):
+            take.done.set() # 回调没有按时到来 (设备停止?)，直接关闭闸门
+        return take.stop_time
+
+    def drain(self, consumer):
+        """把最近一次闸门采集的样本交给 consumer，见 SampleRingBuffer.drain()。"""
+        take = self._take
+        if take is not None:
+            # 先读写入位置再读 ring_start：ring_start 还没有填写时，这个位置之前的样本都属于过期的闸门
+            write_position = self.ring.write_position
+            ring_start = take.ring_start
+            if ring_start is None:
+                self.ring.discard_until(write_position)
+                return 0
+            self.ring.discard_until(ring_start)
+        return self.ring.drain(consumer)
+
+    def _time_to_offset(self, stream_time, buffer_time, num_samples):
+        """把流时间换算为缓冲区内的样本偏移，限制在 [0, num_samples]。"""
+        offset = int(round((stream_time - buffer_time) * self.rate))
+        return min(max(offset, 0), num_samples)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # 在 PyAudio 的音频线程中运行：只做最少的工作
+        if status & pyaudio.paInputOverflow:
+            self._input_overflows += 1
+        buffer_start = self._samples_delivered
+        self._samples_delivered += frame_count
+        take = self._take # 每个缓冲区只读取一次，之后 open_gate() 发布的新闸门从下一个缓冲区开始生效
+        if take is None or take.done.is_set():
+            return (None, pyaudio.paContinue) # 闸门关闭：丢弃样本，保持设备运行
+        self._write_gated(take, in_data, frame_count, time_info, buffer_start)
+        return (None, pyaudio.paContinue)
+
+    def _write_gated(self, take, in_data, frame_count, time_info, buffer_start):
+        """把缓冲区中位于闸门打开期间的样本写入环形缓冲区 (在回调中调用)。"""
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        # 缓冲区第一个样本的采集时间；部分后端不提供 ADC 时间，用当前时间倒推
+        buffer_time = time_info.get('input_buffer_adc_time') or \
+            time_info.get('current_time', 0.0) - frame_count / self.rate
+
+        begin = 0
+        if take.start_sample is None:
+            begin = self._time_to_offset(take.start_time, buffer_time, samples.size)
+            if begin >= samples.size:
+                return # 闸门在这个缓冲区之后才打开
+            take.ring_start = self.ring.write_position # 在写入之前发布，消费者从这里开始读取
+            take.start_sample = buffer_start + begin
+
+        end = samples.size
+        stop_time = take.stop_time
+        if stop_time is not None:
+            end = max(self._time_to_offset(stop_time, buffer_time, samples.size), begin)
+            if stop_time <= buffer_time + samples.size / self.rate: # 关闭时间落在这个缓冲区之内 (或之前)
+                take.stop_sample = buffer_start + end
+
+        self.ring.write(samples[begin:end])
+        if take.stop_sample is not None:
+            take.done.set()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲音频的解码缓存与乐句 PCM 片段。
+
+每首歌的 audio_full 只解码一次，得到与播放格式一致的交错 int16 PCM (DecodedSong)，
+乐句片段 (PhraseClip) 只是其中 start_time..end_time 的零拷贝视图，交给
+audio.playback.ClipPlayer 推送到音频设备：不需要 seek，播放从片段的第一个样本开始，
+在最后一个样本处结束。最近用过的几首歌保留在按字节数设上限的 LRU 缓存中，
+回到选歌界面再进入同一首歌时不需要重新解码。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from audio.recording import INT16_SCALE
+from audio.wavfile import MappedWav, WavFormatError
+
+CLIP_SAMPLE_RATE = 44100 # 播放片段的采样率 (Hz)
+CLIP_MAX_CHANNELS = 2 # 最多保留的声道数 (多声道文件下混为单声道)
+SONG_CACHE_MAX_BYTES = 160 * 1024 * 1024 # 解码缓存上限 (字节)，约 15 分钟的 44.1kHz 立体声
+
+
+class PhraseClip:
+    """
+    一个乐句的 PCM 片段。
+
+    参数:
+        samples (np.ndarray): 形状为 (帧数, 声道数) 的 int16 数组 (通常是 DecodedSong 的视图)。
+        sample_rate (int): 采样率。
+    """
+
+    def __init__(self, samples, sample_rate):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @property
+    def channels(self):
+        """声道数。"""
+        return self.samples.shape[1]
+
+    @property
+    def num_frames(self):
+        """片段包含的采样帧数 (每帧 channels 个样本)。"""
+        return self.samples.shape[0]
+
+    @property
+    def duration_sec(self):
+        """片段时长（秒）。"""
+        return self.num_frames / self.sample_rate
+
+    @property
+    def pcm(self):
+        """交错的 int16 PCM 数据 (bytes，每次访问复制一次片段本身)。"""
+        return self.samples.tobytes()
+
+
+class DecodedSong:
+    """
+    解码后的整首歌曲。
+
+    参数:
+        samples (np.ndarray): 形状为 (帧数, 声道数) 的 C 连续 int16 数组 (即交错 PCM)。
+        sample_rate (int): 采样率。
+    """
+
+    def __init__(self, samples, sample_rate):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @property
+    def nbytes(self):
+        """占用的堆内存字节数 (内存映射的 WAV 不计入，由操作系统的页缓存管理)。"""
+        return 0 if isinstance(self.samples, np.memmap) else self.samples.nbytes
+
+    @property
+    def duration_sec(self):
+        """歌曲时长（秒）。"""
+        return self.samples.shape[0] / self.sample_rate
+
+    def clip(self, start_time, end_time=None):
+        """
+        返回 start_time..end_time（秒）的片段视图，超出歌曲范围的部分被截掉。
+
+        返回:
+            PhraseClip | None: 片段为空时返回 None。
+        """
+        total = self.samples.shape[0]
+        start = min(max(int(round(start_time * self.sample_rate)), 0), total)
+        end = total if end_time is None else min(max(int(round(end_time * self.sample_rate)), start), total)
+        if end <= start:
+            return None
+        return PhraseClip(self.samples[start:end], self.sample_rate)
+
+
+def decode_song(audio_path, sr=CLIP_SAMPLE_RATE, max_channels=CLIP_MAX_CHANNELS):
+    """
+    把整首歌解码为交错 int16 PCM。
+
+    采样率为 sr、声道数不超过 max_channels 的 16-bit PCM WAV 不需要解码，直接使用内存映射的数据；
+    其他 WAV 只做下混/重采样，其余格式用 librosa 解码。
+
+    返回:
+        DecodedSong
+    """
+    import librosa
+    try:
+        wav = MappedWav(audio_path)
+    except WavFormatError:
+        wav = None
+    if wav is not None and wav.sample_rate == sr and wav.channels <= max_channels:
+        return DecodedSong(wav.frames(), sr)
+    if wav is not None:
+        if wav.channels > max_channels:
+            y = wav.mono()[np.newaxis, :]
+        else:
+            y = np.multiply(wav.frames().T, INT16_SCALE, dtype=np.float32)
+        if wav.sample_rate != sr:
+            y = librosa.resample(y, orig_sr=wav.sample_rate, target_sr=sr)
+    else:
+        y, _ = librosa.load(audio_path, sr=sr, mono=False)
+    y = np.atleast_2d(y) # 单声道文件返回一维数组
+    if y.shape[0] > max_channels:
+        y = librosa.to_mono(y)[np.newaxis, :]
+    samples = np.empty((y.shape[1], y.shape[0]), dtype=np.int16) # (帧, 声道)，即交错排列
+    np.multiply(np.clip(y, -1.0, 1.0).T, 32767.0, out=samples, casting='unsafe')
+    return DecodedSong(samples, sr)
+
+
+class SongAudioCache:
+    """
+    解码后歌曲的 LRU 缓存 (线程安全，可以在后台解码)。
+
+    同一首歌同时被多个线程请求时只解码一次，其他线程等待解码结果。
+
+    参数:
+        max_bytes (int, optional): 缓存的 PCM 数据总量上限（字节），至少保留最近使用的一首。
+        sr (int, optional): 解码采样率。
+    """
+
+    def __init__(self, max_bytes=SONG_CACHE_MAX_BYTES, sr=CLIP_SAMPLE_RATE):
+        self.max_bytes = max_bytes
+        self.sr = sr
+        self._songs = OrderedDict() # 绝对路径 -> DecodedSong，按最近使用排序
+        self._errors = {} # 解码失败的路径 -> 错误信息，避免反复重试
+        self._loading = {} # 正在解码的路径 -> threading.Event
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """当前缓存的 PCM 数据总量（字节）。"""
+        return self._nbytes
+
+    def __contains__(self, audio_path):
+        with self._lock:
+            return os.path.abspath(audio_path) in self._songs
+
+    def peek(self, audio_path):
+        """返回已解码的歌曲 (并标记为最近使用)，没有缓存时返回 None，不会解码。"""
+        if not audio_path:
+            return None
+        key = os.path.abspath(audio_path)
+        with self._lock:
+            song = self._songs.get(key)
+            if song is not None:
+                self._songs.move_to_end(key)
+            return song
+
+    def error(self, audio_path):
+        """返回歌曲解码失败的原因，没有失败时返回空字符串。"""
+        with self._lock:
+            return self._errors.get(os.path.abspath(audio_path), "")
+
+    def get(self, audio_path):
+        """
+        返回解码后的歌曲，必要时解码并缓存 (可能阻塞，应在后台线程中调用)。
+
+        音频不存在或解码失败时返回 None，失败原因见 error()。
+        """
+        key = os.path.abspath(audio_path)
+        with self._lock:
+            song = self._songs.get(key)
+            if song is not None:
+                self._songs.move_to_end(key)
+                return song
+            if key in self._errors:
+                return None
+            done = self._loading.get(key)
+            owner = done is None
+            if owner:
+                done = self._loading[key] = threading.Event()
+
+        if not owner: # 另一个线程正在解码同一首歌
+            done.wait()
+            with self._lock:
+                return self._songs.get(key)
+
+        song, error = None, ""
+        try:
+            if not os.path.exists(key):
+                raise FileNotFoundError(f"音频文件不存在: {key}")
+            song = decode_song(key, self.sr)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            print(f"解码歌曲音频失败 ({audio_path}): {error}")
+
+        with self._lock:
+            if song is None:
+                self._errors[key] = error
+            else:
+                self._songs[key] = song
+                self._nbytes += song.nbytes
+                self._evict()
+            del self._loading[key]
+        done.set()
+        return song
+
+    def clear(self):
+        """清空缓存 (正在进行的解码不受影响)。"""
+        with self._lock:
+            self._songs.clear()
+            self._errors.clear()
+            self._nbytes = 0
+
+    def _evict(self):
+        """淘汰最久未使用的歌曲直到总量不超过上限 (调用方持有锁；至少保留最新的一首)。"""
+        while self._nbytes > self.max_bytes and len(self._songs) > 1:
+            _, song = self._songs.popitem(last=False)
+            self._nbytes -= song.nbytes
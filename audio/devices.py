@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+共享的音频设备服务。
+
+整个应用只初始化一次 PortAudio (在窗口显示之后、在后台线程中进行，枚举设备不会拖慢启动)，
+缓存设备信息，并把麦克风是否可用通知给启动检查和学习界面。
+
+麦克风的插拔通过 QMediaDevices 的通知得知，不需要轮询。每次通知都在缓存的 PortAudio 设备表中
+重新选择默认输入设备 (按系统当前默认麦克风的名称匹配，找不到时使用 PortAudio 自己的默认设备)，
+不重新初始化 PortAudio；默认设备变了时发出 default_input_changed，学习界面据此重新打开输入流。
+
+PortAudio 的设备表只在初始化时生成，所以只有一种情况必须重新初始化：启动时一个输入设备都没有，
+之后才插上麦克风 (设备表里根本没有它)。这时不可能有打开的输入流 (没有可用的设备索引)，
+旧实例先在 GUI 线程中摘下，再在后台释放并重新枚举。
+"""
+
+import threading
+
+import pyaudio
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtMultimedia import QMediaDevices
+
+from audio.analysis_worker import run_in_background
+
+
+class AudioDeviceService(QObject):
+    """
+    PortAudio 实例和输入设备信息的唯一持有者。
+
+    信号:
+        ready: PortAudio 初始化 (或失败) 完成，之后 is_ready 为 True。
+        input_availability_changed(bool): 麦克风可用性发生变化 (包括初始化完成时的第一次通知)。
+        default_input_changed(object): 插拔后默认输入设备变成了另一个设备 (参数为新的设备索引，没有时为 None)。
+    """
+    ready = pyqtSignal()
+    input_availability_changed = pyqtSignal(bool)
+    default_input_changed = pyqtSignal(object)
+    _initialized = pyqtSignal(object, object, object, str) # 后台初始化结果 (PyAudio、默认输入设备信息、输入设备列表、错误信息)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pyaudio = None # PyAudio 实例 (初始化失败时为 None)
+        self._default_input_info = None # 当前使用的默认输入设备信息 (dict)
+        self._portaudio_default_info = None # PortAudio 初始化时报告的默认输入设备 (系统默认设备找不到对应项时使用)
+        self._input_devices = [] # 所有输入设备信息
+        self._error = "" # 初始化失败的原因
+        self._is_ready = False
+        self._starting = False
+        self._has_input = False
+        self._terminated = False
+        self._lock = threading.Lock() # 保护后台初始化与 terminate() 之间的交接
+
+        self._initialized.connect(self._on_initialized) # 跨线程发出，自动排队到 GUI 线程
+        self._media_devices = QMediaDevices(self)
+        self._media_devices.audioInputsChanged.connect(self._on_audio_inputs_changed)
+
+    # --- 缓存的设备信息 ---
+    @property
+    def is_ready(self):
+        """PortAudio 是否已经初始化完成 (无论成功与否)。"""
+        return self._is_ready
+
+    @property
+    def pyaudio(self):
+        """共享的 PyAudio 实例，尚未初始化或初始化失败时为 None。"""
+        return self._pyaudio
+
+    @property
+    def default_input_index(self):
+        """默认输入设备索引，没有麦克风时为 None。"""
+        return self._default_input_info.get('index') if self._default_input_info else None
+
+    @property
+    def default_input_info(self):
+        """默认输入设备信息 (dict)，没有麦克风时为 None。"""
+        return dict(self._default_input_info) if self._default_input_info else None
+
+    @property
+    def input_devices(self):
+        """所有输入设备信息的列表 (PortAudio 初始化时枚举)。"""
+        return list(self._input_devices)
+
+    @property
+    def has_input(self):
+        """当前是否有可用的麦克风。"""
+        return self._has_input
+
+    @property
+    def error(self):
+        """初始化失败的原因 (成功时为空字符串)。"""
+        return self._error
+
+    # --- 生命周期 ---
+    def start(self):
+        """在后台线程中初始化 PortAudio 并枚举设备 (只执行一次)。"""
+        if self._is_ready or self._starting or self._terminated:
+            return
+        self._starting = True
+        run_in_background(self._initialize)
+
+    def terminate(self):
+        """释放 PortAudio (应用退出时调用，之后不能再打开音频流)。"""
+        self._terminated = True
+        with self._lock:
+            audio = self._pyaudio
+            self._pyaudio = None
+            self._default_input_info = self._portaudio_default_info = None
+        if audio is not None:
+            try:
+                audio.terminate()
+                print("PyAudio 资源已释放")
+            except Exception as e:
+                print(f"释放 PyAudio 资源时发生错误: {e}")
+        self._set_has_input(False)
+
+    def _initialize(self):
+        """后台线程：初始化 PortAudio、枚举输入设备。"""
+        audio, default_info, devices, error = None, None, [], ""
+        try:
+            audio = pyaudio.PyAudio()
+            for index in range(audio.get_device_count()):
+                info = audio.get_device_info_by_index(index)
+                if info.get('maxInputChannels', 0) > 0:
+                    devices.append(info)
+            try:
+                default_info = audio.get_default_input_device_info()
+            except (IOError, OSError):
+                default_info = devices[0] if devices else None # 没有默认设备时退而使用第一个输入设备
+        except Exception as e:
+            error = str(e)
+        self._initialized.emit(audio, default_info, devices, error)
+
+    def _reinitialize(self, previous):
+        """
+        后台线程：释放旧的 PortAudio 实例 (已经在 GUI 线程中摘下) 并重新枚举设备。
+
+        PortAudio 只在完全终止后再初始化时才会重新扫描设备。
+        """
+        if previous is not None:
+            previous.terminate()
+        self._initialize()
+
+    def _on_initialized(self, audio, default_info, devices, error):
+        """GUI 线程：保存初始化结果并发出通知。"""
+        if self._terminated:
+            # 初始化完成前应用已经在退出
+            if audio is not None:
+                audio.terminate()
+            return
+        with self._lock:
+            self._pyaudio = audio
+            self._portaudio_default_info = default_info
+            self._input_devices = devices
+            self._error = error
+        self._starting = False
+        default_info = self._select_default_input()
+        with self._lock:
+            self._default_input_info = default_info
+
+        if error:
+            print(f"警告: 初始化音频系统时发生错误: {error}. 录音功能可能无法使用。")
+        elif default_info:
+            print(f"找到默认音频输入设备: {default_info.get('name')} (Index: {default_info.get('index')})")
+        else:
+            print("警告: 未检测到任何音频输入设备 (麦克风)。录音功能将无法使用。")
+
+        first_time = not self._is_ready
+        self._is_ready = True
+        self._set_has_input(self._compute_has_input(), force=first_time)
+        if first_time:
+            self.ready.emit()
+
+    # --- 热插拔 ---
+    def _compute_has_input(self):
+        """PortAudio 有默认输入设备，且系统当前至少有一个麦克风。"""
+        if self._pyaudio is None or self._default_input_info is None:
+            return False
+        return len(QMediaDevices.audioInputs()) > 0
+
+    def _select_default_input(self):
+        """
+        在缓存的 PortAudio 输入设备中选出系统当前的默认麦克风。
+
+        按名称匹配 QMediaDevices 的默认输入设备 (名称相同优先，其次一方包含另一方)；
+        匹配不到时 (名称格式不同或设备不在 PortAudio 的设备表里) 使用 PortAudio 自己的默认设备，
+        它在多数主机 API 上是跟随系统默认设备的虚拟设备。
+        """
+        if not self._input_devices:
+            return self._portaudio_default_info
+        system_default = QMediaDevices.defaultAudioInput()
+        name = system_default.description().casefold() if not system_default.isNull() else ""
+        if name:
+            candidates = [(info.get('name') or "").casefold() for info in self._input_devices]
+            for index, candidate in enumerate(candidates):
+                if candidate == name:
+                    return self._input_devices[index]
+            for index, candidate in enumerate(candidates):
+                if candidate and (candidate in name or name in candidate):
+                    return self._input_devices[index]
+        return self._portaudio_default_info
+
+    def _on_audio_inputs_changed(self):
+        """系统的音频输入设备列表发生变化 (插拔麦克风)：重新选择默认输入设备并通知可用性。"""
+        if not self._is_ready or self._starting or self._terminated:
+            return
+        print(f"音频输入设备发生变化，当前 {len(QMediaDevices.audioInputs())} 个。")
+        if not self._input_devices and QMediaDevices.audioInputs():
+            # 启动时没有任何输入设备，PortAudio 的设备表里没有新插入的麦克风，只能重新初始化。
+            # 没有设备索引就不会有打开的输入流；先摘下旧实例，之后任何人都拿不到它
+            self._starting = True
+            with self._lock:
+                previous = self._pyaudio
+                self._pyaudio = None
+                self._default_input_info = None
+            run_in_background(self._reinitialize, previous)
+            return
+
+        previous_index = self.default_input_index
+        default_info = self._select_default_input()
+        with self._lock:
+            self._default_input_info = default_info
+        if self.default_input_index != previous_index:
+            print(f"默认音频输入设备改为: {default_info.get('name') if default_info else None}")
+            self.default_input_changed.emit(self.default_input_index)
+        self._set_has_input(self._compute_has_input())
+
+    def _set_has_input(self, has_input, force=False):
+        if has_input != self._has_input or force:
+            self._has_input = has_input
+            self.input_availability_changed.emit(has_input)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+一次录音 (或一个参考乐句) 的共享特征。
+
+各个评分项 (音量、音高、节奏……) 只声明自己需要哪些特征，TakeFeatures 按需计算并缓存，
+同一段音频上的分帧、加窗 FFT 等中间结果只算一次，再交给所有用到它的评分项。
+增加新的评分项不会再多一遍对整段音频的处理。
+
+特征之间的依赖关系:
+    samples -> rms
+    samples -> frames -> rms_envelope
+               frames -> stft_magnitude -> log_power_spectrum -> onset_envelope
+               frames + rms_envelope -> pitch
+
+分帧方式与 StreamingAnalyzer 一致 (不居中，最后一个不完整的窗口用 0 补齐)，
+因此批量分析和录音中增量分析得到的特征完全相同。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio.pitch import PitchEngine, get_pitch_engine
+from audio.rhythm import spectral_flux
+
+
+FEATURE_BLOCK_FRAMES = 64 # 逐帧特征按块计算，临时数组 (FFT 结果等) 的大小与录音长度无关
+
+
+def frame_signal(y, frame_length, hop_length):
+    """
+    把音频切成相互重叠的分析帧（只读视图，不复制每一帧）。
+
+    帧从 k * hop_length 处开始；剩余样本不足一帧但超过 frame_length - hop_length 个
+    (或整段音频不足一帧) 时，用 0 补齐成最后一帧 (此时只复制一次音频本身)。
+    """
+    y = np.asarray(y, dtype=np.float32)
+    num_frames = (y.size - frame_length) // hop_length + 1 if y.size >= frame_length else 0
+    tail = y.size - num_frames * hop_length
+    if tail > 0 and (num_frames == 0 or tail > frame_length - hop_length):
+        num_frames += 1
+        padded = np.zeros((num_frames - 1) * hop_length + frame_length, dtype=np.float32)
+        padded[:y.size] = y
+        y = padded
+    if num_frames == 0:
+        return np.zeros((0, frame_length), dtype=np.float32)
+    return sliding_window_view(y, frame_length)[::hop_length][:num_frames]
+
+
+def _blocks(num_frames):
+    """把帧索引切成 FEATURE_BLOCK_FRAMES 大小的区间。"""
+    for start in range(0, num_frames, FEATURE_BLOCK_FRAMES):
+        yield slice(start, min(start + FEATURE_BLOCK_FRAMES, num_frames))
+
+
+def _samples(features):
+    if features.samples is None:
+        raise KeyError("没有原始音频样本，无法计算该特征")
+    return features.samples
+
+
+def _rms(features):
+    samples = features.get("samples")
+    return float(np.sqrt(np.dot(samples, samples) / samples.size)) if samples.size > 0 else 0.0
+
+
+def _frames(features):
+    return frame_signal(features.get("samples"), features.frame_length, features.hop_length)
+
+
+def _rms_envelope(features):
+    frames = features.get("frames")
+    # einsum 逐行求平方和，不生成与所有帧同样大小的临时数组
+    return np.sqrt(np.einsum('ij,ij->i', frames, frames) / features.frame_length)
+
+
+def _window(features):
+    return np.hanning(features.frame_length).astype(np.float32)
+
+
+def _stft_magnitude(features):
+    frames = features.get("frames")
+    window = features.get("window")
+    magnitude = np.empty((frames.shape[0], features.frame_length // 2 + 1), dtype=np.float32)
+    for block in _blocks(frames.shape[0]):
+        magnitude[block] = np.abs(np.fft.rfft(frames[block] * window, axis=1))
+    return magnitude
+
+
+def _log_power_spectrum(features):
+    power = np.square(features.get("stft_magnitude"))
+    np.maximum(power, 1e-10, out=power) # 以下都在同一块数组上原地计算
+    np.log10(power, out=power)
+    power *= 10.0
+    return power
+
+
+def _onset_envelope(features):
+    return spectral_flux(features.get("log_power_spectrum"))
+
+
+def _pitch(features):
+    engine = features.pitch_engine
+    if hasattr(engine, "estimate_frames"):
+        # 可分帧调用的引擎 (YIN) 直接复用共享的分帧和逐帧 RMS
+        frames = features.get("frames")
+        rms_envelope = features.get("rms_envelope")
+        f0 = np.empty(frames.shape[0], dtype=np.float32)
+        voiced = np.empty(frames.shape[0], dtype=bool)
+        for block in _blocks(frames.shape[0]):
+            f0[block], voiced[block] = engine.estimate_frames(frames[block], features.sr, rms_envelope[block])
+        return f0, voiced
+    # pyin 内部自带分帧和 Viterbi 解码，只能交给它处理整段音频
+    return engine.estimate(features.get("samples"), features.sr, features.frame_length, features.hop_length)
+
+
+# 特征名称 -> 计算函数 (计算函数通过 features.get() 取得所依赖的特征)
+FEATURE_PROVIDERS = {
+    "samples": _samples, # 单声道 float32 音频
+    "rms": _rms, # 整体 RMS 能量 (float)
+    "frames": _frames, # (n_frames, frame_length) 分析帧
+    "rms_envelope": _rms_envelope, # 逐帧 RMS
+    "window": _window, # 汉宁窗
+    "stft_magnitude": _stft_magnitude, # 加窗 FFT 幅度谱
+    "log_power_spectrum": _log_power_spectrum, # 对数功率谱 (dB)
+    "onset_envelope": _onset_envelope, # 频谱通量 (发声起始点包络)
+    "pitch": _pitch, # (f0, voiced)：逐帧基频 (清音帧为 nan) 和浊音标记
+}
+
+
+class TakeFeatures:
+    """
+    一段音频的特征集合，每个特征最多计算一次。
+
+    参数:
+        samples (np.ndarray | None): 归一化到 [-1.0, 1.0] 的单声道 float32 音频；
+            增量分析器已经算好所需特征时可以为 None。
+        sr (int): 采样率。
+        frame_length (int): 分析窗口长度。
+        hop_length (int): 窗口跳跃长度。
+        pitch_engine (str | PitchEngine, optional): 音高检测引擎名称或实例。
+        precomputed (dict, optional): 已经算好的特征 (名称 -> 值)。
+    """
+
+    def __init__(self, samples, sr, frame_length, hop_length, pitch_engine=None, precomputed=None):
+        self.samples = np.asarray(samples, dtype=np.float32) if samples is not None else None
+        self.sr = sr
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.pitch_engine = pitch_engine if isinstance(pitch_engine, PitchEngine) else get_pitch_engine(pitch_engine)
+        self._values = dict(precomputed or {})
+        self.compute_counts = {} # 特征名称 -> 实际计算次数 (用于检查共享是否生效)
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def get(self, name):
+        """返回特征值，必要时先计算其依赖。"""
+        if name in self._values:
+            return self._values[name]
+        if name not in FEATURE_PROVIDERS:
+            raise KeyError(f"未知的特征: {name}")
+        value = FEATURE_PROVIDERS[name](self)
+        self._values[name] = value
+        self.compute_counts[name] = self.compute_counts.get(name, 0) + 1
+        return value
+
+    def require(self, names, check_cancelled=None):
+        """
+        依次准备多个特征，返回 名称 -> 值 的字典。
+
+        参数:
+            check_cancelled (callable, optional): 每个特征计算前调用 (任务过期时由它抛出 AnalysisCancelled)。
+        """
+        values = {}
+        for name in names:
+            if check_cancelled is not None:
+                check_cancelled()
+            values[name] = self.get(name)
+        return values
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+旋律（音高轮廓）比对：把孩子的演唱音高轮廓与原曲乐句的参考轮廓做带约束的 DTW 对齐。
+
+孩子通常不会和原唱在同一个调、同一个八度上唱，所以比较前先把两条轮廓都转换成半音并
+减去各自的中位数（移调不变），距离按 12 个半音取模（八度不变）。
+"""
+
+import numpy as np
+
+DTW_BAND_RATIO = 0.15 # Sakoe-Chiba 带宽 (相对于较长序列的长度)
+DTW_BAND_MIN = 8 # 最小带宽 (帧)
+MELODY_TOLERANCE_SEMITONES = 3.0 # 平均偏差达到该值时旋律得分为 0
+MIN_VOICED_FRAMES = 5 # 任一轮廓的浊音帧少于该值时不做比对
+MAX_DTW_FRAMES = 160 # 轮廓超过该长度时先均匀抽取，控制 DTW 的行数
+
+
+def hz_to_semitones(f0):
+    """把基频 (Hz) 转换为以 A4=440Hz 为 0 的半音值，清音帧 (nan) 保持为 nan。"""
+    f0 = np.asarray(f0, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 12.0 * np.log2(f0 / 440.0)
+
+
+def _normalized_voiced_semitones(f0):
+    """取出浊音帧并减去中位数，得到移调不变的半音序列。"""
+    semitones = hz_to_semitones(f0)
+    semitones = semitones[np.isfinite(semitones)]
+    if semitones.size == 0:
+        return semitones
+    return semitones - np.median(semitones)
+
+
+def _decimate(sequence, max_length=MAX_DTW_FRAMES):
+    """把过长的序列均匀抽取到不超过 max_length 个点。"""
+    if sequence.size <= max_length:
+        return sequence
+    indices = np.linspace(0, sequence.size - 1, max_length).round().astype(int)
+    return sequence[indices]
+
+
+def banded_dtw(x, y, band_ratio=DTW_BAND_RATIO, band_min=DTW_BAND_MIN):
+    """
+    带 Sakoe-Chiba 约束的 DTW，返回按路径长度归一化的平均代价。
+
+    局部代价为按 12 个半音取模后的绝对音高差。每一行的递推
+    D[i, j] = c[i, j] + min(D[i-1, j-1], D[i-1, j], D[i, j-1])
+    被改写为一次前缀最小值扫描：记 S 为本行代价的累加和，a[j] = min(D[i-1, j-1], D[i-1, j])，
+    则 D[i, j] = S[j] + min_{k<=j}(a[k] - S[k] + c[i, k])，因此每行只需要常数次 NumPy 运算。
+
+    参数:
+        x, y (np.ndarray): 两条半音序列。
+        band_ratio (float): 带宽占较长序列长度的比例。
+        band_min (int): 最小带宽（帧）。
+
+    返回:
+        float: 平均每步代价（半音）；无法对齐时返回 inf。
+    """
+    n, m = len(x), len(y)
+    if n == 0 or m == 0:
+        return float('inf')
+
+    # 带宽沿归一化对角线展开，允许两条序列长度不同
+    half_width = max(band_min, int(np.ceil(band_ratio * max(n, m))))
+    centers = np.arange(n) * ((m - 1) / (n - 1) if n > 1 else 0.0)
+    lows = np.clip(np.floor(centers).astype(int) - half_width, 0, m - 1)
+    highs = np.clip(np.ceil(centers).astype(int) + half_width + 1, 1, m)
+    lows[0] = 0 # 路径必须从 (0, 0) 开始
+    highs[-1] = m # 并在 (n-1, m-1) 结束
+
+    previous = None # 上一行的累计代价 (长度 m，带外为 inf)
+    for i in range(n):
+        lo, hi = lows[i], highs[i]
+        diff = np.abs(x[i] - y[lo:hi])
+        cost = np.minimum(np.mod(diff, 12.0), 12.0 - np.mod(diff, 12.0)) # 八度不变的距离
+
+        if previous is None:
+            # 第一行只能从左边走过来
+            row_values = np.cumsum(cost)
+        else:
+            # a[j] = min(D[i-1, j-1], D[i-1, j])
+            up = previous[lo:hi]
+            diagonal = np.full(hi - lo, np.inf)
+            if lo > 0:
+                diagonal[0] = previous[lo - 1]
+            diagonal[1:] = previous[lo:hi - 1]
+            entry = np.minimum(up, diagonal)
+            cumulative = np.cumsum(cost)
+            row_values = cumulative + np.minimum.accumulate(entry - cumulative + cost)
+
+        current = np.full(m, np.inf)
+        current[lo:hi] = row_values
+        previous = current
+
+    total = previous[m - 1]
+    if not np.isfinite(total):
+        return float('inf')
+    return float(2.0 * total / (n + m))
+
+
+def melody_similarity(f0, reference_f0):
+    """
+    计算演唱音高轮廓与参考轮廓的旋律相似度。
+
+    参数:
+        f0 (np.ndarray): 演唱的逐帧基频 (Hz，清音帧为 nan)。
+        reference_f0 (np.ndarray): 原曲乐句的逐帧基频。
+
+    返回:
+        float | None: 0~1 的得分 (1 表示完全吻合)；任一轮廓浊音帧太少时返回 None。
+    """
+    sung = _normalized_voiced_semitones(f0)
+    reference = _normalized_voiced_semitones(reference_f0)
+    if sung.size < MIN_VOICED_FRAMES or reference.size < MIN_VOICED_FRAMES:
+        return None
+    sung = _decimate(sung)
+    reference = _decimate(reference)
+    average_cost = banded_dtw(sung, reference)
+    if not np.isfinite(average_cost):
+        return 0.0
+    return float(np.clip(1.0 - average_cost / MELODY_TOLERANCE_SEMITONES, 0.0, 1.0))
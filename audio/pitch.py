@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+音高检测引擎。
+
+提供统一的 PitchEngine 接口和两个实现：
+    - "pyin": librosa.pyin，概率 YIN，精确但很慢（逐帧 Viterbi 解码）。
+    - "yin":  纯 NumPy 的向量化 YIN，用 FFT 一次性计算所有帧的差分函数，速度快一到两个数量级。
+
+评分只用到浊音帧百分比，两者在这一指标上的差异可以用 tools/bench_pitch.py 对比。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 音高检测范围，与 librosa.note_to_hz('C2') / librosa.note_to_hz('C6') 一致
+PITCH_FMIN = 65.40639132514966 # C2 (Hz)
+PITCH_FMAX = 1046.5022612023945 # C6 (Hz)
+YIN_THRESHOLD = 0.25 # 累积均值归一化差分函数低于此值认为该帧为浊音
+VOICED_FRAME_RMS_MIN = 0.002 # 帧能量低于此值直接认为是静音帧，不做音高判断
+
+# 默认的音高检测引擎：整段分析、录音中的增量分析和原曲参考特征都通过 get_pitch_engine() 使用同一个配置
+DEFAULT_PITCH_ENGINE = "yin"
+
+
+def yin_frames(frames, sr, fmin=PITCH_FMIN, fmax=PITCH_FMAX, threshold=YIN_THRESHOLD):
+    """
+    对一组分析帧做向量化的 YIN 音高估计。
+
+    参数:
+        frames (np.ndarray): 形状为 (n_frames, frame_length) 的 float32 数组。
+        sr (int): 采样率。
+        fmin, fmax (float): 音高检测范围 (Hz)。
+        threshold (float): 浊音判断阈值。
+
+    返回:
+        (f0, voiced): f0 为每帧基频 (Hz，清音帧为 nan)，voiced 为布尔数组。
+    """
+    n_frames, frame_length = frames.shape
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=bool)
+
+    tau_min = max(1, int(sr // fmax))
+    tau_max = min(frame_length // 2, int(np.ceil(sr / fmin)))
+    window = frame_length - tau_max # 参与差分的样本数
+
+    # 自相关 r(tau) = sum_j x[j] * x[j + tau]，用 FFT 一次性算出所有帧
+    n_fft = 1 << int(np.ceil(np.log2(frame_length + window)))
+    spec_full = np.fft.rfft(frames, n=n_fft, axis=1)
+    spec_head = np.fft.rfft(frames[:, :window], n=n_fft, axis=1)
+    acf = np.fft.irfft(np.conj(spec_head) * spec_full, n=n_fft, axis=1)[:, :tau_max + 1]
+
+    # 能量项 E(tau) = sum_{j=tau}^{tau+W-1} x[j]^2，用累加和计算
+    energy_cumsum = np.concatenate(
+        [np.zeros((n_frames, 1), dtype=np.float64), np.cumsum(np.square(frames, dtype=np.float64), axis=1)], axis=1)
+    taus = np.arange(tau_max + 1)
+    energy = energy_cumsum[:, taus + window] - energy_cumsum[:, taus]
+
+    # 差分函数 d(tau) 与累积均值归一化差分函数 (CMNDF)
+    diff = energy[:, :1] + energy - 2.0 * acf
+    np.maximum(diff, 0.0, out=diff)
+    cumulative = np.cumsum(diff[:, 1:], axis=1)
+    cmnd = np.ones_like(diff)
+    cmnd[:, 1:] = diff[:, 1:] * taus[1:] / np.maximum(cumulative, 1e-12)
+
+    search = cmnd[:, tau_min:tau_max + 1]
+    # 第一个低于阈值的 tau（找不到时取全局最小值）
+    below = search < threshold
+    has_below = below.any(axis=1)
+    first_below = np.argmax(below, axis=1)
+    best = np.where(has_below, first_below, np.argmin(search, axis=1))
+    # 从第一个低于阈值的位置继续下降到局部最小值
+    rows = np.arange(n_frames)
+    for _ in range(search.shape[1]):
+        nxt = np.minimum(best + 1, search.shape[1] - 1)
+        step = has_below & (search[rows, nxt] < search[rows, best])
+        if not step.any():
+            break
+        best = np.where(step, nxt, best)
+
+    voiced = has_below
+    f0 = np.where(voiced, sr / (best + tau_min).astype(np.float64), np.nan).astype(np.float32)
+    return f0, voiced
+
+
+class PitchEngine:
+    """
+    音高检测引擎接口。
+
+    子类实现 estimate()，返回每帧的基频和浊音标记。可以逐帧调用的引擎 (YIN) 另外提供
+    estimate_frames()，增量分析器在录音过程中逐块使用它；没有这个方法的引擎 (pyin) 只能分析整段音频。
+    """
+    name = None
+
+    def estimate(self, y, sr, frame_length, hop_length):
+        """
+        估计整段音频的逐帧音高。
+
+        参数:
+            y (np.ndarray): 归一化到 [-1.0, 1.0] 的单声道 float32 音频。
+            sr (int): 采样率。
+            frame_length (int): 分析窗口长度。
+            hop_length (int): 窗口跳跃长度。
+
+        返回:
+            (f0, voiced_flag): f0 为每帧基频 (Hz，清音帧为 nan)，voiced_flag 为布尔数组。
+        """
+        raise NotImplementedError
+
+    def voiced_percentage(self, y, sr, frame_length, hop_length):
+        """返回检测到音高的帧数百分比。"""
+        _, voiced_flag = self.estimate(y, sr, frame_length, hop_length)
+        return float(np.count_nonzero(voiced_flag)) / len(voiced_flag) * 100 if len(voiced_flag) > 0 else 0.0
+
+
+class PyinPitchEngine(PitchEngine):
+    """librosa.pyin 后端（原有实现）。"""
+    name = "pyin"
+
+    def estimate(self, y, sr, frame_length, hop_length):
+        import librosa
+        f0, voiced_flag, _ = librosa.pyin(
+            y=y,
+            fmin=PITCH_FMIN, # 最小检测频率 (低音 C)
+            fmax=PITCH_FMAX, # 最大检测频率 (高音 C)
+            sr=sr, # 采样率
+            frame_length=frame_length, # 分析窗口长度
+            hop_length=hop_length # 窗口跳跃长度
+        )
+        return f0, voiced_flag
+
+
+class YinPitchEngine(PitchEngine):
+    """
+    向量化 NumPy YIN 后端。
+
+    与 librosa.pyin 一样使用居中分帧 (两端各补 frame_length // 2 个样本)，帧数与 pyin 相同，
+    便于逐帧比较。
+    """
+    name = "yin"
+
+    def __init__(self, threshold=YIN_THRESHOLD, rms_min=VOICED_FRAME_RMS_MIN):
+        self.threshold = threshold
+        self.rms_min = rms_min
+
+    def estimate_frames(self, frames, sr, frame_rms=None):
+        """
+        对已经分好的帧做音高估计（供增量分析器和特征流水线调用）。
+
+        参数:
+            frame_rms (np.ndarray, optional): 已经算好的逐帧 RMS，没有时在这里计算。
+        """
+        f0, voiced = yin_frames(frames, sr, threshold=self.threshold)
+        if frame_rms is None:
+            frame_rms = np.sqrt(np.mean(np.square(frames), axis=1))
+        voiced &= frame_rms > self.rms_min # 静音帧不算浊音
+        f0[~voiced] = np.nan
+        return f0, voiced
+
+    def estimate(self, y, sr, frame_length, hop_length):
+        y = np.asarray(y, dtype=np.float32)
+        padded = np.pad(y, frame_length // 2, mode='constant')
+        if padded.size < frame_length:
+            padded = np.pad(padded, (0, frame_length - padded.size), mode='constant')
+        frames = sliding_window_view(padded, frame_length)[::hop_length]
+        return self.estimate_frames(frames, sr)
+
+
+# 可用的音高检测引擎 (名称 -> 类)
+PITCH_ENGINES = {
+    PyinPitchEngine.name: PyinPitchEngine,
+    YinPitchEngine.name: YinPitchEngine,
+}
+
+
+def get_pitch_engine(name=None):
+    """
+    按名称创建音高检测引擎。
+
+    参数:
+        name (str, optional): "pyin" 或 "yin"，默认使用 DEFAULT_PITCH_ENGINE。
+    """
+    name = name or DEFAULT_PITCH_ENGINE
+    if name not in PITCH_ENGINES:
+        raise ValueError(f"未知的音高检测引擎: {name} (可选: {', '.join(PITCH_ENGINES)})")
+    return PITCH_ENGINES[name]()
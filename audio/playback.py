@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+用 QAudioSink 播放乐句 PCM 片段。
+
+QMediaPlayer 的 setPosition() 需要 seek (延迟不固定)，乐句结束又只能靠 positionChanged
+通知来停止 (粒度几十毫秒)。ClipPlayer 直接把已解码的片段 (audio.clips.PhraseClip)
+推送给音频设备：设备只会收到乐句本身的样本，播放从第一个样本开始，数据用完 (设备进入空闲状态)
+即在最后一个样本处结束。
+"""
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QObject, pyqtSignal
+from PyQt6.QtMultimedia import QAudio, QAudioFormat, QAudioSink, QMediaDevices
+
+
+class ClipPlayer(QObject):
+    """
+    乐句片段播放器。
+
+    信号:
+        stopped: 播放结束 (片段播完、调用 stop() 或设备出错)，每次 play() 只发出一次。
+
+    参数:
+        device (QAudioDevice, optional): 输出设备，默认使用系统默认输出设备。
+    """
+    stopped = pyqtSignal()
+
+    def __init__(self, device=None, parent=None):
+        super().__init__(parent)
+        self._device = device if device is not None else QMediaDevices.defaultAudioOutput()
+        self._sink = None
+        self._format_key = None # 当前 QAudioSink 的 (采样率, 声道数)，格式不变时复用
+        self._buffer = None # 正在播放的片段数据
+        self._playing = False
+
+    @property
+    def is_playing(self):
+        """是否正在播放片段。"""
+        return self._playing
+
+    def play(self, clip):
+        """
+        从头播放片段 (会先停止正在播放的片段)。
+
+        返回:
+            bool: 设备不支持片段格式或没有输出设备时返回 False，调用方应退回其他播放方式。
+        """
+        self.stop()
+        if clip is None or self._device is None or self._device.isNull():
+            return False
+        if not self._ensure_sink(clip.sample_rate, clip.channels):
+            return False
+
+        self._buffer = QBuffer(self)
+        self._buffer.setData(QByteArray(clip.pcm))
+        self._buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        self._playing = True
+        self._sink.start(self._buffer) # 拉取模式：设备按需读取，读完即进入空闲状态
+        if self._sink.error() != QAudio.Error.NoError:
+            print(f"片段播放启动失败: {self._sink.error()}")
+            self._finish(notify=False)
+            return False
+        return True
+
+    def stop(self):
+        """停止播放 (没有在播放时不做任何事)。"""
+        if self._playing:
+            self._sink.stop() # 通常会同步触发 StoppedState，由 _on_state_changed 收尾
+            if self._playing:
+                self._finish()
+
+    def _ensure_sink(self, sample_rate, channels):
+        """按片段格式创建 (或复用) QAudioSink。"""
+        if self._sink is not None and self._format_key == (sample_rate, channels):
+            return True
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(sample_rate)
+        audio_format.setChannelCount(channels)
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        if not self._device.isFormatSupported(audio_format):
+            print(f"输出设备不支持 {sample_rate}Hz/{channels} 声道 int16 播放")
+            return False
+        if self._sink is not None:
+            self._sink.deleteLater()
+        self._sink = QAudioSink(self._device, audio_format, self)
+        self._sink.stateChanged.connect(self._on_state_changed)
+        self._format_key = (sample_rate, channels)
+        return True
+
+    def _on_state_changed(self, state):
+        if not self._playing:
+            return
+        if state == QAudio.State.IdleState:
+            # 片段数据已全部送出且设备缓冲区已播完
+            self.stop()
+        elif state == QAudio.State.StoppedState:
+            if self._sink.error() not in (QAudio.Error.NoError, QAudio.Error.UnderrunError):
+                print(f"片段播放出错: {self._sink.error()}")
+            self._finish()
+
+    def _finish(self, notify=True):
+        self._playing = False
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer.deleteLater()
+            self._buffer = None
+        if notify:
+            self.stopped.emit()
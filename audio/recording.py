@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+录音缓冲区。
+
+录音时每个音频块直接写入一块预先分配好的 int16 数组 (大小按最长录音时长计算)，
+分析时拿到的是这块数组的零拷贝视图，int16 -> float32 的转换写入可复用的临时缓冲区，
+避免 "bytes 列表 -> join -> frombuffer -> astype -> 除法" 这一串整段音频的复制。
+"""
+
+import numpy as np
+
+INT16_SCALE = 1.0 / 32768.0 # int16 -> [-1.0, 1.0]
+
+
+class RecordingBuffer:
+    """
+    预分配的单声道 int16 录音缓冲区，可在多次录音之间复用。
+
+    参数:
+        max_samples (int): 最多能保存的样本数 (最长录音时长 * 采样率)。
+        sr (int): 采样率，用于换算时长。
+
+    注意:
+        view() / to_float32() 返回的数组与缓冲区共享内存，下一次 reset() 之后的写入会覆盖它们。
+        使用方需要保证旧数据在新录音开始写入前已经用完 (或者结果会被丢弃)。
+    """
+
+    def __init__(self, max_samples, sr):
+        self.sr = sr
+        self._data = np.zeros(int(max_samples), dtype=np.int16)
+        self._scratch = None # float32 临时缓冲区 (第一次转换时分配，之后复用)
+        self._length = 0
+
+    @property
+    def capacity(self):
+        """缓冲区能保存的样本数。"""
+        return self._data.size
+
+    @property
+    def num_samples(self):
+        """已写入的样本数。"""
+        return self._length
+
+    @property
+    def duration_sec(self):
+        """已写入音频的时长（秒）。"""
+        return self._length / self.sr
+
+    @property
+    def is_full(self):
+        """是否已经写满 (达到最长录音时长)。"""
+        return self._length >= self._data.size
+
+    def reset(self):
+        """开始新的一次录音 (不释放内存)。"""
+        self._length = 0
+
+    def write(self, data):
+        """
+        追加一个音频块，超出容量的部分被丢弃。
+
+        参数:
+            data (bytes | np.ndarray): int16 PCM 数据。
+
+        返回:
+            np.ndarray: 本次写入部分在缓冲区中的视图 (可直接交给增量分析器)。
+        """
+        samples = np.frombuffer(data, dtype=np.int16) if isinstance(data, (bytes, bytearray, memoryview)) else data
+        count = min(samples.size, self._data.size - self._length)
+        start = self._length
+        self._data[start:start + count] = samples[:count]
+        self._length += count
+        return self._data[start:start + count]
+
+    def view(self):
+        """已录制样本的零拷贝 int16 视图。"""
+        return self._data[:self._length]
+
+    def to_float32(self):
+        """
+        把已录制样本转换为归一化到 [-1.0, 1.0] 的 float32，结果写入复用的临时缓冲区。
+
+        返回:
+            np.ndarray: 临时缓冲区的视图，下一次调用时会被覆盖。
+        """
+        if self._scratch is None:
+            self._scratch = np.empty(self._data.size, dtype=np.float32)
+        out = self._scratch[:self._length]
+        np.multiply(self._data[:self._length], INT16_SCALE, out=out, dtype=np.float32)
+        return out
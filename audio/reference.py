@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+原曲乐句的参考特征（音高轮廓、起始点网格）提取与缓存。
+
+每个乐句的参考特征只从 audio_full 的 start_time..end_time 片段提取一次，之后直接从缓存读取，
+因此旋律和节奏比对不会给反馈路径增加明显的延迟。缓存是线程安全的，可以在后台预取。
+
+参考特征也可以用 tools.precompute_reference 离线算好，写入音频旁边的 .reference.npz 文件
+(见 ReferenceSidecar)；运行时缓存优先从这个文件按键读取，不再分析原曲音频。
+"""
+
+import os
+import threading
+import zipfile
+
+import numpy as np
+
+from audio.analysis import LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH
+from audio.features import TakeFeatures
+from audio.pitch import DEFAULT_PITCH_ENGINE, PitchEngine, get_pitch_engine
+from audio.rhythm import onset_grid, pick_onset_peaks
+from audio.wavfile import MappedWav, WavFormatError
+
+REFERENCE_FEATURES_VERSION = 1 # 参考特征格式版本，提取算法变化时加一，使旧的 .reference.npz 失效
+SIDECAR_SUFFIX = ".reference.npz"
+
+
+def load_phrase_audio(audio_path, start_time, end_time, sr):
+    """
+    读取 audio_full 中一个乐句的音频片段（单声道 float32，重采样到 sr）。
+
+    16-bit PCM WAV 通过内存映射只读取这个片段；其他格式用 librosa 解码。
+    """
+    import librosa
+    try:
+        wav = MappedWav(audio_path)
+    except WavFormatError:
+        wav = None
+    if wav is not None:
+        with wav:
+            y = wav.mono(start_time, end_time)
+        if wav.sample_rate != sr and y.size > 0:
+            y = librosa.resample(y, orig_sr=wav.sample_rate, target_sr=sr)
+        return y.astype(np.float32, copy=False)
+
+    duration = max(0.0, end_time - start_time) if end_time is not None else None
+    y, _ = librosa.load(audio_path, sr=sr, mono=True, offset=start_time, duration=duration)
+    return y.astype(np.float32)
+
+
+def phrase_key(audio_path, phrase_data):
+    """乐句在缓存中的键：音频文件绝对路径 + 起止时间。"""
+    return (os.path.abspath(audio_path), float(phrase_data.get('start_time', 0.0)),
+            float(phrase_data['end_time']) if phrase_data.get('end_time') is not None else None)
+
+
+def extract_reference_features(y, sr, pitch_engine):
+    """
+    从乐句音频中提取参考特征。
+
+    返回:
+        dict: {"f0": 逐帧基频 (清音帧为 nan), "voiced": 逐帧浊音标记, "rms_envelope": 逐帧 RMS 能量,
+               "onset_times": 起始点时间 (秒), "onset_grid": 高斯平滑的起始点网格}
+    """
+    features = TakeFeatures(y, sr, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH, pitch_engine=pitch_engine)
+    f0, voiced = features.get("pitch")
+    envelope = features.get("onset_envelope")
+    onset_frames = pick_onset_peaks(envelope, sr, LIBROSA_HOP_LENGTH)
+    return {
+        "f0": f0,
+        "voiced": voiced,
+        "rms_envelope": features.get("rms_envelope").astype(np.float32),
+        "onset_times": (onset_frames * LIBROSA_HOP_LENGTH / sr).astype(np.float32),
+        "onset_grid": onset_grid(onset_frames, envelope.size, sr, LIBROSA_HOP_LENGTH),
+    }
+
+
+def sidecar_path(audio_path):
+    """audio_full 对应的预计算参考特征文件路径 (与音频放在一起)。"""
+    return os.path.splitext(audio_path)[0] + SIDECAR_SUFFIX
+
+
+def sidecar_phrase_key(start_time, end_time):
+    """乐句在 .reference.npz 中的键前缀 (由起止时间决定，乐句时间改变后旧条目自然失效)。"""
+    return f"{start_time:.3f}-{'end' if end_time is None else f'{end_time:.3f}'}"
+
+
+def sidecar_params(sr, pitch_engine=DEFAULT_PITCH_ENGINE):
+    """决定参考特征内容的参数 (包括音高检测引擎的名称)，与文件中记录的不一致时整个文件失效。"""
+    return {
+        "version": REFERENCE_FEATURES_VERSION,
+        "sr": sr,
+        "frame_length": LIBROSA_FRAME_LENGTH,
+        "hop_length": LIBROSA_HOP_LENGTH,
+        "pitch_engine": pitch_engine,
+    }
+
+
+class ReferenceSidecar:
+    """
+    预计算的参考特征文件 (.reference.npz，由 tools.precompute_reference 生成)。
+
+    文件中 "meta/..." 条目记录提取参数和生成时音频文件的大小、修改时间、内容哈希，
+    每个乐句的特征保存为 "<起止时间>/<特征名>" 条目。npz 按条目延迟读取，
+    所以取一个乐句的特征只读取这个乐句的几个数组。
+
+    参数:
+        path (str): .reference.npz 文件路径。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        self._lock = threading.Lock() # np.load 返回的 NpzFile 共用一个文件句柄，不能并发读取
+        self.meta = {}
+        self._members = {} # 乐句键 -> [(特征名, 条目名)]
+        for name in self._npz.files:
+            key, feature = name.rsplit("/", 1)
+            if key == "meta":
+                self.meta[feature] = self._npz[name].item()
+            else:
+                self._members.setdefault(key, []).append((feature, name))
+
+    @classmethod
+    def open_for(cls, audio_path, sr, pitch_engine=DEFAULT_PITCH_ENGINE):
+        """
+        打开 audio_path 对应的参考特征文件，文件不存在或已经过期 (参数或音高引擎不同、音频大小或修改时间改变)
+        时返回 None。
+        """
+        path = sidecar_path(audio_path)
+        if not os.path.exists(path):
+            return None
+        try:
+            sidecar = cls(path)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"读取预计算参考特征失败 ({path}): {e}")
+            return None
+        stat = os.stat(audio_path)
+        meta = sidecar.meta
+        if any(meta.get(name) != value for name, value in sidecar_params(sr, pitch_engine).items()) or \
+                meta.get("source_size") != stat.st_size or meta.get("source_mtime_ns") != stat.st_mtime_ns:
+            print(f"预计算参考特征已过期，改为实时提取: {path}")
+            sidecar.close()
+            return None
+        return sidecar
+
+    def phrase_keys(self):
+        """文件中包含的乐句键。"""
+        return set(self._members)
+
+    def get(self, start_time, end_time):
+        """返回乐句的参考特征字典，文件中没有这个乐句时返回 None。"""
+        members = self._members.get(sidecar_phrase_key(start_time, end_time))
+        if members is None:
+            return None
+        with self._lock:
+            return {feature: self._npz[name] for feature, name in members}
+
+    def close(self):
+        self._npz.close()
+
+
+class ReferenceFeatureCache:
+    """
+    乐句参考特征的缓存。
+
+    参数:
+        sr (int): 提取特征使用的采样率（与录音采样率一致）。
+        pitch_engine (str | PitchEngine, optional): 音高检测引擎名称或实例 (与录音分析使用同一个)，默认见 audio.pitch。
+    """
+
+    def __init__(self, sr, pitch_engine=None):
+        self.sr = sr
+        self._pitch_engine = pitch_engine if isinstance(pitch_engine, PitchEngine) else get_pitch_engine(pitch_engine)
+        self._features = {} # 键 -> 参考特征字典 (提取失败时为 None，避免反复重试)
+        self._sidecars = {} # 音频绝对路径 -> ReferenceSidecar (没有可用的预计算文件时为 None)
+        self._lock = threading.Lock()
+
+    def get_features(self, audio_path, phrase_data):
+        """
+        返回乐句的参考特征字典 ("f0"、"onset_grid")，必要时提取并缓存。
+
+        音频不存在或提取失败时返回 None。
+        """
+        if not audio_path or not phrase_data:
+            return None
+        key = phrase_key(audio_path, phrase_data)
+        with self._lock:
+            if key in self._features:
+                return self._features[key]
+
+        features = None
+        if os.path.exists(audio_path):
+            sidecar = self._sidecar(key[0])
+            if sidecar is not None:
+                features = sidecar.get(key[1], key[2])
+        if features is None and os.path.exists(audio_path):
+            try:
+                y = load_phrase_audio(key[0], key[1], key[2], self.sr)
+                if y.size > 0:
+                    features = extract_reference_features(y, self.sr, self._pitch_engine)
+            except Exception as e:
+                print(f"提取乐句参考特征失败 ({audio_path} {key[1]}-{key[2]}s): {e}")
+
+        with self._lock:
+            self._features[key] = features
+        return features
+
+    def _sidecar(self, audio_path):
+        """返回音频对应的有效预计算文件 (每个音频只检查一次)。"""
+        with self._lock:
+            if audio_path in self._sidecars:
+                return self._sidecars[audio_path]
+        sidecar = ReferenceSidecar.open_for(audio_path, self.sr, self._pitch_engine.name)
+        with self._lock:
+            existing = self._sidecars.setdefault(audio_path, sidecar)
+        if existing is not sidecar and sidecar is not None: # 另一个线程已经打开
+            sidecar.close()
+        return existing
+
+    def prefetch_song(self, song_data):
+        """提取一首歌所有乐句的参考特征（在后台线程中调用）。"""
+        audio_path = song_data.get('audio_full') if song_data else None
+        if not audio_path:
+            return
+        for phrase_data in song_data.get('phrases', []):
+            self.get_features(audio_path, phrase_data)
+
+    def clear(self):
+        """清空缓存。"""
+        with self._lock:
+            self._features.clear()
+            for sidecar in self._sidecars.values():
+                if sidecar is not None:
+                    sidecar.close()
+            self._sidecars.clear()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+节奏特征：发声起始点 (onset) 包络、峰值检测，以及与原曲乐句起始点网格的互相关比对。
+
+参考乐句的起始点网格只计算一次（见 audio.reference），演唱录音的起始点包络与之做
+FFT 互相关，取允许范围内的最佳整体偏移，因此孩子晚一点开口唱不会被扣分。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 发声起始点峰值检测参数 (与 librosa.onset.onset_detect 的默认值一致，单位为秒)
+ONSET_PRE_MAX_SEC = 0.03
+ONSET_POST_MAX_SEC = 0.0
+ONSET_PRE_AVG_SEC = 0.10
+ONSET_POST_AVG_SEC = 0.10
+ONSET_WAIT_SEC = 0.03
+ONSET_DELTA = 0.07
+
+ONSET_GRID_SIGMA_SEC = 0.05 # 参考起始点网格的高斯平滑宽度 (容许的节拍误差)
+RHYTHM_MAX_OFFSET_SEC = 2.0 # 允许的最大整体偏移 (孩子比录音开始晚多久开口)
+
+
+def spectral_flux(log_spec, previous_log_spec=None):
+    """
+    频谱通量：相邻帧对数功率谱正向差分的均值，作为发声起始点强度。
+
+    参数:
+        log_spec (np.ndarray): 形状为 (n_frames, n_bins) 的对数功率谱。
+        previous_log_spec (np.ndarray, optional): 前一批最后一帧的对数功率谱 (增量计算时使用)。
+            没有时第一帧的通量记为 0。
+    """
+    if log_spec.shape[0] == 0:
+        return np.zeros(0)
+    if previous_log_spec is None:
+        flux = np.zeros(log_spec.shape[0])
+        flux[1:] = np.maximum(log_spec[1:] - log_spec[:-1], 0.0).mean(axis=1)
+        return flux
+    previous = np.vstack([previous_log_spec[np.newaxis, :], log_spec[:-1]])
+    return np.maximum(log_spec - previous, 0.0).mean(axis=1)
+
+
+def pick_onset_peaks(onset_envelope, sr, hop_length):
+    """
+    对发声起始点包络做峰值检测，返回起始点帧索引。
+
+    与 librosa.onset.onset_detect 的默认流程一致：先把包络归一化到 [0, 1]，
+    然后要求帧值是局部最大值、且比局部均值高出 ONSET_DELTA，并保持最小间隔。
+    """
+    envelope = np.asarray(onset_envelope, dtype=np.float64)
+    if envelope.size == 0:
+        return np.zeros(0, dtype=int)
+
+    envelope = envelope - envelope.min()
+    peak = envelope.max()
+    if peak <= 0:
+        return np.zeros(0, dtype=int)
+    envelope /= peak
+
+    frames_per_sec = sr / hop_length
+    pre_max = int(ONSET_PRE_MAX_SEC * frames_per_sec)
+    post_max = int(ONSET_POST_MAX_SEC * frames_per_sec) + 1
+    pre_avg = int(ONSET_PRE_AVG_SEC * frames_per_sec)
+    post_avg = int(ONSET_POST_AVG_SEC * frames_per_sec) + 1
+    wait = int(ONSET_WAIT_SEC * frames_per_sec)
+
+    n = envelope.size
+    # 局部最大值: x[i] == max(x[i - pre_max : i + post_max])
+    padded = np.pad(envelope, (pre_max, post_max - 1), mode='constant', constant_values=-np.inf)
+    local_max = sliding_window_view(padded, pre_max + post_max).max(axis=1)
+    # 局部均值: mean(x[i - pre_avg : i + post_avg])，边界处只对有效样本求均值
+    cumsum = np.concatenate([[0.0], np.cumsum(envelope)])
+    idx = np.arange(n)
+    lo = np.maximum(idx - pre_avg, 0)
+    hi = np.minimum(idx + post_avg, n)
+    local_avg = (cumsum[hi] - cumsum[lo]) / (hi - lo)
+
+    candidates = np.flatnonzero((envelope == local_max) & (envelope >= local_avg + ONSET_DELTA))
+    if wait <= 0 or candidates.size == 0:
+        return candidates
+    # 最小间隔约束（候选点很少，顺序处理即可）
+    peaks = []
+    last = -wait - 1
+    for i in candidates:
+        if i > last + wait:
+            peaks.append(i)
+            last = i
+    return np.asarray(peaks, dtype=int)
+
+
+def _gaussian_kernel(sigma_sec, sr, hop_length):
+    """以帧为单位的高斯平滑核。"""
+    sigma = max(sigma_sec * sr / hop_length, 0.5)
+    radius = int(np.ceil(3 * sigma))
+    return np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+
+
+def onset_grid(onset_frames, num_frames, sr, hop_length, sigma_sec=ONSET_GRID_SIGMA_SEC):
+    """
+    把起始点帧索引转换为高斯平滑的脉冲网格，用作参考节奏模板。
+
+    返回:
+        np.ndarray: 长度为 num_frames 的 float32 数组。
+    """
+    grid = np.zeros(num_frames, dtype=np.float64)
+    onset_frames = np.asarray(onset_frames, dtype=int)
+    onset_frames = onset_frames[(onset_frames >= 0) & (onset_frames < num_frames)]
+    if onset_frames.size == 0 or num_frames == 0:
+        return grid.astype(np.float32)
+    grid[onset_frames] = 1.0
+    return np.convolve(grid, _gaussian_kernel(sigma_sec, sr, hop_length), mode='same').astype(np.float32)
+
+
+def rhythm_similarity(onset_envelope, reference_grid, sr, hop_length, max_offset_sec=RHYTHM_MAX_OFFSET_SEC):
+    """
+    用 FFT 互相关比较演唱的起始点包络与参考起始点网格，容许一个整体时间偏移。
+
+    包络先减去局部均值并截断负值，只保留突出的起始点，再用与参考网格相同的高斯核平滑，
+    使两者的峰宽一致；相关值用两者的范数归一化，所以得分在 0~1 之间 (1 表示起始点位置完全吻合)。
+
+    返回:
+        float | None: 最佳偏移下的归一化相关值；参考网格为空时返回 None。
+    """
+    reference = np.asarray(reference_grid, dtype=np.float64)
+    envelope = np.asarray(onset_envelope, dtype=np.float64)
+    if reference.size == 0 or not np.any(reference > 0):
+        return None
+    if envelope.size == 0:
+        return 0.0
+
+    # 减去局部均值并截断负值，只保留突出的起始点 (与峰值检测使用相同的平均窗口)
+    frames_per_sec = sr / hop_length
+    pre_avg = int(ONSET_PRE_AVG_SEC * frames_per_sec)
+    post_avg = int(ONSET_POST_AVG_SEC * frames_per_sec) + 1
+    cumsum = np.concatenate([[0.0], np.cumsum(envelope)])
+    idx = np.arange(envelope.size)
+    lo = np.maximum(idx - pre_avg, 0)
+    hi = np.minimum(idx + post_avg, envelope.size)
+    envelope = np.maximum(envelope - (cumsum[hi] - cumsum[lo]) / (hi - lo), 0.0)
+    envelope = np.convolve(envelope, _gaussian_kernel(ONSET_GRID_SIGMA_SEC, sr, hop_length), mode='same')
+    envelope_norm = np.linalg.norm(envelope)
+    reference_norm = np.linalg.norm(reference)
+    if envelope_norm <= 0 or reference_norm <= 0:
+        return 0.0
+
+    n, m = envelope.size, reference.size
+    n_fft = 1 << int(np.ceil(np.log2(n + m - 1)))
+    # correlation[lag] = sum_t envelope[t + lag] * reference[t]，lag 可以为负
+    spectrum = np.fft.rfft(envelope, n_fft) * np.conj(np.fft.rfft(reference, n_fft))
+    correlation = np.fft.irfft(spectrum, n_fft)
+
+    max_offset = int(round(max_offset_sec * sr / hop_length))
+    positive_lags = correlation[:min(n, max(n - m, 0) + max_offset + 1)] # lag = 0 .. 录音比参考长的部分 + 最大偏移
+    negative_lags = correlation[n_fft - min(max_offset, m - 1):] if max_offset > 0 and m > 1 else np.zeros(0)
+    best = max(positive_lags.max() if positive_lags.size else 0.0,
+               negative_lags.max() if negative_lags.size else 0.0)
+    return float(np.clip(best / (envelope_norm * reference_norm), 0.0, 1.0))
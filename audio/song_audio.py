@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+在后台解码歌曲音频。
+
+选歌界面上鼠标悬停在歌曲按钮上或选中歌曲时，就在后台线程里开始解码 audio_full，
+进入学习界面时歌曲往往已经解码好，第一次 "听一听" 不需要等待媒体后端加载和探测文件。
+解码结果保存在 audio.clips.SongAudioCache 中，最近用过的几首歌保持解码状态。
+"""
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from audio.clips import SongAudioCache
+
+
+class _DecodeTask(QRunnable):
+    """解码一首歌并报告结果。"""
+
+    def __init__(self, loader, audio_path):
+        super().__init__()
+        self._loader = loader
+        self._audio_path = audio_path
+
+    def run(self):
+        self._loader._decode(self._audio_path)
+
+
+class SongAudioLoader(QObject):
+    """
+    歌曲音频的后台解码器 (选歌界面和学习界面共享一个实例)。
+
+    解码在一个单线程的线程池中进行，避免同时解码多首歌与分析争抢 CPU；
+    新的请求会丢弃尚未开始的旧请求 (鼠标快速划过多首歌时只解码最后停留的那首)。
+
+    信号:
+        song_ready(str): 歌曲解码完成 (参数为请求时的音频路径)。
+        song_failed(str, str): 歌曲解码失败 (参数为音频路径、错误信息)。
+
+    参数:
+        cache (SongAudioCache, optional): 解码缓存，默认新建一个。
+    """
+    song_ready = pyqtSignal(str)
+    song_failed = pyqtSignal(str, str)
+    _decoded = pyqtSignal(str, bool) # 后台解码结果 (音频路径、是否成功)
+
+    def __init__(self, parent=None, cache=None):
+        super().__init__(parent)
+        self.cache = cache if cache is not None else SongAudioCache()
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._decoded.connect(self._on_decoded) # 跨线程发出，自动排队到 GUI 线程
+
+    def is_ready(self, audio_path):
+        """歌曲是否已经解码好。"""
+        return bool(audio_path) and audio_path in self.cache
+
+    def peek(self, audio_path):
+        """返回已解码的歌曲 (audio.clips.DecodedSong)，尚未解码好时返回 None。"""
+        return self.cache.peek(audio_path)
+
+    def request(self, audio_path):
+        """
+        请求在后台解码歌曲。
+
+        返回:
+            bool: 歌曲已经解码好时返回 True (不会再发出 song_ready)；否则稍后发出 song_ready 或 song_failed。
+        """
+        if not audio_path:
+            return False
+        if self.is_ready(audio_path):
+            return True
+        self._pool.clear() # 丢弃尚未开始的旧请求
+        self._pool.start(_DecodeTask(self, audio_path))
+        return False
+
+    def wait_for_done(self, msecs=-1):
+        """等待正在进行的解码结束（用于关闭窗口时的清理）。"""
+        self._pool.clear()
+        return self._pool.waitForDone(msecs)
+
+    def _decode(self, audio_path):
+        """后台线程：解码 (或等待另一个线程解码) 歌曲。"""
+        self._decoded.emit(audio_path, self.cache.get(audio_path) is not None)
+
+    def _on_decoded(self, audio_path, ok):
+        if ok:
+            self.song_ready.emit(audio_path)
+        else:
+            self.song_failed.emit(audio_path, self.cache.error(audio_path))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+录音过程中的增量分析器。
+
+每读到一块音频（CHUNK）就把它送入 StreamingAnalyzer，分析器随即处理所有已凑齐的
+分析帧：累计 RMS 能量、逐帧估计音高/浊音、计算频谱通量作为发声起始点包络。
+停止录音时只剩最后一个不完整的窗口需要处理，因此反馈时间与录音长度无关。
+
+音高引擎由 audio.pitch.get_pitch_engine() 按配置创建。可以逐帧调用的引擎 (YIN) 在录音过程中逐块估计音高；
+pyin 只能分析整段音频，这时分析器保留录音样本，在 finalize() 时一次性估计音高 (其他特征仍然逐块计算)。
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio.analysis import LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH, score_take
+from audio.features import TakeFeatures
+from audio.pitch import PitchEngine, get_pitch_engine
+from audio.rhythm import spectral_flux
+
+class StreamingAnalyzer:
+    """
+    增量式录音分析器。
+
+    在录音期间通过 feed() 喂入每个音频块，停止录音后调用 finalize() 得到 AnalysisResult。
+    finalize() 只需处理最后一个不完整的窗口和一次很短的峰值检测。
+
+    参数:
+        pitch_engine (str | PitchEngine, optional): 音高检测引擎名称或实例，默认见 audio.pitch。
+    """
+
+    def __init__(self, sr, frame_length=LIBROSA_FRAME_LENGTH, hop_length=LIBROSA_HOP_LENGTH, pitch_engine=None):
+        self.sr = sr
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self._pitch_engine = pitch_engine if isinstance(pitch_engine, PitchEngine) else get_pitch_engine(pitch_engine)
+        self._frame_pitch = hasattr(self._pitch_engine, "estimate_frames") # 能否逐块估计音高
+        self._samples = [] # 不能逐块估计音高时保留的录音样本 (finalize 时整段分析)
+
+        self._pending = np.zeros(0, dtype=np.float32) # 还没凑够一帧的样本
+        self._num_samples = 0 # 已喂入的样本总数
+        self._sum_squares = 0.0 # 能量累计 (用于整体 RMS)
+
+        self._voiced_count = 0 # 浊音帧数量
+        self._frame_count = 0 # 已分析帧数量
+        self._last_f0 = np.nan # 最近一个浊音帧的基频 (Hz)
+        self._f0_blocks = [] # 逐帧基频 (按处理批次存放，finalize 时拼接成音高轮廓)
+
+        self._prev_log_spec = None # 上一帧的对数频谱 (用于频谱通量)
+        self._onset_envelope = [] # 每帧的发声起始点强度
+        self._finalized = False
+
+    # --- 实时状态 (可用于录音中的界面显示) ---
+    @property
+    def rms_energy(self):
+        """到目前为止的整体 RMS 能量。"""
+        return float(np.sqrt(self._sum_squares / self._num_samples)) if self._num_samples else 0.0
+
+    @property
+    def voiced_percentage(self):
+        """到目前为止检测到音高的帧数百分比 (引擎不能逐块估计音高时，finalize 之前为 0)。"""
+        return self._voiced_count / self._frame_count * 100 if self._frame_count else 0.0
+
+    @property
+    def current_f0(self):
+        """最近一个浊音帧的基频 (Hz)，尚未检测到时为 nan。"""
+        return self._last_f0
+
+    @property
+    def duration_sec(self):
+        """已喂入音频的时长（秒）。"""
+        return self._num_samples / self.sr
+
+    def feed(self, chunk):
+        """
+        喂入一个音频块。
+
+        参数:
+            chunk (np.ndarray | bytes): int16 PCM 数据或归一化的 float32 数据。
+        """
+        if self._finalized:
+            raise RuntimeError("StreamingAnalyzer 已经 finalize，不能继续喂入数据。")
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = np.frombuffer(chunk, dtype=np.int16)
+        if chunk.dtype == np.int16:
+            samples = chunk.astype(np.float32)
+            samples *= 1.0 / 32768.0 # 归一化到 [-1.0, 1.0]
+        else:
+            samples = np.asarray(chunk, dtype=np.float32)
+        if samples.size == 0:
+            return
+
+        self._num_samples += samples.size
+        self._sum_squares += float(np.dot(samples, samples))
+        if not self._frame_pitch:
+            self._samples.append(samples.copy() if samples is chunk else samples)
+
+        buffer = np.concatenate([self._pending, samples]) if self._pending.size else samples
+        if buffer.size < self.frame_length:
+            self._pending = buffer
+            return
+        num_frames = (buffer.size - self.frame_length) // self.hop_length + 1
+        frames = sliding_window_view(buffer, self.frame_length)[::self.hop_length][:num_frames]
+        self._process_frames(frames)
+        self._pending = buffer[num_frames * self.hop_length:].copy()
+
+    def _block_features(self, frames):
+        """一批帧的共享特征 (与批量分析使用同一套特征计算函数)。"""
+        return TakeFeatures(None, self.sr, self.frame_length, self.hop_length,
+                            pitch_engine=self._pitch_engine, precomputed={"frames": frames})
+
+    def _process_frames(self, frames):
+        """分析一组完整的帧：音高/浊音和频谱通量。"""
+        block = self._block_features(frames)
+        if self._frame_pitch:
+            f0, voiced = block.get("pitch")
+            self._voiced_count += int(np.count_nonzero(voiced))
+            self._frame_count += frames.shape[0]
+            self._f0_blocks.append(f0)
+            if voiced.any():
+                self._last_f0 = float(f0[np.flatnonzero(voiced)[-1]])
+
+        # 频谱通量: 相邻帧对数功率谱的正向差分均值
+        log_spec = block.get("log_power_spectrum")
+        self._onset_envelope.extend(spectral_flux(log_spec, self._prev_log_spec).tolist())
+        self._prev_log_spec = log_spec[-1]
+
+    def _estimate_pitch(self):
+        """用不能逐块调用的引擎 (pyin) 一次性估计整段录音的音高。"""
+        samples = np.concatenate(self._samples) if self._samples else np.zeros(0, dtype=np.float32)
+        self._samples = []
+        if samples.size == 0:
+            return
+        f0, voiced = TakeFeatures(samples, self.sr, self.frame_length, self.hop_length,
+                                  pitch_engine=self._pitch_engine).get("pitch")
+        f0 = np.where(voiced, f0, np.nan).astype(np.float32)
+        self._f0_blocks = [f0]
+        self._voiced_count = int(np.count_nonzero(voiced))
+        self._frame_count = len(voiced)
+        if voiced.any():
+            self._last_f0 = float(f0[np.flatnonzero(voiced)[-1]])
+
+    @property
+    def pitch_contour(self):
+        """到目前为止的逐帧基频 (Hz，清音帧为 nan)。"""
+        return np.concatenate(self._f0_blocks) if self._f0_blocks else np.zeros(0, dtype=np.float32)
+
+    def finalize(self, reference=None):
+        """
+        处理剩余样本并返回本次录音的 AnalysisResult。
+
+        参数:
+            reference (dict, optional): 原曲乐句的参考特征 ("f0"、"onset_grid")，见 audio.reference。
+        """
+        if not self._finalized:
+            self._finalized = True
+            if self._pending.size > 0 and (self._frame_count == 0 or self._pending.size > self.frame_length - self.hop_length):
+                # 最后一个不完整的窗口用 0 补齐
+                last = np.zeros(self.frame_length, dtype=np.float32)
+                tail = self._pending[-self.frame_length:]
+                last[:tail.size] = tail
+                self._process_frames(last[np.newaxis, :])
+            self._pending = np.zeros(0, dtype=np.float32)
+            if not self._frame_pitch:
+                self._estimate_pitch()
+
+        # 录音中已经逐块算好的特征直接交给评分项，不再重新处理音频
+        contour = self.pitch_contour
+        features = TakeFeatures(None, self.sr, self.frame_length, self.hop_length,
+                                pitch_engine=self._pitch_engine, precomputed={
+                                    "rms": self.rms_energy,
+                                    "pitch": (contour, np.isfinite(contour)),
+                                    "onset_envelope": np.asarray(self._onset_envelope),
+                                })
+        return score_take(features, self.duration_sec, reference)
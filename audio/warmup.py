@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+分析模块预热。
+
+librosa (以及它依赖的 numba、scipy) 只在真正需要时才导入，不再拖慢启动。选歌界面显示之后，
+在后台线程里导入它们并用一小段合成音频跑一遍音高和起始点分析，让 numba 的 JIT 编译、
+FFT 计划等一次性开销在孩子第一次点击录音之前就完成。
+"""
+
+import io
+import time
+import wave
+
+import numpy as np
+
+from audio.analysis import LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH
+from audio.features import TakeFeatures
+from audio.rhythm import pick_onset_peaks
+
+WARMUP_SECONDS = 0.5 # 预热用合成音频的时长 (秒)
+WARMUP_FILE_RATE = 44100 # 预热解码用的 WAV 采样率 (与歌曲文件常见采样率一致，顺便预热重采样)
+
+
+def _tiny_wav(y, sr):
+    """把一段 float32 音频写成内存中的 16-bit WAV 文件。"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sr)
+        wav_file.writeframes((y * 32767).astype(np.int16).tobytes())
+    buffer.seek(0)
+    return buffer
+
+
+def warm_up_analysis(sr, pitch_engine=None):
+    """
+    导入 librosa 并对一小段合成音频运行一次解码和完整的特征计算（在后台线程中调用）。
+
+    librosa 的子模块是延迟加载的，只 import 并不会加载 librosa.load 背后的解码、重采样模块，
+    所以这里真正读取一次内存中的 WAV 文件。
+
+    参数:
+        sr (int): 录音采样率。
+        pitch_engine (str, optional): 实际使用的音高检测引擎 ("pyin" 时会触发 numba JIT 编译)。
+    """
+    start = time.perf_counter()
+    import librosa # 参考乐句的读取 (librosa.load) 和 pyin 引擎都需要它
+    t = np.arange(int(WARMUP_SECONDS * WARMUP_FILE_RATE)) / WARMUP_FILE_RATE
+    tone = (0.2 * np.sin(2 * np.pi * 220.0 * t) * (t % 0.25 < 0.15)).astype(np.float32) # 带停顿的音符
+    y, _ = librosa.load(_tiny_wav(tone, WARMUP_FILE_RATE), sr=sr, mono=True)
+    import_time = time.perf_counter() - start
+
+    features = TakeFeatures(y, sr, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH, pitch_engine=pitch_engine)
+    features.get("pitch")
+    pick_onset_peaks(features.get("onset_envelope"), sr, LIBROSA_HOP_LENGTH)
+
+    print(f"分析模块预热完成: 导入 librosa 并解码 {import_time * 1000:.0f}ms，"
+          f"{features.pitch_engine.name} 音高/起始点分析 {(time.perf_counter() - start - import_time) * 1000:.0f}ms")
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+内存映射的 WAV 读取器。
+
+只解析 RIFF 头部找到 fmt 和 data 块，data 块通过 np.memmap 映射为 (帧数, 声道数) 的 int16 数组，
+按 start_time/end_time 取片段时返回的是零拷贝视图；下混为单声道、转换为 float32 也只针对
+请求的片段进行，所以读取一个乐句的开销与乐句长度成正比，与整首歌的长度无关。
+
+只支持 16-bit PCM (包括 WAVE_FORMAT_EXTENSIBLE 中的 PCM)。其他格式 (例如扩展名是 .wav、
+实际是 MP3 的文件) 会抛出 WavFormatError，调用方应退回 librosa 解码。
+"""
+
+import struct
+
+import numpy as np
+
+from audio.recording import INT16_SCALE
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavFormatError(ValueError):
+    """文件不是本读取器支持的 16-bit PCM WAV。"""
+
+
+def _read_chunks(f, file_size):
+    """解析 RIFF 头部，返回 fmt 块的内容和 data 块的 (偏移, 字节数)。"""
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise WavFormatError("不是 RIFF/WAVE 文件")
+    fmt, data = None, None
+    while data is None:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+        elif chunk_id == b'data':
+            offset = f.tell()
+            data = (offset, min(chunk_size, file_size - offset)) # 流式写入的文件 data 大小可能不正确
+            break
+        else:
+            f.seek(chunk_size, 1)
+        if chunk_size % 2: # 块按 2 字节对齐
+            f.seek(1, 1)
+    if fmt is None or data is None:
+        raise WavFormatError("缺少 fmt 或 data 块")
+    return fmt, data
+
+
+class MappedWav:
+    """
+    以内存映射方式打开的 16-bit PCM WAV 文件。
+
+    参数:
+        path (str): WAV 文件路径。
+
+    异常:
+        WavFormatError: 文件不是 16-bit PCM WAV。
+        OSError: 文件无法打开。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            file_size = f.tell()
+            f.seek(0)
+            fmt, (data_offset, data_size) = _read_chunks(f, file_size)
+        if len(fmt) < 16:
+            raise WavFormatError("fmt 块不完整")
+        format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack('<H', fmt[24:26])[0] # 子格式 GUID 的前两个字节
+        if format_tag != WAVE_FORMAT_PCM or bits != 16 or channels < 1 or block_align != 2 * channels:
+            raise WavFormatError(f"不支持的 WAV 格式 (格式 {format_tag:#x}, {bits} bit, {channels} 声道)")
+
+        self.sample_rate = sample_rate
+        self.channels = channels
+        num_frames = data_size // block_align
+        if num_frames > 0:
+            self._data = np.memmap(path, dtype='<i2', mode='r', offset=data_offset, shape=(num_frames, channels))
+        else:
+            self._data = np.zeros((0, channels), dtype=np.int16)
+
+    @property
+    def num_frames(self):
+        """采样帧数。"""
+        return self._data.shape[0]
+
+    @property
+    def duration_sec(self):
+        """音频时长（秒）。"""
+        return self.num_frames / self.sample_rate
+
+    def frame_range(self, start_time=0.0, end_time=None):
+        """把 start_time..end_time（秒）换算为帧范围 [start, end)，限制在文件范围内。"""
+        total = self.num_frames
+        start = min(max(int(round(start_time * self.sample_rate)), 0), total)
+        end = total if end_time is None else min(max(int(round(end_time * self.sample_rate)), start), total)
+        return start, end
+
+    def frames(self, start_time=0.0, end_time=None):
+        """返回 start_time..end_time（秒）的 int16 数据，形状为 (帧数, 声道数) 的零拷贝只读视图。"""
+        start, end = self.frame_range(start_time, end_time)
+        return self._data[start:end]
+
+    def mono(self, start_time=0.0, end_time=None):
+        """
+        返回 start_time..end_time（秒）下混为单声道、归一化到 [-1.0, 1.0] 的 float32 数组。
+
+        只读取和转换请求的片段。
+        """
+        frames = self.frames(start_time, end_time)
+        if self.channels == 1:
+            return np.multiply(frames[:, 0], INT16_SCALE, dtype=np.float32)
+        y = np.sum(frames, axis=1, dtype=np.float32)
+        y *= INT16_SCALE / self.channels
+        return y
+
+    def close(self):
+        """释放本对象对映射的引用 (已经返回的视图仍然有效，直到它们也被释放)。"""
+        self._data = np.zeros((0, self.channels), dtype=np.int16)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+编译后的歌曲目录缓存。
+
+songs.json (或分片目录的 manifest.json) 解析、校验之后的结果以 marshal 二进制格式保存在
+用户数据目录中 (与 user_progress.json 放在一起)，下次启动时一次读取整个文件、直接反序列化，
+不再解析 JSON 和逐首校验。单文件 songs.json 的每首歌被拆成目录条目和详情 (乐句、歌词)，
+详情按歌曲单独序列化为 bytes，选中歌曲时才反序列化，所以启动时只需要构建目录条目。
+
+文件布局:
+    MAGIC (6 字节) | 头部长度 (uint32) | 头部 (marshal 字典) | 目录数据 (marshal: 条目列表, 详情目录, 详情 bytes)
+头部记录缓存格式版本、Python 的 marshal 版本，以及生成缓存时源文件的路径、大小、修改时间和 SHA-1。
+源文件的大小和修改时间不变时直接使用缓存；变了但内容哈希相同 (例如重新检出) 时也使用缓存并更新头部；
+否则重新解析源文件并重写缓存。
+"""
+
+import hashlib
+import marshal
+import os
+import struct
+
+from catalog.manifest import details_loader_for, load_catalog_file, split_song
+
+COMPILED_MAGIC = b"HSCAT\x00"
+COMPILED_FORMAT_VERSION = 1 # 校验规则或数据结构变化时加一，使旧缓存失效
+_LENGTH = struct.Struct("<I")
+
+
+class CompiledSongDetails:
+    """
+    编译缓存中按歌曲 ID 保存的详情 (marshal bytes)，作为 SongCatalog 的 details_loader 使用。
+
+    参数:
+        blobs (dict): 歌曲 ID -> 详情字典的 marshal bytes。
+    """
+
+    def __init__(self, blobs):
+        self._blobs = blobs
+
+    def __call__(self, entry):
+        blob = self._blobs.get(entry.get("id"))
+        if blob is None:
+            return None
+        song = marshal.loads(blob)
+        song.update(entry)
+        return song
+
+
+def _compile(songs, details_dir):
+    """把目录数据序列化为缓存的数据部分。"""
+    if details_dir is not None: # 分片目录：条目本身已经很小，详情仍然从文件读取
+        return marshal.dumps((songs, details_dir, None))
+    entries, blobs = [], {}
+    for song in songs:
+        entry, details = split_song(song)
+        entries.append(entry)
+        blobs[entry["id"]] = marshal.dumps(details)
+    return marshal.dumps((entries, None, blobs))
+
+
+def compiled_cache_path(source_path, cache_dir):
+    """源文件对应的缓存文件路径 (不同源文件使用不同的缓存)。"""
+    digest = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f"catalog-{digest}.bin")
+
+
+def file_sha1(path):
+    """计算文件内容的 SHA-1 (十六进制字符串)。"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _source_header(source_path, stat, sha1):
+    return {
+        "format": COMPILED_FORMAT_VERSION,
+        "marshal": marshal.version,
+        "source": os.path.abspath(source_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": sha1,
+    }
+
+
+def _read_cache(cache_path):
+    """一次读取缓存文件，返回 (头部, 数据部分的 bytes)；文件不存在或损坏时返回 (None, None)。"""
+    try:
+        with open(cache_path, 'rb') as f:
+            blob = f.read()
+    except OSError:
+        return None, None
+    try:
+        if not blob.startswith(COMPILED_MAGIC):
+            return None, None
+        start = len(COMPILED_MAGIC) + _LENGTH.size
+        (header_length,) = _LENGTH.unpack_from(blob, len(COMPILED_MAGIC))
+        header = marshal.loads(blob[start:start + header_length])
+        return header, memoryview(blob)[start + header_length:]
+    except (ValueError, EOFError, TypeError, struct.error):
+        return None, None
+
+
+def _write_cache(cache_path, header, payload):
+    """先写临时文件再替换，避免留下写了一半的缓存。"""
+    header_bytes = marshal.dumps(header)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(COMPILED_MAGIC + _LENGTH.pack(len(header_bytes)) + header_bytes)
+        f.write(payload)
+    os.replace(temp_path, cache_path)
+
+
+def load_catalog_cached(source_path, cache_dir):
+    """
+    读取歌曲目录，优先使用编译缓存。
+
+    返回:
+        tuple: (歌曲列表, details_loader, 是否命中缓存)。歌曲列表和 details_loader 用于构建 SongCatalog：
+               命中缓存时列表中是目录条目，详情由 details_loader 读取。
+
+    异常:
+        OSError / ValueError: 源文件无法读取或格式不正确 (与 load_catalog_file() 相同)。
+    """
+    stat = os.stat(source_path)
+    cache_path = compiled_cache_path(source_path, cache_dir)
+    header, payload = _read_cache(cache_path)
+    valid = header is not None and header.get("format") == COMPILED_FORMAT_VERSION \
+        and header.get("marshal") == marshal.version and header.get("source") == os.path.abspath(source_path)
+
+    if valid and (header.get("size") != stat.st_size or header.get("mtime_ns") != stat.st_mtime_ns):
+        # 修改时间或大小变了：内容相同时仍然可以使用缓存，只更新头部
+        sha1 = file_sha1(source_path)
+        valid = header.get("sha1") == sha1
+        if valid:
+            try:
+                _write_cache(cache_path, _source_header(source_path, stat, sha1), payload)
+            except OSError as e:
+                print(f"更新歌曲目录缓存失败: {e}")
+
+    if valid:
+        try:
+            entries, details_dir, blobs = marshal.loads(payload)
+            return entries, CompiledSongDetails(blobs) if blobs is not None else details_loader_for(details_dir), True
+        except (ValueError, EOFError, TypeError) as e:
+            print(f"歌曲目录缓存已损坏，重新生成: {e}")
+
+    songs, details_dir = load_catalog_file(source_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_cache(cache_path, _source_header(source_path, stat, file_sha1(source_path)), _compile(songs, details_dir))
+    except (OSError, ValueError) as e: # ValueError: 数据中有 marshal 不支持的类型
+        print(f"写入歌曲目录缓存失败: {e}")
+    return songs, details_loader_for(details_dir), False
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲目录文件格式。
+
+支持两种格式:
+    - 单文件 songs.json: 歌曲数据字典的列表，每首歌包含全部乐句和歌词 (原有格式)；
+    - 分片目录: manifest.json 只保存每首歌的 ID、标题、解锁要求和资源路径，
+      乐句、歌词等详情放在每首歌自己的文件中 (由 "details" 指向，路径相对于 manifest.json)，
+      进入这首歌时才读取。启动时间和内存只与歌曲数量有关，与乐句数据的总量无关。
+
+manifest.json 示例:
+    {"format": "happysing-catalog-manifest", "version": 1,
+     "songs": [{"id": "pawpatrol", "title": "...", "unlock_stars_required": 0,
+                "audio_full": "assets/audio/pawpatrol_full.wav", "details": "songs/pawpatrol.json"}]}
+
+可以用 tools.shard_catalog 把 songs.json 转换为分片目录。
+"""
+
+import functools
+import json
+import os
+import re
+
+MANIFEST_FORMAT = "happysing-catalog-manifest"
+MANIFEST_VERSION = 1
+# 写入 manifest 的字段 (选歌界面和预先解码音频需要的信息)，其余字段放在详情文件中
+MANIFEST_FIELDS = ("id", "title", "theme", "unlocked", "unlock_stars_required",
+                   "audio_full", "audio_karaoke", "background_image", "character_images")
+
+
+def is_valid_song(song):
+    """完整歌曲数据至少要有 ID、标题和乐句列表。"""
+    return isinstance(song, dict) and bool(song.get("id")) and bool(song.get("title")) \
+        and isinstance(song.get("phrases"), list)
+
+
+def is_valid_entry(entry):
+    """manifest 条目至少要有 ID、标题和详情文件路径。"""
+    return isinstance(entry, dict) and bool(entry.get("id")) and bool(entry.get("title")) \
+        and isinstance(entry.get("details"), str)
+
+
+def load_catalog_file(path):
+    """
+    读取目录文件 (songs.json 或 manifest.json)，只保留有效的歌曲。
+
+    返回:
+        tuple: (歌曲列表, 详情文件的基准目录)。单文件格式的歌曲已包含全部数据，基准目录为 None；
+               分片格式返回 manifest 条目，详情用 load_song_details() 读取 (见 details_loader_for())。
+
+    异常:
+        OSError / ValueError: 文件无法读取或格式不正确。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return [song for song in data if is_valid_song(song)], None
+    if isinstance(data, dict) and data.get("format") == MANIFEST_FORMAT:
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"不支持的目录版本: {data.get('version')}")
+        return [entry for entry in data.get("songs", []) if is_valid_entry(entry)], os.path.dirname(os.path.abspath(path))
+    raise ValueError("既不是歌曲列表也不是目录 manifest")
+
+
+def load_song_details(entry, base_dir):
+    """
+    读取分片目录中一首歌的详情文件，与 manifest 条目合并为完整的歌曲数据。
+
+    返回:
+        dict | None: 详情文件不存在或无效时返回 None。
+    """
+    path = os.path.join(base_dir, entry["details"])
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            details = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取歌曲详情失败 ({path}): {e}")
+        return None
+    if not isinstance(details, dict):
+        print(f"歌曲详情格式不正确: {path}")
+        return None
+    song = dict(details)
+    song.update((key, value) for key, value in entry.items() if key != "details")
+    return song if is_valid_song(song) else None
+
+
+def details_loader_for(details_dir):
+    """返回 SongCatalog 使用的详情读取函数；details_dir 为 None (单文件格式) 时返回 None。"""
+    return functools.partial(load_song_details, base_dir=details_dir) if details_dir is not None else None
+
+
+def split_song(song):
+    """把完整歌曲数据拆分为 (目录条目, 详情)：条目只包含 MANIFEST_FIELDS 中的字段。"""
+    entry = {key: song[key] for key in MANIFEST_FIELDS if key in song}
+    details = {key: value for key, value in song.items() if key not in MANIFEST_FIELDS}
+    return entry, details
+
+
+def _detail_file_name(song_id, used):
+    """由歌曲 ID 生成不重复的详情文件名。"""
+    stem = re.sub(r'[^\w-]', '_', str(song_id)) or "song"
+    name, index = stem, 1
+    while name.lower() in used:
+        index += 1
+        name = f"{stem}_{index}"
+    used.add(name.lower())
+    return name + ".json"
+
+
+def write_sharded_catalog(songs, out_dir):
+    """
+    把完整歌曲数据列表写成分片目录 (out_dir/manifest.json + out_dir/songs/<id>.json)。
+
+    返回:
+        str: manifest.json 的路径。
+    """
+    songs_dir = os.path.join(out_dir, "songs")
+    os.makedirs(songs_dir, exist_ok=True)
+    entries, used = [], set()
+    for song in songs:
+        if not is_valid_song(song):
+            continue
+        details_name = _detail_file_name(song["id"], used)
+        entry, details = split_song(song)
+        entry["details"] = f"songs/{details_name}"
+        with open(os.path.join(songs_dir, details_name), 'w', encoding='utf-8') as f:
+            json.dump(details, f, ensure_ascii=False, indent=2)
+        entries.append(entry)
+
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({"format": MANIFEST_FORMAT, "version": MANIFEST_VERSION, "songs": entries},
+                  f, ensure_ascii=False, indent=2)
+    return manifest_path
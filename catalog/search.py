@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲目录的搜索索引。
+
+SongSearchIndex 在内存中为每首歌的标题、主题和歌词分别建立字符 n-gram 倒排索引：每个文本先做 NFKC
+规范化 (全角转半角) 和大小写折叠，按空白和标点分成词，每个词的单字和相邻两字 (unigram + bigram)
+作为索引项。中文没有空格分词，按字切分正好适用；英文和数字同样按字母切分，所以前缀和词中的片段都能搜到。
+
+查询按空白分成若干关键词，每个关键词都要出现在某个字段中。一两个字的关键词由倒排表直接得到精确的结果；
+更长的关键词先求它所有 bigram 的倒排表的交集，再只对交集中的少数歌曲核对子串。每个关键词在各字段的
+命中用 numpy 在整个文档数组上合并打分，一次按键只做几次向量运算，不逐首歌执行 Python 代码
+(10000 首歌时每次按键约 1 ms，见 tools/bench_search.py)。
+
+结果按匹配的字段排序：标题 > 主题 > 歌词，标题中的词以关键词开头或标题等于查询时再加分，
+分数相同时保持目录顺序。
+
+目录变化时用 sync() 增量更新：内容没有变的歌曲跳过 (只比较原始文本的哈希)，变了的歌曲重新索引；
+删除的歌曲只做标记，标记的数量超过有效歌曲数时才压缩倒排表。索引不是线程安全的，
+可以在后台线程中建立，然后交给 GUI 线程使用。
+"""
+
+import re
+import unicodedata
+from array import array
+from operator import add
+
+import numpy as np
+
+TITLE, THEME, LYRICS = range(3) # 字段
+FIELD_WEIGHTS = (10, 4, 1) # 标题、主题、歌词匹配的分数 (每个关键词取最高的一个)
+TITLE_PREFIX_BONUS = 5 # 标题中的词以关键词开头时加分
+TITLE_EXACT_BONUS = 20 # 标题等于整个查询时加分
+
+_SEPARATORS = re.compile(r"[\W_]+") # 标点、空白和下划线
+
+
+def normalize_text(text):
+    """
+    规范化文本：NFKC (全角转半角)、大小写折叠，标点和空白替换为一个空格。
+
+    返回:
+        str: 以空格分隔的词，没有可索引的字符时为空字符串。
+    """
+    if not text:
+        return ""
+    return _SEPARATORS.sub(" ", unicodedata.normalize("NFKC", str(text)).casefold()).strip()
+
+
+def text_grams(normalized):
+    """返回规范化文本中所有的单字和相邻两字 (不跨越词的边界)。"""
+    grams = set(normalized)
+    grams.discard(" ")
+    for word in normalized.split():
+        grams.update(map(add, word, word[1:]))
+    return grams
+
+
+def song_lyrics_text(song_data):
+    """歌曲的歌词文本：优先使用 lyrics 字段，没有时由各乐句的文本拼接。"""
+    lyrics = song_data.get("lyrics")
+    if isinstance(lyrics, str) and lyrics:
+        return lyrics
+    phrases = song_data.get("phrases")
+    if isinstance(phrases, list):
+        return "\n".join(str(phrase.get("text", "")) for phrase in phrases if isinstance(phrase, dict))
+    return ""
+
+
+class SongSearchIndex:
+    """
+    歌曲搜索索引。
+
+    每首歌是一个文档，用内部的文档编号标识 (按加入顺序递增，所以倒排表中的编号是升序的)。
+    """
+
+    def __init__(self):
+        self._postings = ({}, {}, {}) # 每个字段: 索引项 -> array('i') 文档编号 (升序)
+        self._title_starts = {} # 标题中每个词的第一个字和前两个字 -> array('i') 文档编号 (前缀加分)
+        self._titles = {} # 规范化的标题 -> 文档编号列表 (完全匹配加分)
+        self._docs = [] # 文档编号 -> (歌曲 ID, 规范化的标题, 主题, 歌词)，删除的歌曲为 None
+        self._orders = array('i') # 文档编号 -> 目录顺序 (分数相同时的排序依据)
+        self._alive = array('b') # 文档编号 -> 1 (有效) / 0 (已删除)
+        self._doc_ids = {} # 歌曲 ID -> 文档编号
+        self._sources = {} # 歌曲 ID -> 原始文本的哈希 (sync 时判断内容是否变化)
+        self._dead = 0 # 标记为删除的文档数
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def __contains__(self, song_id):
+        return song_id in self._doc_ids
+
+    # --- 修改 ---
+    def add_song(self, song_data, lyrics=None, order=None):
+        """
+        加入 (或替换) 一首歌。
+
+        参数:
+            song_data (dict): 歌曲数据 (至少有 id，title 和 theme 可选)。
+            lyrics (str, optional): 歌词文本，默认取自 song_data (见 song_lyrics_text)。
+            order (int, optional): 分数相同时的排序依据 (目录中的位置)，默认排在最后。
+
+        返回:
+            bool: 这首歌是新加入的或内容变了 (重新索引) 时返回 True。
+        """
+        song_id = song_data["id"]
+        if lyrics is None:
+            lyrics = song_lyrics_text(song_data)
+        title, theme = song_data.get("title", song_id), song_data.get("theme")
+        source = hash((title, theme, lyrics))
+        doc = self._doc_ids.get(song_id)
+        if doc is not None:
+            if self._sources[song_id] == source: # 内容没有变，只更新顺序
+                if order is not None:
+                    self._orders[doc] = order
+                return False
+            self.remove_song(song_id)
+        self._sources[song_id] = source
+        self._add_doc((song_id, normalize_text(title), normalize_text(theme), normalize_text(lyrics)),
+                      len(self._docs) if order is None else order)
+        return True
+
+    def remove_song(self, song_id):
+        """删除一首歌 (只做标记，倒排表在删除的歌曲足够多时压缩)。返回这首歌原来是否在索引中。"""
+        doc = self._doc_ids.pop(song_id, None)
+        if doc is None:
+            return False
+        del self._sources[song_id]
+        title_docs = self._titles[self._docs[doc][1]]
+        title_docs.remove(doc)
+        if not title_docs:
+            del self._titles[self._docs[doc][1]]
+        self._docs[doc] = None
+        self._alive[doc] = 0
+        self._dead += 1
+        if self._dead > len(self._doc_ids):
+            self._compact()
+        return True
+
+    def sync(self, songs, lyrics_loader=None):
+        """
+        与目录同步：加入新的歌曲、重新索引内容变了的歌曲、删除不在目录中的歌曲。
+
+        参数:
+            songs (iterable): 目录中的歌曲数据 (按目录顺序)。
+            lyrics_loader (callable, optional): lyrics_loader(song_data) 返回歌词文本
+                (目录条目不包含歌词时用来读取详情)，默认取自 song_data。
+
+        返回:
+            int: 加入、修改或删除的歌曲数量。
+        """
+        changed = 0
+        seen = set()
+        for order, song_data in enumerate(songs):
+            song_id = song_data.get("id")
+            if not song_id or song_id in seen:
+                continue
+            seen.add(song_id)
+            lyrics = lyrics_loader(song_data) if lyrics_loader is not None else None
+            changed += self.add_song(song_data, lyrics, order)
+        for song_id in [song_id for song_id in self._doc_ids if song_id not in seen]:
+            changed += self.remove_song(song_id)
+        return changed
+
+    # --- 查询 ---
+    def search(self, query, limit=None):
+        """
+        搜索歌曲。
+
+        参数:
+            query (str): 查询文本，按空白分成关键词，每个关键词都要出现在标题、主题或歌词中。
+            limit (int, optional): 最多返回的数量，默认返回全部。
+
+        返回:
+            list: 匹配的歌曲 ID，按分数从高到低 (分数相同时按目录顺序)；查询为空时返回空列表。
+        """
+        terms = normalize_text(query).split()
+        if not terms or not self._doc_ids:
+            return []
+        num_docs = len(self._docs)
+        total = np.zeros(num_docs, dtype=np.int32)
+        matched = np.frombuffer(self._alive, dtype=np.int8).astype(bool)
+        for term in terms:
+            term_score = np.zeros(num_docs, dtype=np.int32)
+            # 权重从低到高依次写入，同一首歌保留最高的字段分数
+            for field in (LYRICS, THEME, TITLE):
+                docs = self._field_docs(field, term)
+                if len(docs):
+                    term_score[docs] = FIELD_WEIGHTS[field]
+            prefix_docs = self._title_prefix_docs(term)
+            if len(prefix_docs):
+                term_score[prefix_docs] += TITLE_PREFIX_BONUS
+            matched &= term_score > 0
+            if not matched.any():
+                return []
+            total += term_score
+        exact = self._titles.get(" ".join(terms))
+        if exact:
+            total[exact] += TITLE_EXACT_BONUS
+
+        docs = np.flatnonzero(matched)
+        orders = np.frombuffer(self._orders, dtype=np.int32)[docs]
+        docs = docs[np.lexsort((orders, -total[docs]))] # 分数降序，其次目录顺序升序
+        if limit is not None:
+            docs = docs[:limit]
+        return [self._docs[doc][0] for doc in docs.tolist()]
+
+    def _posting(self, postings, gram):
+        posting = postings.get(gram)
+        return np.frombuffer(posting, dtype=np.int32) if posting else np.empty(0, dtype=np.int32)
+
+    def _field_docs(self, field, term):
+        """一个字段中包含关键词的文档编号。"""
+        postings = self._postings[field]
+        if len(term) <= 2: # 单字和相邻两字本身就是索引项，结果是精确的
+            return self._posting(postings, term)
+        # 所有 bigram 都出现的文档 (从最短的倒排表开始求交集)，再核对子串
+        bigrams = sorted({term[i:i + 2] for i in range(len(term) - 1)}, key=lambda gram: len(postings.get(gram, ())))
+        docs = self._posting(postings, bigrams[0])
+        for gram in bigrams[1:]:
+            if not len(docs):
+                break
+            docs = np.intersect1d(docs, self._posting(postings, gram), assume_unique=True)
+        docs = self._live_docs(docs)
+        return np.array([doc for doc in docs.tolist() if term in self._docs[doc][field + 1]], dtype=np.int32)
+
+    def _live_docs(self, docs):
+        """去掉已删除的文档 (它们在压缩之前仍然留在倒排表中)。"""
+        return docs[np.frombuffer(self._alive, dtype=np.int8)[docs] != 0]
+
+    def _title_prefix_docs(self, term):
+        """标题中有以关键词开头的词的文档编号。"""
+        starts = self._posting(self._title_starts, term[:2])
+        if len(term) <= 2 or not len(starts):
+            return starts
+        starts = self._live_docs(starts)
+        return np.array([doc for doc in starts.tolist()
+                         if (title := self._docs[doc][1]).startswith(term) or f" {term}" in title], dtype=np.int32)
+
+    def _add_doc(self, entry, order):
+        """加入一个文档，把它的索引项追加到倒排表 (新文档的编号最大，倒排表保持有序)。"""
+        doc = len(self._docs)
+        self._docs.append(entry)
+        self._orders.append(order)
+        self._alive.append(1)
+        self._doc_ids[entry[0]] = doc
+        self._titles.setdefault(entry[1], []).append(doc)
+        for field, postings in enumerate(self._postings):
+            for gram in text_grams(entry[field + 1]):
+                try:
+                    postings[gram].append(doc)
+                except KeyError:
+                    postings[gram] = array('i', (doc,))
+        for gram in {start for word in entry[1].split() for start in (word[:1], word[:2])}:
+            posting = self._title_starts.get(gram)
+            if posting is None:
+                posting = self._title_starts[gram] = array('i')
+            posting.append(doc)
+
+    def _compact(self):
+        """去掉删除的文档，重新编号并重建倒排表。"""
+        entries = [(entry, order) for entry, order in zip(self._docs, self._orders) if entry is not None]
+        self._postings = ({}, {}, {})
+        self._title_starts, self._titles, self._docs, self._doc_ids = {}, {}, [], {}
+        self._orders, self._alive, self._dead = array('i'), array('b'), 0
+        for entry, order in entries:
+            self._add_doc(entry, order)
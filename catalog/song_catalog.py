@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲目录：按 ID 索引歌曲数据，记录已解锁的歌曲，并按解锁所需星星数排序未解锁的歌曲。
+
+查找歌曲和判断是否已解锁都是 O(1)；"获得 N 颗星星后可以解锁哪些歌" 是对按需求排序的
+未解锁歌曲列表做一次二分查找，与目录中的歌曲数量基本无关。
+
+目录条目可以只包含 ID、标题、解锁要求和资源路径 (分片目录的 manifest、编译缓存)，
+乐句和歌词由 details_loader 在 load_song() 时才读取。
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class SongCatalog:
+    """
+    歌曲目录。
+
+    参数:
+        songs (list): 歌曲数据字典列表 (每首歌至少有 "id")，列表顺序即显示顺序。
+            可以是完整的歌曲数据，也可以是不含乐句和歌词的目录条目。
+        unlocked_ids (iterable, optional): 已解锁的歌曲 ID。
+        details_loader (callable, optional): details_loader(条目) -> 完整歌曲数据 (失败时为 None)。
+            为 None 时条目本身就是完整的歌曲数据。
+
+    没有 unlock_stars_required 的锁定歌曲不能用星星解锁，不会出现在可解锁列表中。
+    """
+
+    def __init__(self, songs, unlocked_ids=(), details_loader=None):
+        self._details_loader = details_loader
+        self._songs = {} # 歌曲 ID -> 歌曲数据或目录条目 (保持原来的顺序)
+        self._loaded = {} # 歌曲 ID -> 已读取详情的完整歌曲数据 (只在有 details_loader 时使用)
+        for song in songs:
+            song_id = song.get("id")
+            if song_id and song_id not in self._songs:
+                self._songs[song_id] = song
+        self._unlocked = set()
+        self._locked_requirements = [] # 未解锁且可用星星解锁的歌曲所需星星数 (升序)
+        self._locked_ids = [] # 与 _locked_requirements 一一对应的歌曲 ID
+        self.set_unlocked(unlocked_ids)
+
+    # --- 查找 ---
+    def __len__(self):
+        return len(self._songs)
+
+    def __contains__(self, song_id):
+        return song_id in self._songs
+
+    def __iter__(self):
+        return iter(self._songs.values())
+
+    @property
+    def songs(self):
+        """所有歌曲数据 (按原来的顺序)。"""
+        return list(self._songs.values())
+
+    def get(self, song_id):
+        """返回歌曲的目录条目 (ID、标题、解锁要求、资源路径等)，不存在时返回 None。"""
+        return self._songs.get(song_id)
+
+    def load_song(self, song_id):
+        """
+        返回完整的歌曲数据 (包括乐句和歌词)。
+
+        只有目录条目的歌曲在第一次调用时读取详情并缓存；歌曲不存在或详情无效时返回 None。
+        """
+        song = self._songs.get(song_id)
+        if song is None or self._details_loader is None:
+            return song
+        loaded = self._loaded.get(song_id)
+        if loaded is None:
+            loaded = self._details_loader(song)
+            if loaded is not None:
+                self._loaded[song_id] = loaded
+        return loaded
+
+    def read_song(self, song_id):
+        """
+        返回完整的歌曲数据，但不加入缓存 (用于遍历整个目录，例如在后台建立搜索索引)。
+
+        只读取数据，可以在后台线程中调用；歌曲不存在或详情无效时返回 None。
+        """
+        song = self._songs.get(song_id)
+        if song is None or self._details_loader is None:
+            return song
+        loaded = self._loaded.get(song_id)
+        return loaded if loaded is not None else self._details_loader(song)
+
+    @staticmethod
+    def unlock_requirement(song):
+        """歌曲解锁所需的星星数，不能用星星解锁时返回 None。"""
+        required = song.get("unlock_stars_required")
+        return required if isinstance(required, (int, float)) and not isinstance(required, bool) else None
+
+    # --- 解锁状态 ---
+    @property
+    def unlocked_ids(self):
+        """已解锁的歌曲 ID 集合 (只读副本)。"""
+        return frozenset(self._unlocked)
+
+    def is_unlocked(self, song_id):
+        """歌曲是否已解锁。"""
+        return song_id in self._unlocked
+
+    def set_unlocked(self, unlocked_ids):
+        """重新设置已解锁的歌曲 (不在目录中的 ID 被忽略)，并重建未解锁歌曲的排序列表。"""
+        self._unlocked = {song_id for song_id in unlocked_ids if song_id in self._songs}
+        locked = []
+        for song_id, song in self._songs.items():
+            required = self.unlock_requirement(song)
+            if song_id not in self._unlocked and required is not None:
+                locked.append((required, song_id))
+        locked.sort()
+        self._locked_requirements = [required for required, _ in locked]
+        self._locked_ids = [song_id for _, song_id in locked]
+
+    def unlock(self, song_id):
+        """
+        解锁一首歌。
+
+        返回:
+            bool: 这首歌原来是锁定的并且现在被解锁时返回 True。
+        """
+        if song_id not in self._songs or song_id in self._unlocked:
+            return False
+        self._unlocked.add(song_id)
+        required = self.unlock_requirement(self._songs[song_id])
+        if required is not None:
+            # 在需求相同的一段中找到这首歌并移除
+            index = bisect_left(self._locked_requirements, required)
+            end = bisect_right(self._locked_requirements, required)
+            for i in range(index, end):
+                if self._locked_ids[i] == song_id:
+                    del self._locked_requirements[i]
+                    del self._locked_ids[i]
+                    break
+        return True
+
+    def unlockable_ids(self, total_stars):
+        """有 total_stars 颗星星时可以解锁 (但尚未解锁) 的歌曲 ID，按所需星星数升序。"""
+        return self._locked_ids[:bisect_right(self._locked_requirements, total_stars)]
+
+    def unlock_affordable(self, total_stars):
+        """
+        解锁所有 total_stars 颗星星足以解锁的歌曲。
+
+        返回:
+            list: 新解锁的歌曲数据，按所需星星数升序。
+        """
+        count = bisect_right(self._locked_requirements, total_stars)
+        if count == 0:
+            return []
+        song_ids = self._locked_ids[:count]
+        del self._locked_requirements[:count]
+        del self._locked_ids[:count]
+        self._unlocked.update(song_ids)
+        return [self._songs[song_id] for song_id in song_ids]
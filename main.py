@@ -2,17 +2,28 @@ import sys
 import json
 import os
 import sys # Re-import sys to use sys.maxsize
+import sqlite3
 
-from PyQt6.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget, QStackedWidget, QMessageBox
-from PyQt6.QtCore import Qt, QUrl, QStandardPaths # Import pyqtSignal
+from PyQt6.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget, QStackedWidget, QMessageBox, QInputDialog
+from PyQt6.QtGui import QActionGroup
+from PyQt6.QtCore import Qt, QUrl, QStandardPaths, QTimer # Import pyqtSignal
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QMediaDevices
 
 # From widgets package
 from widgets.song_selection_widget import SongSelectionWidget
 from widgets.learning_widget import LearningWidget
+from audio.devices import AudioDeviceService
+from audio.song_audio import SongAudioLoader
+from catalog.compiled import load_catalog_cached
+from catalog.song_catalog import SongCatalog
+from progress.aggregates import ScoreAggregates
+from progress.journal import Attempt
+from progress.store import open_progress_store
 
 # Define data file paths
 SONGS_DATA_PATH = os.path.join(os.path.dirname(__file__), 'data', 'songs.json')
+# Sharded catalog (manifest + per-song detail files, see catalog.manifest); preferred over songs.json when present
+CATALOG_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'data', 'catalog', 'manifest.json')
 USER_DATA_DIR = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
 if USER_DATA_DIR == "" or not os.access(os.path.dirname(USER_DATA_DIR) if os.path.dirname(USER_DATA_DIR) else ".", os.W_OK):
     # Fallback if standard location is not available or not writable
@@ -44,18 +55,24 @@ class MainWindow(QMainWindow):
         self._load_songs_data()
         if not self.all_songs_data:
              # Only show critical error if file exists but is invalid/empty
-             if os.path.exists(SONGS_DATA_PATH):
-                 QMessageBox.critical(self, "错误", f"无法加载歌曲数据文件: {SONGS_DATA_PATH}\n请检查文件是否存在且格式正确。应用程序将退出。")
+             if os.path.exists(self.songs_data_path):
+                 QMessageBox.critical(self, "错误", f"无法加载歌曲数据文件: {self.songs_data_path}\n请检查文件是否存在且格式正确。应用程序将退出。")
                  sys.exit(1)
              else:
-                 QMessageBox.critical(self, "致命错误", f"歌曲数据文件未找到：\n{SONGS_DATA_PATH}\n应用程序将退出。")
+                 QMessageBox.critical(self, "致命错误", f"歌曲数据文件未找到：\n{self.songs_data_path}\n应用程序将退出。")
                  sys.exit(1)
 
 
+        # Progress lives behind a storage interface: a multi-profile SQLite database (WAL) by default,
+        # with user_progress.json and the attempt journal imported on first run.
+        # Per-song and per-phrase best/mean/count are kept up to date by the store on every attempt
+        self.score_aggregates = ScoreAggregates()
+        self.progress_store = open_progress_store(USER_DATA_DIR, USER_PROGRESS_PATH, self)
         self._load_user_progress()
+        self.catalog.set_unlocked(self.user_progress["unlocked_song_ids"])
 
         # Set window properties
-        self.setWindowTitle("小歌星成长记 - Happy Sing!")
+        self._update_window_title()
         self.setGeometry(100, 100, 800, 600)
         self.setMinimumSize(800, 600)
 
@@ -67,17 +84,28 @@ class MainWindow(QMainWindow):
 
         # 歌曲选择控件
         # **确保这里没有传递 try_unlock_signal 参数**
-        self.song_selection_widget = SongSelectionWidget(songs_data=self.all_songs_data, user_progress=self.user_progress)
+        self.song_selection_widget = SongSelectionWidget(songs_data=self.all_songs_data, user_progress=self.user_progress,
+                                                         score_aggregates=self.score_aggregates)
         self.song_selection_widget.song_selected.connect(self.on_song_selected)
+        self.song_selection_widget.song_hovered.connect(self.on_song_hovered)
 
         # **确保连接的是 song_selection_widget 实例的 try_unlock_song_signal 信号**
         self.song_selection_widget.try_unlock_song_signal.connect(self.on_try_unlock_song)
 
         self.stacked_widget.addWidget(self.song_selection_widget) # 索引 0
 
+        # Shared audio device service: PortAudio is initialized once, in the background, after the window shows
+        self.audio_device_service = AudioDeviceService(self)
+        self.audio_device_service.ready.connect(self._on_audio_devices_ready)
+
+        # Shared song audio decoder: songs start decoding in the background when hovered or selected
+        self.song_audio_loader = SongAudioLoader(self)
+
         # 学习控件
-        self.learning_widget = LearningWidget()
+        self.learning_widget = LearningWidget(device_service=self.audio_device_service, song_loader=self.song_audio_loader,
+                                              score_aggregates=self.score_aggregates)
         self.learning_widget.back_to_select.connect(self.on_back_to_song_select)
+        self.learning_widget.attempt_recorded.connect(self.on_attempt_recorded)
         self.learning_widget.stars_earned.connect(self.on_stars_earned)
         self.learning_widget.song_completed.connect(self.on_song_completed)
 
@@ -86,87 +114,147 @@ class MainWindow(QMainWindow):
         # 设置初始控件
         self.stacked_widget.setCurrentWidget(self.song_selection_widget)
 
+        # Profile menu: switching children reloads progress without restarting the window
+        self._profile_action_group = None
+        self._build_profile_menu()
+
+        self._warmup_started = False # Heavy analysis imports are warmed up once, after the first show
+
 
 
     def _load_songs_data(self):
-        """Loads all song data from JSON file."""
+        """
+        Loads the song catalog: the sharded manifest if present, otherwise the single-file songs.json.
+
+        With a manifest only the per-song entries (id, title, unlock requirement, asset paths) are read here;
+        phrases and lyrics are loaded in on_song_selected.
+        """
         self.all_songs_data = []
-        if os.path.exists(SONGS_DATA_PATH):
+        details_loader = None
+        self.songs_data_path = CATALOG_MANIFEST_PATH if os.path.exists(CATALOG_MANIFEST_PATH) else SONGS_DATA_PATH
+        if os.path.exists(self.songs_data_path):
             try:
-                with open(SONGS_DATA_PATH, 'r', encoding='utf-8') as f:
-                    self.all_songs_data = json.load(f)
-                print(f"Successfully loaded {len(self.all_songs_data)} songs data.")
-                # Validate minimum required fields for each song
-                self.all_songs_data = [s for s in self.all_songs_data if s.get("id") and s.get("title") and isinstance(s.get("phrases"), list)]
-                print(f"After validation, {len(self.all_songs_data)} valid songs remain.")
+                # Entries missing the minimum required fields are dropped while loading; the validated catalog
+                # is kept in a compiled cache in USER_DATA_DIR and reused until the source file changes
+                self.all_songs_data, details_loader, from_cache = load_catalog_cached(self.songs_data_path, USER_DATA_DIR)
+                print(f"Successfully loaded {len(self.all_songs_data)} valid songs from {self.songs_data_path}"
+                      f"{' (compiled cache)' if from_cache else ''}.")
             except Exception as e:
                 print(f"Error loading or parsing songs data file: {e}")
                 self.all_songs_data = []
         else:
-            print(f"Songs data file not found: {SONGS_DATA_PATH}")
+            print(f"Songs data file not found: {self.songs_data_path}")
             self.all_songs_data = []
-
-    def _load_user_progress(self):
-        """Loads user progress from JSON file."""
-        self.user_progress = DEFAULT_USER_PROGRESS.copy()
-        if os.path.exists(USER_PROGRESS_PATH):
-            try:
-                with open(USER_PROGRESS_PATH, 'r', encoding='utf-8') as f:
-                    loaded_progress = json.load(f)
-                    # Validate and merge loaded data
-                    if isinstance(loaded_progress, dict):
-                         # Validate total_stars
-                         if "total_stars" in loaded_progress and isinstance(loaded_progress["total_stars"], (int, float)):
-                              self.user_progress["total_stars"] = max(0, int(loaded_progress["total_stars"])) # Ensure non-negative
-
-                         # Validate unlocked_song_ids
-                         if "unlocked_song_ids" in loaded_progress and isinstance(loaded_progress["unlocked_song_ids"], list):
-                              # Ensure unlocked_song_ids are valid song IDs from songs data and are unique
-                              valid_song_ids_from_data = {s.get("id") for s in self.all_songs_data if s.get("id")}
-                              # Start with default unlocked IDs and add valid IDs from loaded data
-                              initial_unlocked = set(DEFAULT_USER_PROGRESS["unlocked_song_ids"])
-                              loaded_unlocked = set(loaded_progress["unlocked_song_ids"])
-                              # Only keep IDs that are in the loaded data AND exist in songs.json
-                              self.user_progress["unlocked_song_ids"] = list(initial_unlocked | (loaded_unlocked & valid_song_ids_from_data))
-                              # Ensure the first default song is always unlocked if it exists in data
-                              if "pawpatrol" in valid_song_ids_from_data and "pawpatrol" not in self.user_progress["unlocked_song_ids"]:
-                                   self.user_progress["unlocked_song_ids"].append("pawpatrol")
-
-
-                    print(f"Successfully loaded user progress from {USER_PROGRESS_PATH}. Total stars: {self.user_progress.get('total_stars', 0)}")
-            except Exception as e:
-                print(f"Error loading user progress file: {e}")
-                print("Using default user progress.")
-                # If load failed, ensure default unlocked song is present if it exists in song data
-                valid_song_ids_from_data = {s.get("id") for s in self.all_songs_data if s.get("id")}
-                if "pawpatrol" in valid_song_ids_from_data and "pawpatrol" not in self.user_progress["unlocked_song_ids"]:
-                      self.user_progress["unlocked_song_ids"].append("pawpatrol")
-
-
+        # Indexed view of the songs: id lookup, unlocked set, locked songs sorted by unlock requirement
+        self.catalog = SongCatalog(self.all_songs_data, details_loader=details_loader)
+
+    def _load_user_progress(self, profile_id=None):
+        """Opens a profile in the progress store (the last used one by default) and validates its progress."""
+        profile_ids = [pid for pid, _ in self.progress_store.profiles()]
+        if profile_id is None:
+            profile_id = self.progress_store.active_profile_id
+        if profile_id not in profile_ids:
+            profile_id = profile_ids[0]
+        loaded_progress = self.progress_store.open_profile(profile_id, self.score_aggregates)
+
+        # Copy the default list so appending unlocks never modifies DEFAULT_USER_PROGRESS
+        self.user_progress = {"total_stars": DEFAULT_USER_PROGRESS["total_stars"],
+                              "unlocked_song_ids": list(DEFAULT_USER_PROGRESS["unlocked_song_ids"])}
+        # Validate and merge loaded data
+        if isinstance(loaded_progress, dict):
+             # Validate total_stars
+             if "total_stars" in loaded_progress and isinstance(loaded_progress["total_stars"], (int, float)):
+                  self.user_progress["total_stars"] = max(0, int(loaded_progress["total_stars"])) # Ensure non-negative
+
+             # Validate unlocked_song_ids
+             if "unlocked_song_ids" in loaded_progress and isinstance(loaded_progress["unlocked_song_ids"], list):
+                  # Ensure unlocked_song_ids are valid song IDs from songs data and are unique
+                  valid_song_ids_from_data = {song_id for song_id in loaded_progress["unlocked_song_ids"] if song_id in self.catalog}
+                  # Start with default unlocked IDs and add valid IDs from loaded data
+                  initial_unlocked = set(DEFAULT_USER_PROGRESS["unlocked_song_ids"])
+                  # Only keep IDs that are in the loaded data AND exist in songs.json
+                  self.user_progress["unlocked_song_ids"] = list(initial_unlocked | valid_song_ids_from_data)
+             print(f"Successfully loaded progress of profile {profile_id}. Total stars: {self.user_progress.get('total_stars', 0)}")
         else:
-            print(f"User progress file not found: {USER_PROGRESS_PATH}. Using default progress.")
-            # Ensure the first default song is always unlocked if it exists in data
-            valid_song_ids_from_data = {s.get("id") for s in self.all_songs_data if s.get("id")}
-            if "pawpatrol" in valid_song_ids_from_data and "pawpatrol" not in self.user_progress["unlocked_song_ids"]:
-                 self.user_progress["unlocked_song_ids"].append("pawpatrol")
+            print(f"No saved progress for profile {profile_id}. Using default progress.")
 
+        # Ensure the first default song is always unlocked if it exists in data
+        if "pawpatrol" in self.catalog and "pawpatrol" not in self.user_progress["unlocked_song_ids"]:
+             self.user_progress["unlocked_song_ids"].append("pawpatrol")
 
     def _save_user_progress(self):
-        """Saves current user progress to JSON file."""
+        """
+        Saves stars and unlocked songs of the current profile. The store keeps this off the GUI thread:
+        SQLite commits small WAL transactions from a writer thread, the JSON fallback writes in the background, debounced.
+        """
+        # Only save the relevant fields
+        progress_to_save = {
+            "total_stars": self.user_progress.get("total_stars", 0),
+            # Ensure unlocked_song_ids are unique before saving
+            "unlocked_song_ids": list(set(self.user_progress.get("unlocked_song_ids", DEFAULT_USER_PROGRESS["unlocked_song_ids"])))
+        }
         try:
-            os.makedirs(os.path.dirname(USER_PROGRESS_PATH), exist_ok=True)
-            # Only save the relevant fields
-            progress_to_save = {
-                "total_stars": self.user_progress.get("total_stars", 0),
-                # Ensure unlocked_song_ids are unique before saving
-                "unlocked_song_ids": list(set(self.user_progress.get("unlocked_song_ids", DEFAULT_USER_PROGRESS["unlocked_song_ids"])))
-            }
-            with open(USER_PROGRESS_PATH, 'w', encoding='utf-8') as f:
-                json.dump(progress_to_save, f, indent=4)
-            print(f"User progress saved to {USER_PROGRESS_PATH}.")
+            self.progress_store.save_progress(progress_to_save)
         except Exception as e:
-            print(f"Error saving user progress file: {e}")
-            # QMessageBox.warning(self, "保存失败", f"无法保存用户进度文件：{e}") # Avoid showing too many popups
+            print(f"Error saving user progress: {e}")
+
+    # --- Profiles ---
+
+    def _update_window_title(self):
+        """Shows the current profile's name in the window title when there are several profiles."""
+        title = "小歌星成长记 - Happy Sing!"
+        profiles = dict(self.progress_store.profiles())
+        if self.progress_store.supports_profiles and len(profiles) > 1:
+            title += f" - {profiles.get(self.progress_store.active_profile_id, '')}"
+        self.setWindowTitle(title)
+
+    def _build_profile_menu(self):
+        """(Re)builds the profile menu: one checkable entry per profile plus "new profile"."""
+        if not self.progress_store.supports_profiles:
+            return
+        menu_bar = self.menuBar()
+        menu_bar.clear()
+        if self._profile_action_group is not None:
+            self._profile_action_group.deleteLater()
+        profile_menu = menu_bar.addMenu("用户")
+        self._profile_action_group = QActionGroup(self)
+        for profile_id, name in self.progress_store.profiles():
+            action = profile_menu.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(profile_id == self.progress_store.active_profile_id)
+            action.triggered.connect(lambda checked, profile_id=profile_id: self.switch_profile(profile_id))
+            self._profile_action_group.addAction(action)
+        profile_menu.addSeparator()
+        profile_menu.addAction("新建用户...").triggered.connect(self._on_new_profile)
+
+    def _on_new_profile(self):
+        """Slot: Asks for a name, creates the profile and switches to it."""
+        name, ok = QInputDialog.getText(self, "新建用户", "名字：")
+        if not ok:
+            self._build_profile_menu() # Restore the checked entry
+            return
+        try:
+            profile_id = self.progress_store.create_profile(name)
+        except ValueError as e:
+            QMessageBox.information(self, "无法新建用户", str(e))
+            return
+        self.switch_profile(profile_id)
+
+    def switch_profile(self, profile_id):
+        """Switches to another profile's progress and score aggregates without restarting the window."""
+        if profile_id != self.progress_store.active_profile_id:
+            if self.stacked_widget.currentWidget() is self.learning_widget:
+                self.on_back_to_song_select() # Stops playback and recording of the current profile
+            # A take still being analyzed belongs to the current profile: drop it before the store switches,
+            # otherwise its attempt and stars would be recorded for the new profile
+            self.learning_widget.discard_pending_analysis()
+            self._save_user_progress()
+            self._load_user_progress(profile_id)
+            self.catalog.set_unlocked(self.user_progress["unlocked_song_ids"])
+            self.song_selection_widget.update_ui_based_on_progress(self.user_progress)
+            self.learning_widget.set_total_stars_display(self.user_progress.get("total_stars", 0))
+        self._build_profile_menu()
+        self._update_window_title()
 
     # --- Slots ---
 
@@ -174,11 +262,8 @@ class MainWindow(QMainWindow):
         """Slot: Handles song selection."""
         print(f"MainWindow received selected song ID: {song_id}")
 
-        selected_song_data = None
-        for song in self.all_songs_data:
-            if song.get("id") == song_id:
-                selected_song_data = song
-                break
+        # Phrases and lyrics of a sharded catalog are only read now
+        selected_song_data = self.catalog.load_song(song_id)
 
         if selected_song_data:
             # Before switching, set song data and current stars in learning widget
@@ -192,14 +277,19 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", f"未找到歌曲数据：{song_id}")
 
 
+    def on_song_hovered(self, song_id):
+        """Slot: Starts decoding a song's audio in the background while its button is hovered."""
+        song_data = self.catalog.get(song_id)
+        audio_path = song_data.get("audio_full") if song_data else None
+        if audio_path and os.path.exists(audio_path):
+            self.song_audio_loader.request(audio_path)
+
     def on_back_to_song_select(self):
         """Slot: Handles returning to song selection."""
         print("MainWindow received signal to return to song selection.")
         # Stop any ongoing playback or recording in learning widget
         if self.learning_widget:
-            # Use the more robust way to reference PlaybackState
-            if self.learning_widget.media_player.playbackState() != self.learning_widget.media_player.playbackState().__class__.StoppedState:
-                 self.learning_widget.media_player.stop()
+            self.learning_widget.stop_playback()
             if self.learning_widget.is_recording:
                  self.learning_widget.stop_recording()
 
@@ -209,6 +299,13 @@ class MainWindow(QMainWindow):
         self.stacked_widget.setCurrentWidget(self.song_selection_widget)
         print("Switched back to song selection widget.")
 
+    def on_attempt_recorded(self, song_id, phrase_index, result):
+        """Slot: Saves one analyzed recording in the progress store (which also updates the score aggregates)."""
+        try:
+            self.progress_store.record_attempt(Attempt.from_result(song_id, phrase_index, result))
+        except Exception as e:
+            print(f"Error recording attempt: {e}")
+
     def on_stars_earned(self, stars):
         """Slot: Handles stars earned for a phrase."""
         print(f"MainWindow received stars earned for a phrase: {stars}")
@@ -224,32 +321,16 @@ class MainWindow(QMainWindow):
         print(f"--- on_song_completed triggered for song ID: {song_id} ---")
         print(f"Current user progress before unlock check: {self.user_progress}")
 
-        # Check for new songs unlocked based on the NEW total stars
-        unlocked_something = False
-        print("Checking songs for unlock:")
-        valid_song_ids = {s.get("id") for s in self.all_songs_data if s.get("id")} # Get valid IDs once
-
-        # Iterate through songs to find newly unlockable ones
+        # Check for new songs unlocked based on the NEW total stars:
+        # a bisect over the locked songs sorted by unlock requirement, not a scan of the whole catalog
+        current_stars = self.user_progress.get("total_stars", 0)
+        newly_unlocked_songs = self.catalog.unlock_affordable(current_stars)
         newly_unlocked_titles = []
-        for song_data in self.all_songs_data:
-             current_song_id = song_data.get("id")
-             # Ensure song_data has a valid ID and is not already unlocked
-             if current_song_id and current_song_id in valid_song_ids and current_song_id not in self.user_progress.get("unlocked_song_ids", []):
-                  required_stars = song_data.get("unlock_stars_required", sys.maxsize) # Use maxsize if requirement not set
-                  current_stars = self.user_progress.get("total_stars", 0)
-
-                  # print(f"  - Checking unlock for '{song_data.get('title', current_song_id)}': Current Stars = {current_stars}, Required Stars = {required_stars}")
-
-                  if current_stars >= required_stars:
-                       # Unlock this song
-                       self.user_progress["unlocked_song_ids"].append(current_song_id)
-                       unlocked_something = True
-                       newly_unlocked_titles.append(song_data.get('title', '新歌曲'))
-                       print(f"    - SUCCESSFULLY Unlocked song: {song_data.get('title', current_song_id)}")
-                  # else:
-                       # print(f"    - Cannot unlock '{song_data.get('title', current_song_id)}': Not enough stars.")
-             # else: # Already unlocked or invalid song data, no action needed
-             #    pass # print(f"  - Song '{song_data.get('title', current_song_id)}' is already unlocked or invalid or already unlocked.")
+        for song_data in newly_unlocked_songs:
+             self.user_progress["unlocked_song_ids"].append(song_data["id"])
+             newly_unlocked_titles.append(song_data.get('title', '新歌曲'))
+             print(f"    - SUCCESSFULLY Unlocked song: {song_data.get('title', song_data['id'])}")
+        unlocked_something = bool(newly_unlocked_songs)
 
 
         if unlocked_something:
@@ -266,15 +347,16 @@ class MainWindow(QMainWindow):
     def on_try_unlock_song(self, song_id):
         """Slot: Handles unlock request from SongSelectionWidget."""
         print(f"MainWindow received unlock request for song ID: {song_id}")
-        song_data = next((s for s in self.all_songs_data if s.get("id") == song_id), None)
+        song_data = self.catalog.get(song_id)
 
         # Check if song exists and is currently locked
-        if song_data and song_id not in self.user_progress.get("unlocked_song_ids", []):
+        if song_data and not self.catalog.is_unlocked(song_id):
             required_stars = song_data.get("unlock_stars_required", sys.maxsize)
             current_stars = self.user_progress.get("total_stars", 0)
 
             if current_stars >= required_stars:
                  # Perform unlock logic directly
+                 self.catalog.unlock(song_id)
                  self.user_progress["unlocked_song_ids"].append(song_id)
                  # Optionally deduct stars here if unlock cost is involved (not in current spec)
                  print(f"Attempted unlock successful for song: {song_data.get('title', song_id)}")
@@ -288,14 +370,49 @@ class MainWindow(QMainWindow):
                 QMessageBox.information(self, "星星不足", f"解锁这首歌需要 ⭐ {required_stars} 颗星星，您还差 ⭐ {required_stars - current_stars} 颗。")
 
 
+    def showEvent(self, event):
+        """Starts the background analysis warm-up and search indexing once the song list is on screen."""
+        super().showEvent(event)
+        if not self._warmup_started:
+            self._warmup_started = True
+            # Defer to the next event loop iteration so the first paint is not delayed
+            QTimer.singleShot(0, self.audio_device_service.start)
+            QTimer.singleShot(0, self.learning_widget.start_background_warmup)
+            # Song search index (titles, themes and lyrics read from the song details) is built in the background
+            QTimer.singleShot(0, lambda: self.song_selection_widget.build_search_index(self.catalog.read_song))
+
+    def _on_audio_devices_ready(self):
+        """Slot: Startup microphone check, published by the shared audio device service."""
+        if not self.audio_device_service.has_input:
+            print("警告: 应用程序启动时未检测到任何音频输入设备 (麦克风)。录音功能将无法使用。")
+            # Optionally show a message box:
+            # QMessageBox.warning(self, "无音频输入设备", "未检测到麦克风设备。\n歌曲录音功能将无法使用。")
+
     def closeEvent(self, event):
         """Saves user progress before closing."""
         print("MainWindow closing. Saving progress...")
         self._save_user_progress()
+        # Writes anything still pending synchronously; if that fails, ask instead of silently losing the stars
+        while True:
+            try:
+                self.progress_store.close()
+                break
+            except (sqlite3.Error, OSError) as e:
+                answer = QMessageBox.critical(
+                    self, "保存进度失败", f"星星和练习记录没有保存：\n{e}\n\n重试，还是不保存直接退出？",
+                    QMessageBox.StandardButton.Retry | QMessageBox.StandardButton.Discard | QMessageBox.StandardButton.Cancel)
+                if answer == QMessageBox.StandardButton.Cancel:
+                    event.ignore() # Keep the window open, the store still holds the changes
+                    return
+                if answer == QMessageBox.StandardButton.Discard:
+                    break
         if self.learning_widget:
              # Make sure to call the child widget's closeEvent first for its cleanup
-             # The LearningWidget's closeEvent will terminate PyAudio
+             # The LearningWidget's closeEvent releases its input stream
              self.learning_widget.closeEvent(event) # Pass the event to the child
+        # Terminate PortAudio once, after every stream has been closed
+        self.audio_device_service.terminate()
+        self.song_audio_loader.wait_for_done(2000)
 
         super().closeEvent(event) # Call parent class's closeEvent
         # event.accept() # The default behavior is usually accept if not ignored earlier
@@ -328,10 +445,9 @@ def main():
 if __name__ == "__main__":
     # Check if required libraries are installed before running
     try:
+        # librosa/scipy are imported lazily in the background after the window shows (see audio.warmup)
         import pyaudio
         import numpy as np
-        import librosa
-        import scipy.signal
         from PyQt6.QtWidgets import QMessageBox # Import here for early check
     except ImportError as e:
         msg = f"缺少必要的Python库，请安装：\n{e}\n\n运行以下命令安装:\npip install -r requirements.txt"
@@ -346,18 +462,8 @@ if __name__ == "__main__":
          # Optionally show a message box:
          # QMessageBox.warning(None, "无音频输出设备", "未检测到默认音频输出设备。\n歌曲播放功能可能无法正常使用。")
 
-    # Check if a microphone input device exists
-    try:
-        p = pyaudio.PyAudio()
-        if p.get_device_count() == 0:
-             print("警告: 应用程序启动时未检测到任何音频输入设备 (麦克风)。录音功能将无法使用。")
-             # Optionally show a message box:
-             # QMessageBox.warning(None, "无音频输入设备", "未检测到麦克风设备。\n歌曲录音功能将无法使用。")
-        p.terminate() # Clean up the PyAudio instance used for the check
-    except Exception as e:
-         print(f"警告: 列举音频输入设备时发生错误: {e}. 录音功能可能无法使用。")
-         # Optionally show a message box:
-         # QMessageBox.warning(None, "麦克风设备错误", f"列举麦克风设备时发生错误：{e}\n录音功能可能无法使用。")
+    # The microphone check runs asynchronously after the window shows
+    # (MainWindow._on_audio_devices_ready, fed by the shared AudioDeviceService)
 
 
     main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+按歌曲和乐句维护的得分统计。
+
+每条练习记录 (progress.journal.Attempt) 到来时只更新对应乐句和歌曲的计数、星星总数和最好成绩，
+开销是 O(1)；选歌界面等直接读取统计结果，不需要扫描历史记录。统计作为 AttemptJournal 的一个状态
+保存在快照中，启动时由快照和日志尾部恢复。
+"""
+
+
+class ScoreStats:
+    """
+    一组练习的得分统计。
+
+    属性:
+        count (int): 练习次数。
+        total_stars (int): 获得的星星总数。
+        best (int): 单次最好成绩 (星星数)。
+    """
+
+    def __init__(self, count=0, total_stars=0, best=0):
+        self.count = count
+        self.total_stars = total_stars
+        self.best = best
+
+    @property
+    def mean(self):
+        """平均每次获得的星星数，没有练习时为 0.0。"""
+        return self.total_stars / self.count if self.count else 0.0
+
+    def add(self, stars):
+        """加入一次成绩，返回最好成绩增加了多少。"""
+        self.count += 1
+        self.total_stars += stars
+        improvement = max(0, stars - self.best)
+        self.best += improvement
+        return improvement
+
+    def to_list(self):
+        return [self.count, self.total_stars, self.best]
+
+    @classmethod
+    def from_list(cls, values):
+        count, total_stars, best = values
+        return cls(int(count), int(total_stars), int(best))
+
+
+class SongScoreStats(ScoreStats):
+    """
+    一首歌的得分统计：在 ScoreStats 之外记录各乐句最好成绩之和。
+
+    属性:
+        best_total (int): 每个乐句最好成绩的总和 (这首歌目前能拿到的最多星星)。
+    """
+
+    def __init__(self, count=0, total_stars=0, best=0, best_total=0):
+        super().__init__(count, total_stars, best)
+        self.best_total = best_total
+
+    def to_list(self):
+        return super().to_list() + [self.best_total]
+
+    @classmethod
+    def from_list(cls, values):
+        count, total_stars, best, best_total = values
+        return cls(int(count), int(total_stars), int(best), int(best_total))
+
+
+class ScoreAggregates:
+    """
+    所有歌曲和乐句的得分统计 (AttemptJournal 的状态，提供 apply/snapshot/restore)。
+
+    只在 GUI 线程中修改和读取。
+    """
+
+    def __init__(self):
+        self._songs = {} # 歌曲 ID -> SongScoreStats
+        self._phrases = {} # (歌曲 ID, 乐句索引) -> ScoreStats
+
+    def song(self, song_id):
+        """返回歌曲的统计，没有练习过时返回 None。"""
+        return self._songs.get(song_id)
+
+    def phrase(self, song_id, phrase_index):
+        """返回乐句的统计，没有练习过时返回 None。"""
+        return self._phrases.get((song_id, phrase_index))
+
+    def phrase_items(self):
+        """返回 ((歌曲 ID, 乐句索引), ScoreStats) 的列表。"""
+        return list(self._phrases.items())
+
+    def clear(self):
+        """清空统计 (切换用户时)。"""
+        self._songs.clear()
+        self._phrases.clear()
+
+    def load_phrase_stats(self, rows):
+        """
+        由各乐句的统计重建全部统计 (歌曲统计由乐句统计汇总得到)。
+
+        参数:
+            rows (iterable): (歌曲 ID, 乐句索引, 练习次数, 星星总数, 最好成绩) 元组。
+        """
+        self.clear()
+        for song_id, phrase_index, count, total_stars, best in rows:
+            self._phrases[(song_id, phrase_index)] = ScoreStats(count, total_stars, best)
+            song_stats = self._songs.get(song_id)
+            if song_stats is None:
+                song_stats = self._songs[song_id] = SongScoreStats()
+            song_stats.count += count
+            song_stats.total_stars += total_stars
+            song_stats.best = max(song_stats.best, best)
+            song_stats.best_total += best
+
+    def apply(self, attempt):
+        """加入一条练习记录。"""
+        key = (attempt.song_id, attempt.phrase_index)
+        phrase_stats = self._phrases.get(key)
+        if phrase_stats is None:
+            phrase_stats = self._phrases[key] = ScoreStats()
+        song_stats = self._songs.get(attempt.song_id)
+        if song_stats is None:
+            song_stats = self._songs[attempt.song_id] = SongScoreStats()
+        song_stats.best_total += phrase_stats.add(attempt.stars)
+        song_stats.add(attempt.stars)
+
+    def snapshot(self):
+        phrases = {}
+        for (song_id, phrase_index), stats in self._phrases.items():
+            phrases.setdefault(song_id, {})[str(phrase_index)] = stats.to_list()
+        return {"songs": {song_id: stats.to_list() for song_id, stats in self._songs.items()}, "phrases": phrases}
+
+    def restore(self, data):
+        self._songs = {song_id: SongScoreStats.from_list(values) for song_id, values in data.get("songs", {}).items()}
+        self._phrases = {(song_id, int(phrase_index)): ScoreStats.from_list(values)
+                         for song_id, song_phrases in data.get("phrases", {}).items()
+                         for phrase_index, values in song_phrases.items()}
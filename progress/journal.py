@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+只追加的练习记录日志。
+
+每次录音分析的结果 (RMS 能量、检测到音高的百分比、起始点数量、星星等) 作为一行紧凑的 JSON 数组
+追加到 attempts.journal，每次的开销与历史长度无关。内存中的状态 (例如最近的记录、得分统计)
+由日志中的记录依次 apply 得到；记录条数超过阈值时在后台把当前状态写成快照 attempts.snapshot.json，
+再把日志中已经包含在快照里的记录删掉。启动时读取快照，然后只重放快照之后的日志尾部，
+使用多年之后启动时间也不会变长。
+
+每条记录带有递增的序号，快照记录它包含的最后一个序号，所以压缩过程中任何时候程序退出都不会
+丢失或重复记录：快照先写入，日志后删减，重放时跳过序号不大于快照序号的记录。
+
+日志行格式 (字段顺序见 ATTEMPT_FIELDS):
+    [序号, 时间戳, 歌曲 ID, 乐句索引, 星星, RMS 能量, 音高百分比, 起始点数, 录音时长]
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from audio.analysis_worker import run_in_background
+from progress.writer import write_json_atomic
+
+JOURNAL_FILE_NAME = "attempts.journal"
+SNAPSHOT_FILE_NAME = "attempts.snapshot.json"
+SNAPSHOT_VERSION = 1
+JOURNAL_COMPACT_THRESHOLD = 500 # 日志中快照之后的记录超过这个数量时在后台压缩
+RECENT_ATTEMPTS_LIMIT = 100 # RecentAttempts 保留的记录数
+ATTEMPT_FIELDS = ("seq", "timestamp", "song_id", "phrase_index", "stars",
+                  "rms_energy", "pitch_detected_percentage", "num_onsets", "recorded_duration_sec")
+
+
+class Attempt:
+    """
+    一次练习 (一个乐句的一次录音) 的记录。
+
+    属性见 ATTEMPT_FIELDS；seq 由 AttemptJournal 在追加时分配。
+    """
+
+    def __init__(self, song_id, phrase_index, stars, rms_energy=0.0, pitch_detected_percentage=0.0,
+                 num_onsets=0, recorded_duration_sec=0.0, timestamp=None, seq=0):
+        self.seq = seq
+        self.timestamp = int(time.time()) if timestamp is None else int(timestamp)
+        self.song_id = song_id
+        self.phrase_index = int(phrase_index)
+        self.stars = int(stars)
+        self.rms_energy = float(rms_energy)
+        self.pitch_detected_percentage = float(pitch_detected_percentage)
+        self.num_onsets = int(num_onsets)
+        self.recorded_duration_sec = float(recorded_duration_sec)
+
+    @classmethod
+    def from_result(cls, song_id, phrase_index, result):
+        """由 audio.analysis.AnalysisResult 创建记录。"""
+        return cls(song_id, phrase_index, result.stars, result.rms_energy, result.pitch_detected_percentage,
+                   result.num_onsets, result.recorded_duration_sec)
+
+    def to_row(self):
+        """转换为日志中的一行 (列表，浮点数保留够用的精度以减小体积)。"""
+        return [self.seq, self.timestamp, self.song_id, self.phrase_index, self.stars,
+                round(self.rms_energy, 5), round(self.pitch_detected_percentage, 1),
+                self.num_onsets, round(self.recorded_duration_sec, 2)]
+
+    @classmethod
+    def from_row(cls, row):
+        """由 to_row() 的结果恢复记录 (格式不正确时抛出 ValueError / TypeError)。"""
+        if not isinstance(row, list) or len(row) < len(ATTEMPT_FIELDS):
+            raise ValueError("练习记录格式不正确")
+        seq, timestamp, song_id, phrase_index, stars, rms, pitch_percentage, onsets, duration = row[:len(ATTEMPT_FIELDS)]
+        return cls(song_id, phrase_index, stars, rms, pitch_percentage, onsets, duration, timestamp, int(seq))
+
+
+class RecentAttempts:
+    """
+    日志状态: 练习总次数和最近的 limit 条记录 (默认 RECENT_ATTEMPTS_LIMIT，None 表示保留全部)。
+
+    AttemptJournal 的状态对象都提供 apply(attempt)、snapshot() 和 restore(data) 三个方法，
+    snapshot() 返回可以序列化为 JSON 的数据，restore({}) 把状态清空。
+    """
+
+    def __init__(self, limit=RECENT_ATTEMPTS_LIMIT):
+        self.count = 0
+        self.attempts = deque(maxlen=limit)
+
+    def apply(self, attempt):
+        self.count += 1
+        self.attempts.append(attempt)
+
+    def snapshot(self):
+        return {"count": self.count, "attempts": [attempt.to_row() for attempt in self.attempts]}
+
+    def restore(self, data):
+        self.count = int(data.get("count", 0))
+        self.attempts.clear()
+        self.attempts.extend(Attempt.from_row(row) for row in data.get("attempts", []))
+
+
+class AttemptJournal:
+    """
+    练习记录日志 (在 GUI 线程中调用 open/append/close，压缩在后台线程中进行)。
+
+    参数:
+        directory (str): 日志和快照所在的目录 (与 user_progress.json 相同)。
+        states (dict, optional): 状态名 -> 状态对象，默认只有 {"recent": RecentAttempts()}。
+        compact_threshold (int, optional): 触发后台压缩的日志记录数。
+    """
+
+    def __init__(self, directory, states=None, compact_threshold=JOURNAL_COMPACT_THRESHOLD):
+        self.journal_path = os.path.join(directory, JOURNAL_FILE_NAME)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE_NAME)
+        self.states = states if states is not None else {"recent": RecentAttempts()}
+        self.compact_threshold = compact_threshold
+        self.last_seq = 0 # 最后一条记录的序号
+        self._tail_count = 0 # 日志中快照之后的记录数
+        self._file = None
+        self._lock = threading.Lock() # 保护日志文件 (追加和压缩时的删减)
+        self._compacting = threading.Lock() # 同一时间只有一次压缩
+
+    def open(self):
+        """读取快照并重放日志尾部，然后打开日志准备追加。"""
+        snapshot_seq = self._load_snapshot()
+        self.last_seq = snapshot_seq
+        self._tail_count = 0
+        complete = True # 最后一行是否以换行结束
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    complete = line.endswith("\n")
+                    attempt = self._parse_line(line)
+                    if attempt is None or attempt.seq <= snapshot_seq:
+                        continue
+                    self._apply(attempt)
+                    self.last_seq = max(self.last_seq, attempt.seq)
+                    self._tail_count += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"读取练习记录日志失败: {e}")
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        if not complete: # 上次退出时最后一行没有写完，新记录另起一行
+            self._file.write("\n")
+        print(f"练习记录: 快照序号 {snapshot_seq}，重放 {self._tail_count} 条日志。")
+        self._maybe_compact()
+
+    def append(self, attempt):
+        """
+        分配序号、更新状态并把记录追加到日志 (一次小的顺序写入)。
+
+        返回:
+            Attempt: 传入的记录 (seq 已设置)。
+        """
+        self.last_seq += 1
+        attempt.seq = self.last_seq
+        self._apply(attempt)
+        line = json.dumps(attempt.to_row(), ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.write(line)
+                    self._file.flush()
+                except OSError as e:
+                    print(f"写入练习记录日志失败: {e}")
+        self._tail_count += 1
+        self._maybe_compact()
+        return attempt
+
+    def compact(self):
+        """同步压缩：写入当前状态的快照并删减日志 (通常由 append 在后台触发)。"""
+        with self._compacting:
+            self._compact(self._snapshot_data())
+
+    def close(self):
+        """等待正在进行的压缩完成，然后关闭日志。"""
+        with self._compacting:
+            with self._lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+
+    def _apply(self, attempt):
+        for state in self.states.values():
+            state.apply(attempt)
+
+    def _snapshot_data(self):
+        # 在修改状态的线程 (GUI 线程) 中复制状态，后台线程只负责写文件
+        return {"version": SNAPSHOT_VERSION, "seq": self.last_seq,
+                "states": {name: state.snapshot() for name, state in self.states.items()}}
+
+    def _maybe_compact(self):
+        if self._tail_count < self.compact_threshold or not self._compacting.acquire(blocking=False):
+            return
+        self._tail_count = 0
+        run_in_background(self._compact_and_release, self._snapshot_data())
+
+    def _compact_and_release(self, data):
+        try:
+            self._compact(data)
+        finally:
+            self._compacting.release()
+
+    def _compact(self, data):
+        write_json_atomic(self.snapshot_path, data, indent=None)
+        # 日志中只保留快照之后追加的记录 (通常只有几条)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            try:
+                with open(self.journal_path, 'r', encoding='utf-8') as f:
+                    tail = [line for line in f if (attempt := self._parse_line(line)) is not None and attempt.seq > data["seq"]]
+                temp_path = self.journal_path + ".tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.writelines(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.journal_path)
+            except OSError as e:
+                print(f"压缩练习记录日志失败: {e}")
+            finally:
+                if self._file is not None:
+                    self._file = open(self.journal_path, 'a', encoding='utf-8')
+        print(f"练习记录已压缩到快照 (序号 {data['seq']})。")
+
+    def _load_snapshot(self):
+        """读取快照并恢复各个状态，返回快照的序号 (没有快照时为 0)。"""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"不支持的快照版本: {data.get('version')}")
+            states = data.get("states", {})
+            for name, state in self.states.items():
+                if name in states:
+                    state.restore(states[name])
+            return int(data.get("seq", 0))
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"读取练习记录快照失败，只使用日志: {e}")
+            # 在原来的对象上清空 (调用方持有这些状态对象，之后的重放和追加都要更新它们)
+            for state in self.states.values():
+                state.restore({})
+            return 0
+
+    @staticmethod
+    def _parse_line(line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return Attempt.from_row(json.loads(line))
+        except (ValueError, TypeError):
+            return None # 程序崩溃时最后一行可能不完整
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 进度存储 (多用户)。
+
+一台电脑上的几个孩子各自有自己的星星、已解锁歌曲和练习记录，都保存在用户数据目录的
+progress.sqlite3 中。数据库使用 WAL 模式 (synchronous=NORMAL)：每个事件 (得到星星、解锁歌曲、
+一次练习) 是一次小的事务，只向 WAL 文件追加几页，不需要重写整个进度文件，也不会每次都 fsync。
+
+星星和练习记录的写入不在 GUI 线程中执行：save_progress() 和 record_attempt() 只记下修改，
+由一个后台线程用单独的连接提交 (与 progress.writer.ProgressWriter 相同，一次写入进行期间的多次修改
+合并为下一次事务，星星总数只保留最新的值)。写入失败时保留这些修改，按递增的间隔重试；
+切换用户和关闭时同步写入，关闭时仍然无法写入则抛出异常，不会悄悄丢掉孩子的星星和练习记录。
+
+表:
+    profiles        用户 (ID、名字、星星总数)
+    unlocked_songs  每个用户已解锁的歌曲
+    attempts        练习记录 (按用户、歌曲、乐句建索引)
+    phrase_scores   每个用户每个乐句的得分统计 (练习次数、星星总数、最好成绩)，与练习记录在同一事务中更新，
+                    切换用户时直接读取，不需要扫描练习记录
+    settings        上次使用的用户等设置
+
+第一次运行时创建一个默认用户，并导入原有的 user_progress.json 和练习记录：快照中的得分统计，
+以及磁盘上还保留的全部练习记录 (快照中的记录和日志中的所有记录)。
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import Q_ARG, QMetaObject, QRunnable, Qt, QThreadPool, QTimer
+
+from progress.aggregates import ScoreAggregates
+from progress.journal import JOURNAL_FILE_NAME, SNAPSHOT_FILE_NAME, Attempt, AttemptJournal, RecentAttempts
+from progress.store import ProgressStore, read_progress_file
+
+SCHEMA_VERSION = 1
+DEFAULT_PROFILE_NAME = "小歌星"
+WRITE_RETRY_MIN_MS = 1000 # 写入失败后第一次重试的延迟 (毫秒)，之后每次加倍
+WRITE_RETRY_MAX_MS = 60000 # 重试延迟的上限
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    total_stars INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unlocked_songs (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    song_id TEXT NOT NULL,
+    PRIMARY KEY (profile_id, song_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    timestamp INTEGER NOT NULL,
+    song_id TEXT NOT NULL,
+    phrase_index INTEGER NOT NULL,
+    stars INTEGER NOT NULL,
+    rms_energy REAL NOT NULL,
+    pitch_detected_percentage REAL NOT NULL,
+    num_onsets INTEGER NOT NULL,
+    recorded_duration_sec REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_by_phrase ON attempts (profile_id, song_id, phrase_index, id);
+CREATE TABLE IF NOT EXISTS phrase_scores (
+    profile_id INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+    song_id TEXT NOT NULL,
+    phrase_index INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    total_stars INTEGER NOT NULL,
+    best INTEGER NOT NULL,
+    PRIMARY KEY (profile_id, song_id, phrase_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+_INSERT_ATTEMPT = """
+INSERT INTO attempts (profile_id, timestamp, song_id, phrase_index, stars, rms_energy,
+                      pitch_detected_percentage, num_onsets, recorded_duration_sec)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_PHRASE_SCORE = """
+INSERT INTO phrase_scores (profile_id, song_id, phrase_index, count, total_stars, best) VALUES (?, ?, ?, 1, ?, ?)
+ON CONFLICT (profile_id, song_id, phrase_index) DO UPDATE SET
+    count = count + 1, total_stars = total_stars + excluded.total_stars, best = max(best, excluded.best)
+"""
+
+
+def _attempt_params(profile_id, attempt):
+    return (profile_id, attempt.timestamp, attempt.song_id, attempt.phrase_index, attempt.stars, attempt.rms_energy,
+            attempt.pitch_detected_percentage, attempt.num_onsets, attempt.recorded_duration_sec)
+
+
+class _WriteTask(QRunnable):
+    """在后台提交尚未写入的进度和练习记录。"""
+
+    def __init__(self, store):
+        super().__init__()
+        self._store = store
+
+    def run(self):
+        self._store._write_pending()
+
+
+class SqliteProgressStore(ProgressStore):
+    """
+    SQLite 进度存储 (在 GUI 线程中调用，写入在后台线程中提交)。
+
+    参数:
+        db_path (str): 数据库文件路径。
+        legacy_progress_path (str, optional): 第一次运行时导入的 user_progress.json
+            (同一目录中的练习记录日志也会导入)。
+        parent (QObject, optional): 后台写入线程池和重试定时器的父对象。
+
+    异常:
+        sqlite3.Error / OSError: 数据库无法打开或创建。
+    """
+    supports_profiles = True
+
+    def __init__(self, db_path, legacy_progress_path=None, parent=None):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL") # WAL 模式下提交时不 fsync，断电最多丢失最后几次提交
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._initialize(legacy_progress_path)
+        except BaseException:
+            self._db.close()
+            raise
+        self._profile_id = self._setting("active_profile")
+        self._aggregates = None
+        # 后台写入使用自己的连接 (线程池的线程可能会更换，所以关闭同线程检查；同一时间只有一次写入)
+        self._writer_db = sqlite3.connect(db_path, check_same_thread=False)
+        self._writer_db.execute("PRAGMA synchronous=NORMAL")
+        self._pending_progress = None # (用户 ID, 星星总数, 已解锁歌曲) 最新的未写入进度
+        self._pending_attempts = [] # [(用户 ID, Attempt)] 未写入的练习记录
+        self._writing_attempts = [] # 正在提交的练习记录 (recent_attempts 与数据库中的记录合并)
+        self._write_scheduled = False
+        self._closed = False
+        self._lock = threading.Lock() # 保护上面几个字段
+        self._write_lock = threading.Lock() # 保证同一时间只有一次写入
+        self._pool = QThreadPool(parent)
+        self._pool.setMaxThreadCount(1)
+        self._retry_delay_ms = WRITE_RETRY_MIN_MS
+        self._retry_timer = QTimer(parent) # 写入失败后重试 (在 GUI 线程中运行，由后台线程排队启动)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self._schedule_write)
+
+    @property
+    def active_profile_id(self):
+        return self._profile_id
+
+    def profiles(self):
+        return [tuple(row) for row in self._db.execute("SELECT id, name FROM profiles ORDER BY id")]
+
+    def create_profile(self, name):
+        name = name.strip()
+        if not name:
+            raise ValueError("名字不能为空")
+        try:
+            with self._db:
+                cursor = self._db.execute("INSERT INTO profiles (name, created_at) VALUES (?, ?)", (name, int(time.time())))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"已经有叫 {name} 的用户了")
+        return cursor.lastrowid
+
+    def open_profile(self, profile_id, aggregates):
+        self.flush() # 读取之前提交上一个用户尚未写入的修改
+        row = self._db.execute("SELECT total_stars FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"用户不存在: {profile_id}")
+        unlocked = [song_id for (song_id,) in self._db.execute(
+            "SELECT song_id FROM unlocked_songs WHERE profile_id = ?", (profile_id,))]
+        aggregates.load_phrase_stats(self._db.execute(
+            "SELECT song_id, phrase_index, count, total_stars, best FROM phrase_scores WHERE profile_id = ?", (profile_id,)))
+        with self._db:
+            self._set_setting("active_profile", profile_id)
+        self._profile_id = profile_id
+        self._aggregates = aggregates
+        return {"total_stars": row[0], "unlocked_song_ids": unlocked}
+
+    def save_progress(self, progress):
+        with self._lock:
+            self._pending_progress = (self._profile_id, int(progress.get("total_stars", 0)),
+                                      list(progress.get("unlocked_song_ids", [])))
+        self._schedule_write()
+
+    def record_attempt(self, attempt):
+        """记下练习记录并立即更新得分统计，记录在后台写入 (写入后 attempt.seq 为数据库中的 ID)。"""
+        with self._lock:
+            self._pending_attempts.append((self._profile_id, attempt))
+        if self._aggregates is not None:
+            self._aggregates.apply(attempt)
+        self._schedule_write()
+
+    def recent_attempts(self, song_id, phrase_index, limit=20):
+        """
+        返回当前用户一个乐句最近的 limit 次练习记录 (新的在前)。
+
+        已提交的记录由 attempts_by_phrase 索引读出 (WAL 模式下读取不等待后台写入)，
+        再合并尚未提交的记录，不阻塞 GUI 线程。
+        """
+        # 先取未提交的记录再查询：这期间提交的记录可能两边都有，按数据库 ID 去重
+        with self._lock:
+            unsaved = [attempt for profile_id, attempt in self._writing_attempts + self._pending_attempts
+                       if profile_id == self._profile_id and attempt.song_id == song_id and attempt.phrase_index == phrase_index]
+        rows = self._db.execute(
+            "SELECT id, timestamp, song_id, phrase_index, stars, rms_energy, pitch_detected_percentage, num_onsets, "
+            "recorded_duration_sec FROM attempts WHERE profile_id = ? AND song_id = ? AND phrase_index = ? "
+            "ORDER BY id DESC LIMIT ?", (self._profile_id, song_id, phrase_index, limit))
+        saved = [Attempt.from_row(list(row)) for row in rows]
+        saved_ids = {attempt.seq for attempt in saved}
+        return ([attempt for attempt in reversed(unsaved) if attempt.seq not in saved_ids] + saved)[:limit]
+
+    def flush(self):
+        """等待正在进行的后台写入完成，然后同步提交剩下的修改 (失败时修改仍然保留)。"""
+        self._pool.waitForDone()
+        self._write_pending()
+
+    def close(self):
+        """
+        提交所有修改并关闭数据库。
+
+        异常:
+            sqlite3.Error: 仍有修改无法写入。这时数据库保持打开、修改仍然保留，可以稍后再次调用 close()。
+        """
+        self.flush()
+        with self._lock:
+            unsaved = len(self._pending_attempts), self._pending_progress is not None
+        if any(unsaved):
+            raise sqlite3.OperationalError(f"进度没有保存: {unsaved[0]} 条练习记录"
+                                           f"{'和星星/已解锁歌曲' if unsaved[1] else ''}无法写入 {self.db_path}")
+        with self._lock:
+            self._closed = True
+        self._retry_timer.stop()
+        self._pool.waitForDone()
+        self._writer_db.close()
+        self._db.close()
+
+    def _schedule_write(self):
+        with self._lock:
+            if self._write_scheduled or self._closed:
+                return # 已经排队的写入会带上这次修改
+            self._write_scheduled = True
+        self._pool.start(_WriteTask(self))
+
+    def _write_pending(self):
+        """把尚未写入的进度和练习记录在一个事务中提交 (后台线程，关闭时在 GUI 线程)。"""
+        with self._write_lock:
+            with self._lock:
+                progress, self._pending_progress = self._pending_progress, None
+                attempts, self._pending_attempts = self._pending_attempts, []
+                self._writing_attempts = attempts
+                self._write_scheduled = False
+            if progress is None and not attempts:
+                return
+            try:
+                with self._writer_db:
+                    if progress is not None:
+                        profile_id, total_stars, unlocked = progress
+                        self._writer_db.execute("UPDATE profiles SET total_stars = ? WHERE id = ?", (total_stars, profile_id))
+                        self._writer_db.executemany("INSERT OR IGNORE INTO unlocked_songs (profile_id, song_id) VALUES (?, ?)",
+                                                    [(profile_id, song_id) for song_id in unlocked])
+                    for profile_id, attempt in attempts:
+                        attempt.seq = self._writer_db.execute(_INSERT_ATTEMPT, _attempt_params(profile_id, attempt)).lastrowid
+                        self._writer_db.execute(_UPSERT_PHRASE_SCORE, (profile_id, attempt.song_id, attempt.phrase_index,
+                                                                       attempt.stars, attempt.stars))
+            except sqlite3.Error as e:
+                for _, attempt in attempts:
+                    attempt.seq = 0 # 事务已回滚，ID 作废
+                with self._lock: # 保留这些修改，稍后重试
+                    if self._pending_progress is None:
+                        self._pending_progress = progress
+                    self._pending_attempts[:0] = attempts
+                    self._writing_attempts = []
+                    delay = self._retry_delay_ms
+                    self._retry_delay_ms = min(delay * 2, WRITE_RETRY_MAX_MS)
+                print(f"保存进度失败，{delay / 1000:g} 秒后重试: {e}")
+                # 定时器属于 GUI 线程，排队到 GUI 线程中启动
+                QMetaObject.invokeMethod(self._retry_timer, "start", Qt.ConnectionType.QueuedConnection, Q_ARG(int, delay))
+                return
+            with self._lock:
+                self._writing_attempts = []
+                self._retry_delay_ms = WRITE_RETRY_MIN_MS
+
+    def _setting(self, key):
+        row = self._db.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_setting(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+    def _initialize(self, legacy_progress_path):
+        """创建表；新数据库创建默认用户并导入原有的进度文件。"""
+        self._db.executescript(_SCHEMA)
+        version = self._setting("schema_version")
+        if version is not None:
+            if int(version) != SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"不支持的进度数据库版本: {version}")
+            return
+        with self._db:
+            profile_id = self._db.execute("INSERT INTO profiles (name, created_at) VALUES (?, ?)",
+                                          (DEFAULT_PROFILE_NAME, int(time.time()))).lastrowid
+            if legacy_progress_path:
+                self._import_legacy(profile_id, legacy_progress_path)
+            self._set_setting("active_profile", profile_id)
+            self._set_setting("schema_version", SCHEMA_VERSION)
+
+    def _import_legacy(self, profile_id, progress_path):
+        """把 user_progress.json 和练习记录日志导入给默认用户 (在调用方的事务中)。"""
+        progress = read_progress_file(progress_path)
+        if progress is not None:
+            total_stars = progress.get("total_stars", 0)
+            unlocked = progress.get("unlocked_song_ids", [])
+            self._db.execute("UPDATE profiles SET total_stars = ? WHERE id = ?",
+                             (max(0, int(total_stars)) if isinstance(total_stars, (int, float)) else 0, profile_id))
+            if isinstance(unlocked, list):
+                self._db.executemany("INSERT OR IGNORE INTO unlocked_songs (profile_id, song_id) VALUES (?, ?)",
+                                     [(profile_id, song_id) for song_id in unlocked if isinstance(song_id, str)])
+            print(f"已导入用户进度: {progress_path}")
+
+        directory = os.path.dirname(progress_path)
+        if not any(os.path.exists(os.path.join(directory, name)) for name in (JOURNAL_FILE_NAME, SNAPSHOT_FILE_NAME)):
+            return
+        # 不限制记录条数，重放快照和整个日志；不压缩，导入时不修改原有的文件
+        history, scores = RecentAttempts(limit=None), ScoreAggregates()
+        journal = AttemptJournal(directory, states={"recent": history, "scores": scores}, compact_threshold=sys.maxsize)
+        journal.open()
+        journal.close()
+        self._db.executemany(_INSERT_ATTEMPT, [_attempt_params(profile_id, attempt) for attempt in history.attempts])
+        self._db.executemany(
+            "INSERT INTO phrase_scores (profile_id, song_id, phrase_index, count, total_stars, best) VALUES (?, ?, ?, ?, ?, ?)",
+            [(profile_id, song_id, phrase_index, stats.count, stats.total_stars, stats.best)
+             for (song_id, phrase_index), stats in scores.phrase_items()])
+        print(f"已导入练习记录: {len(history.attempts)} 条记录 (共 {history.count} 次练习)，{len(scores.phrase_items())} 个乐句的得分统计")
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+用户进度的存储接口。
+
+提供统一的 ProgressStore 接口和两个实现：
+    - SqliteProgressStore (progress.sqlite_store): 一个 SQLite 数据库 (WAL 模式) 保存多个用户的星星、
+      已解锁歌曲、练习记录和乐句得分统计，每个事件是一次小的事务。默认使用这个实现。
+    - JsonProgressStore: 原有的单用户文件格式 (user_progress.json + 练习记录日志)，
+      数据库无法打开时作为后备。
+
+MainWindow 只通过这个接口读写进度：打开 (切换) 用户时读取进度并填充得分统计，之后每次得到星星、
+解锁歌曲或完成一次练习时写入对应的修改。
+"""
+
+import json
+import os
+import sqlite3
+
+from progress.journal import AttemptJournal, RecentAttempts
+from progress.writer import ProgressWriter
+
+PROGRESS_DB_FILE_NAME = "progress.sqlite3"
+
+
+class ProgressStore:
+    """
+    进度存储接口。
+
+    用户 (profile) 用整数 ID 标识。open_profile() 之后的写入都针对这个用户。
+    """
+    supports_profiles = False # 是否支持多个用户
+
+    @property
+    def active_profile_id(self):
+        """当前 (或上次使用的) 用户 ID，没有用户时为 None。"""
+        raise NotImplementedError
+
+    def profiles(self):
+        """返回 [(用户 ID, 名字)]，按创建顺序排列。"""
+        raise NotImplementedError
+
+    def create_profile(self, name):
+        """新建用户，返回用户 ID (名字重复时抛出 ValueError)。"""
+        raise NotImplementedError
+
+    def open_profile(self, profile_id, aggregates):
+        """
+        打开 (切换到) 一个用户。
+
+        参数:
+            profile_id (int): 用户 ID。
+            aggregates (ScoreAggregates): 填充为这个用户的得分统计，之后 record_attempt() 会更新它。
+
+        返回:
+            dict | None: 保存的进度 ({"total_stars", "unlocked_song_ids"}，未经校验)，没有保存过时返回 None。
+        """
+        raise NotImplementedError
+
+    def save_progress(self, progress):
+        """保存当前用户的星星总数和已解锁歌曲 (不会长时间阻塞)。"""
+        raise NotImplementedError
+
+    def record_attempt(self, attempt):
+        """保存一次练习记录 (progress.journal.Attempt) 并更新得分统计。"""
+        raise NotImplementedError
+
+    def flush(self):
+        """把尚未写入磁盘的修改同步写入。"""
+
+    def close(self):
+        """写入所有修改并释放文件 (修改无法写入时可以抛出 sqlite3.Error / OSError，这时存储保持打开)。"""
+        self.flush()
+
+
+class JsonProgressStore(ProgressStore):
+    """
+    单用户的文件存储：进度由 ProgressWriter 在后台写入 user_progress.json，
+    练习记录追加到 AttemptJournal。
+
+    参数:
+        progress_path (str): user_progress.json 的路径 (练习记录日志放在同一目录)。
+        parent (QObject, optional): ProgressWriter 的父对象。
+    """
+    PROFILE_ID = 1
+
+    def __init__(self, progress_path, parent=None):
+        self.progress_path = progress_path
+        self._writer = ProgressWriter(progress_path, parent)
+        self._journal = None
+
+    @property
+    def active_profile_id(self):
+        return self.PROFILE_ID
+
+    def profiles(self):
+        return [(self.PROFILE_ID, "默认")]
+
+    def create_profile(self, name):
+        raise ValueError("文件存储只支持一个用户")
+
+    def open_profile(self, profile_id, aggregates):
+        if self._journal is None:
+            self._journal = AttemptJournal(os.path.dirname(self.progress_path),
+                                           states={"recent": RecentAttempts(), "scores": aggregates})
+            self._journal.open()
+        return read_progress_file(self.progress_path)
+
+    def save_progress(self, progress):
+        self._writer.save({"total_stars": progress.get("total_stars", 0),
+                           "unlocked_song_ids": list(progress.get("unlocked_song_ids", []))})
+
+    def record_attempt(self, attempt):
+        self._journal.append(attempt)
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+
+
+def read_progress_file(path):
+    """读取 user_progress.json，文件不存在或无法解析时返回 None。"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取用户进度文件失败 ({path}): {e}")
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def open_progress_store(user_data_dir, progress_path, parent=None):
+    """
+    打开默认的进度存储：user_data_dir 中的 SQLite 数据库 (第一次运行时导入 progress_path 和练习记录日志)；
+    数据库无法打开时退回 JsonProgressStore。
+    """
+    from progress.sqlite_store import SqliteProgressStore
+    try:
+        return SqliteProgressStore(os.path.join(user_data_dir, PROGRESS_DB_FILE_NAME), legacy_progress_path=progress_path,
+                                   parent=parent)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"无法打开进度数据库，使用 {progress_path}: {e}")
+        return JsonProgressStore(progress_path, parent)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+在后台保存用户进度。
+
+每得到一个乐句的星星都会修改进度，如果每次都在 GUI 线程里同步写 JSON，磁盘慢的时候界面会卡顿。
+ProgressWriter 只记录最新的进度快照并标记为 "脏"，短暂延迟 (防抖) 之后在后台线程写入，
+延迟期间的多次修改合并为一次写入。写入时先写同目录的临时文件，fsync 之后再用 os.replace 替换，
+程序崩溃或断电时磁盘上要么是旧文件、要么是新文件，不会留下写了一半的 user_progress.json。
+关闭窗口时调用 flush() 同步写入尚未保存的修改。
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer
+
+PROGRESS_SAVE_DELAY_MS = 500 # 最后一次修改之后等待多久再写入 (毫秒)
+
+
+def write_json_atomic(path, data, indent=4):
+    """把 data 以 JSON 格式写入 path：先写临时文件并 fsync，再原子替换。"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class _WriteTask(QRunnable):
+    """在后台写入最新的进度快照。"""
+
+    def __init__(self, writer):
+        super().__init__()
+        self._writer = writer
+
+    def run(self):
+        self._writer._write_pending()
+
+
+class ProgressWriter(QObject):
+    """
+    防抖、合并写入的进度保存器 (在 GUI 线程中使用)。
+
+    参数:
+        path (str): 进度文件路径。
+        delay_ms (int, optional): 防抖延迟（毫秒）。
+    """
+
+    def __init__(self, path, parent=None, delay_ms=PROGRESS_SAVE_DELAY_MS):
+        super().__init__(parent)
+        self.path = path
+        self._pending = None # 尚未写入的最新快照
+        self._lock = threading.Lock() # 保护 _pending
+        self._write_lock = threading.Lock() # 保证同一时间只有一次写入，旧快照不会覆盖新快照
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._start_write)
+
+    @property
+    def is_dirty(self):
+        """是否有尚未写入磁盘的修改。"""
+        with self._lock:
+            return self._pending is not None
+
+    def save(self, data):
+        """
+        记录新的进度快照，稍后在后台写入 (不会阻塞)。
+
+        参数:
+            data (dict): 可以序列化为 JSON 的进度快照；调用之后不应再修改它。
+        """
+        with self._lock:
+            self._pending = data
+        self._timer.start() # 重新计时：连续的修改合并为一次写入
+
+    def flush(self):
+        """立即同步写入尚未保存的修改，并等待正在进行的后台写入完成 (用于关闭窗口时)。"""
+        self._timer.stop()
+        self._pool.waitForDone()
+        self._write_pending()
+
+    def _start_write(self):
+        self._pool.start(_WriteTask(self))
+
+    def _write_pending(self):
+        with self._write_lock:
+            with self._lock:
+                data, self._pending = self._pending, None
+            if data is None:
+                return
+            try:
+                write_json_atomic(self.path, data)
+                print(f"用户进度已保存到 {self.path}。")
+            except (OSError, TypeError, ValueError) as e:
+                print(f"保存用户进度失败: {e}")
+                with self._lock:
+                    if self._pending is None: # 没有更新的快照时保留这一份，下次 flush 再试
+                        self._pending = data
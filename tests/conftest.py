@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""测试共用的 fixture。"""
+
+import time
+
+import pytest
+from PyQt6.QtCore import QCoreApplication
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Qt 应用对象 (定时器和跨线程信号需要事件循环)。"""
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def wait_until(app):
+    """wait_until(condition, timeout) 处理 Qt 事件直到 condition() 为真或超时，返回 condition() 的结果。"""
+    def wait(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.005)
+        return condition()
+    return wait
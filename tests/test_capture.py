@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""audio.capture 的测试 (需要 PyAudio)。"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyaudio")
+
+from audio.capture import CallbackCapture, SampleRingBuffer
+
+RATE = 1000
+FRAMES = 100 # 每个缓冲区 0.1 秒
+
+
+class FakeStream:
+    def __init__(self):
+        self.time = 0.0
+
+    def start_stream(self):
+        pass
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_time(self):
+        return self.time
+
+
+class FakeAudio:
+    def __init__(self):
+        self.stream = FakeStream()
+
+    def open(self, **kwargs):
+        return self.stream
+
+
+def make_capture():
+    audio = FakeAudio()
+    capture = CallbackCapture(audio, RATE, FRAMES, ring_seconds=1.0)
+    capture.open()
+    return capture, audio.stream
+
+
+def deliver(capture, buffer_index):
+    """模拟一次回调：第 buffer_index 个缓冲区，样本值为它在样本时钟中的位置。"""
+    samples = np.arange(buffer_index * FRAMES, (buffer_index + 1) * FRAMES, dtype=np.int16)
+    capture._callback(samples.tobytes(), FRAMES, {"input_buffer_adc_time": buffer_index * FRAMES / RATE}, 0)
+
+
+def drained(capture):
+    chunks = []
+    capture.drain(lambda view: chunks.append(view.copy()))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int16)
+
+
+def test_ring_buffer_wraps_around():
+    ring = SampleRingBuffer(8)
+    received = []
+    assert ring.write(np.arange(6, dtype=np.int16)) == 6
+    assert ring.drain(lambda view: received.append(view.copy())) == 6
+    assert ring.write(np.arange(6, 12, dtype=np.int16)) == 6 # 写入位置绕回开头
+    chunks = []
+    assert ring.drain(lambda view: chunks.append(view.copy())) == 6
+    assert [len(chunk) for chunk in chunks] == [2, 4] # 分两段交给消费者
+    np.testing.assert_array_equal(np.concatenate(received + chunks), np.arange(12))
+    assert ring.available == 0 and ring.overruns == 0
+
+
+def test_ring_buffer_counts_overruns():
+    ring = SampleRingBuffer(8)
+    assert ring.write(np.arange(5, dtype=np.int16)) == 5
+    assert ring.write(np.arange(5, dtype=np.int16)) == 3 # 只写入剩余空间
+    assert ring.write(np.arange(2, dtype=np.int16)) == 0
+    assert (ring.overruns, ring.dropped_samples, ring.available) == (2, 4, 8)
+    chunks = []
+    ring.drain(lambda view: chunks.append(view.copy()))
+    np.testing.assert_array_equal(np.concatenate(chunks), [0, 1, 2, 3, 4, 0, 1, 2]) # 保留先写入的样本
+    assert ring.drain(chunks.append) == 0
+
+
+def test_ring_buffer_discard_until_moves_only_the_read_position():
+    ring = SampleRingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.discard_until(4)
+    ring.discard_until(2) # 不会后退
+    chunks = []
+    ring.drain(lambda view: chunks.append(view.copy()))
+    np.testing.assert_array_equal(np.concatenate(chunks), [4, 5])
+    assert ring.write_position == 6
+
+
+def test_gate_keeps_only_samples_between_open_and_close():
+    capture, stream = make_capture()
+    deliver(capture, 0) # 闸门关闭，丢弃
+    stream.time = 0.15
+    capture.open_gate()
+    deliver(capture, 1)
+    stream.time = 0.25
+    capture._take.stop_time = stream.time # close_gate() 会等待回调，这里直接设置关闭时间
+    deliver(capture, 2)
+    deliver(capture, 3) # 闸门已关闭
+    assert not capture.is_gate_open
+    assert (capture.start_sample, capture.stop_sample) == (150, 250)
+    np.testing.assert_array_equal(drained(capture), np.arange(150, 250))
+
+
+def test_samples_of_a_stale_gate_are_skipped():
+    capture, stream = make_capture()
+    stream.time = 0.0
+    capture.open_gate()
+    old_take = capture._take
+    deliver(capture, 0) # 没有取走
+
+    stream.time = 0.1
+    capture.open_gate() # 重新录音：不清空环形缓冲区，也不等待回调
+    capture._write_gated(old_take, np.zeros(FRAMES, dtype=np.int16).tobytes(), FRAMES,
+                         {"input_buffer_adc_time": 0.1}, FRAMES) # 与 open_gate 同时进行的旧回调
+    assert len(drained(capture)) == 0 # 新闸门还没有写入，旧样本全部跳过
+    deliver(capture, 2)
+    np.testing.assert_array_equal(drained(capture), np.arange(200, 300))
+    assert capture.overruns == 0 and capture.dropped_samples == 0
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""catalog.compiled 编译缓存的测试。"""
+
+import json
+import marshal
+import os
+
+import pytest
+
+from catalog import compiled
+from catalog.compiled import compiled_cache_path, load_catalog_cached
+
+
+def write_songs(path, title="小星星", mtime_ns=None):
+    songs = [{"id": "star", "title": title, "theme": "night", "phrases": [{"text": "一闪一闪亮晶晶"}]}]
+    path.write_text(json.dumps(songs, ensure_ascii=False), encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "songs.json"
+    write_songs(path, mtime_ns=1_000_000_000_000_000_000)
+    return path
+
+
+def load(source, tmp_path):
+    return load_catalog_cached(str(source), str(tmp_path / "cache"))
+
+
+def test_second_load_uses_cache_and_reads_details_lazily(source, tmp_path):
+    songs, _, hit = load(source, tmp_path)
+    assert not hit and songs[0]["phrases"]
+    entries, details_loader, hit = load(source, tmp_path)
+    assert hit
+    assert entries == [{"id": "star", "title": "小星星", "theme": "night"}] # 目录条目不包含乐句
+    assert details_loader(entries[0])["phrases"] == [{"text": "一闪一闪亮晶晶"}]
+
+
+def test_touched_source_with_same_content_keeps_cache(source, tmp_path):
+    load(source, tmp_path)
+    os.utime(source, ns=(2_000_000_000_000_000_000,) * 2)
+    assert load(source, tmp_path)[2] # 哈希相同，使用缓存并更新头部
+    header, _ = compiled._read_cache(compiled_cache_path(str(source), str(tmp_path / "cache")))
+    assert header["mtime_ns"] == 2_000_000_000_000_000_000
+
+
+@pytest.mark.parametrize("title", ["大星星", "小星星星星"]) # 大小相同 / 大小不同
+def test_changed_source_invalidates_cache(source, tmp_path, title):
+    load(source, tmp_path)
+    write_songs(source, title, mtime_ns=3_000_000_000_000_000_000)
+    songs, _, hit = load(source, tmp_path)
+    assert not hit and songs[0]["title"] == title
+    assert load(source, tmp_path)[0][0]["title"] == title
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda blob: b"NOTCAT" + blob[6:], # 魔数不对
+    lambda blob: blob[:8], # 头部被截断
+    lambda blob: compiled.COMPILED_MAGIC + blob[6:10] + b"\xff" * (len(blob) - 10), # 头部无法反序列化
+])
+def test_damaged_cache_is_rejected_and_rebuilt(source, tmp_path, corrupt):
+    load(source, tmp_path)
+    cache_path = compiled_cache_path(str(source), str(tmp_path / "cache"))
+    with open(cache_path, 'rb') as f:
+        blob = f.read()
+    with open(cache_path, 'wb') as f:
+        f.write(corrupt(blob))
+    assert compiled._read_cache(cache_path) == (None, None)
+    songs, _, hit = load(source, tmp_path)
+    assert not hit and songs[0]["title"] == "小星星"
+    assert load(source, tmp_path)[2]
+
+
+def test_cache_of_other_format_version_is_ignored(source, tmp_path, monkeypatch):
+    load(source, tmp_path)
+    monkeypatch.setattr(compiled, "COMPILED_FORMAT_VERSION", compiled.COMPILED_FORMAT_VERSION + 1)
+    assert not load(source, tmp_path)[2]
+    header, _ = compiled._read_cache(compiled_cache_path(str(source), str(tmp_path / "cache")))
+    assert header["format"] == compiled.COMPILED_FORMAT_VERSION and header["marshal"] == marshal.version
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""progress.journal.AttemptJournal 的测试。"""
+
+import json
+
+from progress.aggregates import ScoreAggregates
+from progress.journal import Attempt, AttemptJournal, RecentAttempts
+
+
+def open_journal(directory, recent, scores):
+    journal = AttemptJournal(str(directory), states={"recent": recent, "scores": scores}, compact_threshold=1000)
+    journal.open()
+    return journal
+
+
+def test_replay_after_snapshot(tmp_path):
+    journal = open_journal(tmp_path, RecentAttempts(), ScoreAggregates())
+    for stars in (1, 2, 3):
+        journal.append(Attempt("song", 0, stars))
+    journal.compact()
+    journal.append(Attempt("song", 1, 3))
+    journal.close()
+
+    recent, scores = RecentAttempts(), ScoreAggregates()
+    open_journal(tmp_path, recent, scores).close()
+    assert recent.count == 4
+    assert scores.song("song").count == 4
+    assert scores.phrase("song", 0).best == 3
+
+
+def test_corrupt_snapshot_resets_states_in_place(tmp_path):
+    journal = open_journal(tmp_path, RecentAttempts(), ScoreAggregates())
+    for stars in (1, 2, 3):
+        journal.append(Attempt("song", 0, stars))
+    journal.compact()
+    journal.append(Attempt("song", 1, 2))
+    journal.close()
+
+    # "recent" 能恢复，"scores" 的数据不完整：两个状态都要清空后只重放日志尾部
+    snapshot_path = tmp_path / "attempts.snapshot.json"
+    data = json.loads(snapshot_path.read_text(encoding="utf-8"))
+    data["states"]["scores"]["songs"]["song"] = [1]
+    snapshot_path.write_text(json.dumps(data), encoding="utf-8")
+
+    recent, scores = RecentAttempts(), ScoreAggregates()
+    journal = open_journal(tmp_path, recent, scores)
+    assert journal.states["recent"] is recent and journal.states["scores"] is scores
+    assert recent.count == 1
+    assert scores.song("song").count == 1
+    assert scores.phrase("song", 0) is None
+    assert scores.phrase("song", 1).best == 2
+
+    journal.append(Attempt("song", 1, 3))
+    journal.close()
+    assert recent.count == 2
+    assert scores.phrase("song", 1).best == 3
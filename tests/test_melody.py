@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""audio.melody 的测试。"""
+
+import numpy as np
+import pytest
+
+from audio.melody import banded_dtw, melody_similarity
+
+
+def full_dtw(x, y):
+    """不加约束的 DTW (逐格递推)，代价和归一化与 banded_dtw 相同。"""
+    n, m = len(x), len(y)
+    cost = np.abs(np.subtract.outer(x, y))
+    cost = np.minimum(np.mod(cost, 12.0), 12.0 - np.mod(cost, 12.0))
+    D = np.full((n + 1, m + 1), np.inf)
+    D[0, 0] = 0.0
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            D[i, j] = cost[i - 1, j - 1] + min(D[i - 1, j - 1], D[i - 1, j], D[i, j - 1])
+    return 2.0 * D[n, m] / (n + m)
+
+
+@pytest.mark.parametrize("n, m", [(1, 1), (1, 7), (7, 1), (12, 12), (10, 25), (30, 9)])
+def test_matches_full_dtw_when_band_covers_matrix(n, m):
+    rng = np.random.default_rng(n * 100 + m)
+    x, y = rng.uniform(-8, 8, n), rng.uniform(-8, 8, m)
+    assert banded_dtw(x, y, band_min=max(n, m)) == pytest.approx(full_dtw(x, y))
+
+
+def test_band_only_removes_paths():
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-8, 8, 60), rng.uniform(-8, 8, 40)
+    narrow = banded_dtw(x, y, band_ratio=0.0, band_min=2)
+    assert np.isfinite(narrow) # 长度不同时带宽仍然连通 (0, 0) 和 (n-1, m-1)
+    assert narrow >= full_dtw(x, y) - 1e-9
+
+
+def test_time_stretch_and_octave_are_free():
+    x = np.repeat([0.0, 2.0, 4.0, 5.0], 5)
+    y = np.repeat([12.0, 14.0, 16.0, 17.0], 8) # 慢一些、高一个八度
+    assert banded_dtw(x, y) == pytest.approx(0.0)
+
+
+def test_empty_sequence_cannot_be_aligned():
+    assert banded_dtw(np.zeros(0), np.zeros(5)) == float('inf')
+
+
+def test_melody_similarity_is_transposition_invariant():
+    melody = 220.0 * 2 ** (np.repeat([0, 2, 4, 5, 7], 6) / 12)
+    assert melody_similarity(melody * 2 ** (3 / 12), melody) == pytest.approx(1.0)
+    assert melody_similarity(np.full(3, 220.0), melody) is None # 浊音帧太少
+    assert melody_similarity(melody[::-1], melody) < 0.9
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""增量分析和参考特征都使用配置的音高检测引擎。"""
+
+import numpy as np
+import pytest
+
+from audio.reference import ReferenceFeatureCache
+from audio.streaming import StreamingAnalyzer
+
+SR = 16000
+
+
+def sung_take(seconds=1.0, freq=220.0):
+    t = np.arange(int(SR * seconds)) / SR
+    y = (0.3 * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+    return (y * 32767).astype(np.int16)
+
+
+@pytest.mark.parametrize("engine", ["yin", "pyin"])
+def test_streaming_analyzer_uses_configured_engine(engine):
+    analyzer = StreamingAnalyzer(SR, pitch_engine=engine)
+    pcm = sung_take()
+    for start in range(0, len(pcm), 1024):
+        analyzer.feed(pcm[start:start + 1024].tobytes())
+    analyzer.finalize()
+    assert analyzer._pitch_engine.name == engine
+    assert analyzer.voiced_percentage > 50
+    assert abs(np.nanmedian(analyzer.pitch_contour) - 220.0) < 10
+
+
+def test_reference_cache_uses_configured_engine():
+    assert ReferenceFeatureCache(SR, "pyin")._pitch_engine.name == "pyin"
+    assert ReferenceFeatureCache(SR, "yin")._pitch_engine.name == "yin"
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""切换用户时丢弃上一个用户尚未返回的分析结果。"""
+
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from audio.analysis_worker import AnalysisRunner
+
+
+def test_cancelled_analysis_result_is_dropped(app):
+    runner = AnalysisRunner()
+    results = []
+    runner.result_ready.connect(lambda context, result: results.append((context, result)))
+    release = threading.Event()
+
+    def analyze(is_cancelled):
+        release.wait(5)
+        return "result"
+
+    runner.submit(analyze, context=0)
+    runner.cancel() # 切换用户
+    release.set()
+    assert runner.wait_for_done(5000)
+    app.processEvents()
+    assert results == []
+
+
+def test_switch_profile_discards_pending_analysis_before_loading():
+    main = pytest.importorskip("main", exc_type=ImportError) # 需要 QtMultimedia
+    calls = mock.Mock()
+    window = SimpleNamespace(
+        progress_store=SimpleNamespace(active_profile_id=1),
+        stacked_widget=mock.Mock(), learning_widget=calls.learning_widget,
+        on_back_to_song_select=calls.back, _save_user_progress=calls.save, _load_user_progress=calls.load,
+        user_progress={"unlocked_song_ids": [], "total_stars": 0},
+        catalog=mock.Mock(), song_selection_widget=mock.Mock(),
+        _build_profile_menu=mock.Mock(), _update_window_title=mock.Mock())
+    main.MainWindow.switch_profile(window, 2)
+    names = [name for name, _, _ in calls.mock_calls]
+    assert names.index("learning_widget.discard_pending_analysis") < names.index("save") < names.index("load")
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""audio.rhythm.rhythm_similarity 的测试。"""
+
+import numpy as np
+
+from audio.rhythm import onset_grid, rhythm_similarity
+
+SR = 22050
+HOP = 512
+FPS = SR / HOP # 约 43 帧/秒
+ONSETS = [10, 30, 45, 70, 90]
+
+
+def envelope_with_onsets(onset_frames, num_frames):
+    envelope = np.full(num_frames, 0.05)
+    envelope[np.asarray(onset_frames)] = 1.0
+    return envelope
+
+
+def reference_grid():
+    return onset_grid(ONSETS, 110, SR, HOP)
+
+
+def test_same_onsets_score_high():
+    score = rhythm_similarity(envelope_with_onsets(ONSETS, 110), reference_grid(), SR, HOP)
+    assert score > 0.9
+
+
+def test_shifted_onsets_still_score_high():
+    shift = int(0.8 * FPS) # 晚 0.8 秒开口，在 RHYTHM_MAX_OFFSET_SEC 之内
+    late = envelope_with_onsets(np.add(ONSETS, shift), 110 + shift)
+    early = envelope_with_onsets(np.subtract(ONSETS[1:], ONSETS[1] - 2), 110)
+    assert rhythm_similarity(late, reference_grid(), SR, HOP) > 0.9
+    assert rhythm_similarity(early, reference_grid(), SR, HOP) > 0.7
+
+
+def test_different_rhythm_scores_lower():
+    other = envelope_with_onsets([5, 12, 19, 26, 60, 100], 110)
+    assert rhythm_similarity(other, reference_grid(), SR, HOP) < 0.6
+
+
+def test_empty_inputs_do_not_crash():
+    assert rhythm_similarity(envelope_with_onsets(ONSETS, 110), onset_grid([], 110, SR, HOP), SR, HOP) is None
+    assert rhythm_similarity(envelope_with_onsets(ONSETS, 110), np.zeros(0), SR, HOP) is None
+    assert rhythm_similarity(np.zeros(0), reference_grid(), SR, HOP) == 0.0
+    assert rhythm_similarity(np.zeros(50), reference_grid(), SR, HOP) == 0.0 # 没有起始点
+    assert onset_grid([], 0, SR, HOP).size == 0
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""catalog.search.SongSearchIndex 的测试。"""
+
+from catalog.search import SongSearchIndex
+
+
+def make_index():
+    index = SongSearchIndex()
+    index.sync([
+        {"id": "a", "title": "汪汪队立大功", "theme": "paw", "lyrics": "汪汪队 我们出发"},
+        {"id": "b", "title": "小星星", "theme": "star", "lyrics": "一闪一闪亮晶晶"},
+        {"id": "c", "title": "拉布拉多警长", "theme": "dog", "lyrics": "汪汪队来帮忙"},
+    ])
+    return index
+
+
+def test_search_ranks_title_before_lyrics():
+    index = make_index()
+    assert index.search("汪汪队") == ["a", "c"]
+    assert index.search("亮晶晶") == ["b"]
+    assert index.search("没有") == []
+
+
+def test_search_after_remove():
+    index = make_index()
+    index.remove_song("a")
+    assert index.search("汪汪队") == ["c"]
+    assert index.search("汪汪队立") == []
+    assert "a" not in index
+
+
+def test_search_after_reindex():
+    index = make_index()
+    assert index.add_song({"id": "a", "title": "新的汪汪队", "theme": "paw", "lyrics": ""})
+    assert index.search("汪汪队") == ["a", "c"]
+    assert index.search("汪汪队立大功") == []
+    assert index.search("我们出发") == []
+    assert index.search("新的汪汪队") == ["a"]
+
+
+def test_sync_reindexes_only_changed_songs():
+    index = make_index()
+    songs = [
+        {"id": "b", "title": "小星星", "theme": "star", "lyrics": "一闪一闪亮晶晶"},
+        {"id": "c", "title": "拉布拉多警长 第二季", "theme": "dog", "lyrics": "汪汪队来帮忙"},
+    ]
+    assert index.sync(songs) == 2 # c 修改，a 删除
+    assert index.sync(songs) == 0
+    assert index.search("第二季") == ["c"]
+    assert index.search("汪汪队") == ["c"]
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""progress.sqlite_store.SqliteProgressStore 的测试。"""
+
+import sqlite3
+
+import pytest
+
+from progress.aggregates import ScoreAggregates
+from progress.journal import Attempt, AttemptJournal, RecentAttempts
+from progress.sqlite_store import SqliteProgressStore
+
+
+def open_store(tmp_path):
+    store = SqliteProgressStore(str(tmp_path / "progress.sqlite3"))
+    aggregates = ScoreAggregates()
+    store.open_profile(store.active_profile_id, aggregates)
+    return store, aggregates
+
+
+def test_writes_are_committed_in_background_and_on_close(tmp_path):
+    store, aggregates = open_store(tmp_path)
+    for stars in (1, 3, 2):
+        store.record_attempt(Attempt("song", 0, stars))
+        store.save_progress({"total_stars": stars, "unlocked_song_ids": ["song"]})
+    assert aggregates.phrase("song", 0).best == 3 # 得分统计立即更新
+    assert [attempt.stars for attempt in store.recent_attempts("song", 0)] == [2, 3, 1]
+    store.record_attempt(Attempt("song", 1, 1))
+    store.close()
+
+    store, aggregates = open_store(tmp_path)
+    progress = store.open_profile(store.active_profile_id, aggregates)
+    assert progress == {"total_stars": 2, "unlocked_song_ids": ["song"]}
+    assert aggregates.phrase("song", 0).count == 3
+    assert aggregates.phrase("song", 1).best == 1
+    store.close()
+
+
+def test_legacy_import_keeps_full_history(tmp_path):
+    legacy_dir = tmp_path / "legacy"
+    journal = AttemptJournal(str(legacy_dir), states={"recent": RecentAttempts()})
+    journal.open()
+    for i in range(150):
+        journal.append(Attempt("song", i % 3, i % 4))
+    journal.close()
+
+    store = SqliteProgressStore(str(tmp_path / "progress.sqlite3"), legacy_progress_path=str(legacy_dir / "user_progress.json"))
+    assert store._db.execute("SELECT count(*) FROM attempts").fetchone()[0] == 150
+    aggregates = ScoreAggregates()
+    store.open_profile(store.active_profile_id, aggregates)
+    assert aggregates.song("song").count == 150
+    assert len(store.recent_attempts("song", 0, limit=100)) == 50
+    store.close()
+
+
+class FailingConnection:
+    """代替后台写入的连接：前 failures 次执行语句时抛出 sqlite3.OperationalError。"""
+
+    def __init__(self, connection, failures):
+        self._connection = connection
+        self.failures = failures
+
+    def __enter__(self):
+        return self._connection.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._connection.__exit__(*exc_info)
+
+    def execute(self, *args):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self._connection.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def test_recent_attempts_includes_unsaved_without_waiting(tmp_path, app):
+    store, _ = open_store(tmp_path)
+    store.record_attempt(Attempt("song", 0, 1))
+    store.flush()
+    with store._write_lock: # 后台写入被阻塞
+        store.record_attempt(Attempt("song", 0, 2))
+        store.record_attempt(Attempt("song", 1, 3))
+        assert [attempt.stars for attempt in store.recent_attempts("song", 0)] == [2, 1]
+        assert [attempt.stars for attempt in store.recent_attempts("song", 0, limit=1)] == [2]
+    store.close()
+
+
+def test_failed_write_is_retried(tmp_path, app, wait_until):
+    store, _ = open_store(tmp_path)
+    writer_db = store._writer_db
+    store._writer_db = FailingConnection(writer_db, failures=2)
+    store._retry_delay_ms = 10
+    store.record_attempt(Attempt("song", 0, 3))
+    store.save_progress({"total_stars": 3, "unlocked_song_ids": []})
+    assert wait_until(lambda: store._db.execute("SELECT count(*) FROM attempts").fetchone()[0] == 1)
+    assert store._writer_db.failures == 0
+    assert store._db.execute("SELECT total_stars FROM profiles").fetchone()[0] == 3
+    store._writer_db = writer_db
+    store.close()
+
+
+def test_close_raises_instead_of_dropping_unsaved_changes(tmp_path, app):
+    store, _ = open_store(tmp_path)
+    writer_db = store._writer_db
+    store._writer_db = FailingConnection(writer_db, failures=1000)
+    store.record_attempt(Attempt("song", 0, 3))
+    with pytest.raises(sqlite3.OperationalError):
+        store.close()
+    store._writer_db = writer_db # 数据库恢复后再次关闭
+    store.close()
+
+    store, aggregates = open_store(tmp_path)
+    assert aggregates.phrase("song", 0).best == 3
+    store.close()
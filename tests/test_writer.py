@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""progress.writer 的测试。"""
+
+import json
+
+import pytest
+
+from progress import writer
+from progress.writer import ProgressWriter, write_json_atomic
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """记录 ProgressWriter 的每次写入 (仍然写入文件)。"""
+    calls = []
+
+    def record(path, data, indent=4):
+        calls.append(data)
+        write_json_atomic(path, data, indent)
+    monkeypatch.setattr(writer, "write_json_atomic", record)
+    return calls
+
+
+def test_saves_within_the_delay_are_coalesced(tmp_path, app, wait_until, writes):
+    path = tmp_path / "user_progress.json"
+    progress_writer = ProgressWriter(str(path), delay_ms=20)
+    for stars in range(1, 6):
+        progress_writer.save({"total_stars": stars})
+    assert progress_writer.is_dirty and writes == []
+    assert wait_until(lambda: not progress_writer.is_dirty and writes)
+    progress_writer.flush() # 等待后台写入结束
+    assert writes == [{"total_stars": 5}]
+    assert json.loads(path.read_text(encoding="utf-8")) == {"total_stars": 5}
+
+
+def test_flush_writes_immediately_and_keeps_failed_snapshot(tmp_path, app, monkeypatch):
+    path = tmp_path / "user_progress.json"
+    progress_writer = ProgressWriter(str(path), delay_ms=60000)
+
+    def fail(path, data, indent=4):
+        raise OSError("disk full")
+    monkeypatch.setattr(writer, "write_json_atomic", fail)
+    progress_writer.save({"total_stars": 1})
+    progress_writer.flush()
+    assert progress_writer.is_dirty # 写入失败，保留快照
+
+    monkeypatch.setattr(writer, "write_json_atomic", write_json_atomic)
+    progress_writer.flush()
+    assert not progress_writer.is_dirty
+    assert json.loads(path.read_text(encoding="utf-8")) == {"total_stars": 1}
+
+
+def test_atomic_write_leaves_no_partial_file(tmp_path):
+    path = tmp_path / "user_progress.json"
+    write_json_atomic(str(path), {"total_stars": 3})
+    with pytest.raises(TypeError):
+        write_json_atomic(str(path), {"total_stars": 4, "bad": object()}) # 序列化到一半失败
+    assert json.loads(path.read_text(encoding="utf-8")) == {"total_stars": 3}
+    assert [p.name for p in tmp_path.iterdir()] == ["user_progress.json"] # 临时文件已删除
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲目录加载基准测试：对比每次启动都解析 songs.json 与使用编译缓存 (catalog.compiled) 的耗时。
+
+生成一个合成的大目录 (默认 10000 首歌，每首若干乐句和歌词)，分别测量:
+    - json: 原来的做法，json.load + 逐首校验 (catalog.manifest.load_catalog_file)
+    - cold: 没有缓存时 load_catalog_cached (解析、校验并写入缓存)
+    - warm: 缓存有效时 load_catalog_cached (一次读取 + 反序列化目录条目，乐句和歌词留到选中歌曲时)
+    - touched: 源文件修改时间变了但内容没变 (计算哈希、更新缓存头部后使用缓存)
+
+用法 (在项目根目录运行):
+    python -m tools.bench_catalog
+    python -m tools.bench_catalog --songs 10000 --phrases 30 --repeats 5
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from catalog.compiled import compiled_cache_path, load_catalog_cached
+from catalog.manifest import load_catalog_file
+from catalog.song_catalog import SongCatalog
+
+
+def synthetic_catalog(num_songs, phrases_per_song, seed=0):
+    """生成与 songs.json 结构相同的合成歌曲列表。"""
+    rng = np.random.default_rng(seed)
+    words = ["汪汪队", "我们出发", "遇到困难", "勇敢向前冲", "小星星", "亮晶晶", "twinkle", "little star"]
+    songs = []
+    for i in range(num_songs):
+        phrases, t = [], 0.0
+        for _ in range(phrases_per_song):
+            length = float(rng.uniform(1.0, 3.0))
+            text = " ".join(rng.choice(words, size=3))
+            phrases.append({"text": text, "start_time": round(t, 3), "end_time": round(t + length, 3)})
+            t += length + 0.5
+        songs.append({
+            "id": f"song{i:05d}",
+            "title": f"歌曲 {i}",
+            "theme": f"theme{i % 20}",
+            "audio_full": f"assets/audio/song{i:05d}_full.wav",
+            "audio_karaoke": None,
+            "lyrics": "\n".join(p["text"] for p in phrases),
+            "phrases": phrases,
+            "unlocked": i == 0,
+            "unlock_stars_required": int(rng.integers(0, 5000)),
+            "background_image": f"assets/images/backgrounds/theme{i % 20}_bg.png",
+            "character_images": {"a": "a.png", "b": "b.png"},
+        })
+    return songs
+
+
+def best_time(func, repeats, setup=None):
+    """多次运行取最短耗时（秒），每次运行前调用 setup。"""
+    best = float('inf')
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比解析 songs.json 与编译缓存的目录加载耗时")
+    parser.add_argument("--songs", type=int, default=10000, help="合成目录的歌曲数")
+    parser.add_argument("--phrases", type=int, default=20, help="每首歌的乐句数")
+    parser.add_argument("--repeats", type=int, default=5, help="重复运行次数，取最短耗时")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source_path = os.path.join(work_dir, "songs.json")
+        cache_dir = os.path.join(work_dir, "appdata")
+        with open(source_path, 'w', encoding='utf-8') as f:
+            json.dump(synthetic_catalog(args.songs, args.phrases), f, ensure_ascii=False, indent=2)
+        cache_path = compiled_cache_path(source_path, cache_dir)
+
+        def remove_cache():
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+
+        def touch_source():
+            stat = os.stat(source_path)
+            os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        def load_cached(expect_hit):
+            songs, _, hit = load_catalog_cached(source_path, cache_dir)
+            assert hit == expect_hit and len(songs) == args.songs
+
+        # 缓存中的条目 + 按需读取的详情必须与直接解析 songs.json 的结果一致
+        reference, _ = load_catalog_file(source_path)
+        load_cached(False)
+        entries, details_loader, _ = load_catalog_cached(source_path, cache_dir)
+        catalog = SongCatalog(entries, details_loader=details_loader)
+        assert all(catalog.load_song(song["id"]) == song for song in reference)
+        song_id = reference[len(reference) // 2]["id"]
+
+        print(f"目录: {args.songs} 首歌 x {args.phrases} 乐句, songs.json {os.path.getsize(source_path) / 1024:.0f} KiB, "
+              f"缓存 {os.path.getsize(cache_path) / 1024:.0f} KiB")
+        print(f"{'path':<10}{'time(ms)':>10}")
+        results = [
+            ("json", best_time(lambda: load_catalog_file(source_path), args.repeats)),
+            ("cold", best_time(lambda: load_cached(False), args.repeats, setup=remove_cache)),
+            ("warm", best_time(lambda: load_cached(True), args.repeats)),
+            ("touched", best_time(lambda: load_cached(True), args.repeats, setup=touch_source)),
+            ("load_song", best_time(lambda: SongCatalog(entries, details_loader=details_loader).load_song(song_id), args.repeats)),
+        ]
+        for name, elapsed in results:
+            print(f"{name:<10}{elapsed * 1000:>10.1f}")
+        print(f"warm / json: {results[2][1] / results[0][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+音高检测引擎基准测试：对比 librosa.pyin 与向量化 YIN 的耗时和浊音帧百分比。
+
+用法 (在项目根目录运行):
+    python -m tools.bench_pitch                    # 使用合成的歌唱录音
+    python -m tools.bench_pitch take1.wav take2.wav # 使用真实录音
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from audio.analysis import LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH, PITCH_VOICED_PERCENT_THRESHOLD
+from audio.pitch import PyinPitchEngine, YinPitchEngine
+
+RATE = 16000 # 与录音采样率一致
+
+
+def synthetic_take(duration_sec, seed, noise_level=0.01, sr=RATE):
+    """生成一段类似儿童歌唱的合成录音：带颤音和起音/收音的音符，中间有停顿，加上背景噪声。"""
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration_sec * sr)
+    y = np.zeros(num_samples, dtype=np.float64)
+    position = 0
+    while position < num_samples:
+        note_len = int(rng.uniform(0.25, 0.8) * sr)
+        gap_len = int(rng.uniform(0.05, 0.4) * sr)
+        end = min(position + note_len, num_samples)
+        t = np.arange(end - position) / sr
+        f0 = rng.uniform(180, 520) * (1 + 0.01 * np.sin(2 * np.pi * 5.5 * t)) # 颤音
+        phase = 2 * np.pi * np.cumsum(f0) / sr
+        envelope = np.minimum(1.0, np.minimum(t / 0.04, (t[-1] - t + 1e-3) / 0.08))
+        amplitude = rng.uniform(0.05, 0.3)
+        y[position:end] = amplitude * envelope * (np.sin(phase) + 0.4 * np.sin(2 * phase) + 0.2 * np.sin(3 * phase))
+        position = end + gap_len
+    y += noise_level * rng.standard_normal(num_samples)
+    return np.clip(y, -1.0, 1.0).astype(np.float32)
+
+
+def load_take(path, sr=RATE):
+    """读取一段录音并重采样到单声道 RATE。"""
+    import librosa
+    y, _ = librosa.load(path, sr=sr, mono=True)
+    return y.astype(np.float32)
+
+
+def time_call(func, repeats):
+    """返回多次调用中的最短耗时（秒）和最后一次的返回值。"""
+    best = float('inf')
+    value = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比 pyin 与向量化 YIN 音高检测引擎")
+    parser.add_argument("files", nargs="*", help="要分析的录音文件（留空则使用合成录音）")
+    parser.add_argument("--repeats", type=int, default=3, help="每个引擎重复运行次数，取最短耗时")
+    args = parser.parse_args()
+
+    if args.files:
+        takes = [(path, load_take(path)) for path in args.files]
+    else:
+        takes = [(f"synthetic {duration}s #{seed}", synthetic_take(duration, seed))
+                 for duration in (2, 5, 10, 15) for seed in (1, 2)]
+
+    pyin_engine = PyinPitchEngine()
+    yin_engine = YinPitchEngine()
+    # 预热：pyin 首次调用包含 numba JIT 编译时间，不计入结果
+    warmup = synthetic_take(0.5, 0)
+    pyin_engine.estimate(warmup, RATE, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH)
+    yin_engine.estimate(warmup, RATE, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH)
+
+    print(f"{'recording':<22}{'dur(s)':>7}{'pyin(ms)':>10}{'yin(ms)':>9}{'speedup':>9}"
+          f"{'pyin%':>8}{'yin%':>8}{'|diff|':>8}{'frames':>8}{'decision':>10}")
+    speedups, diffs, decisions = [], [], []
+    for name, y in takes:
+        pyin_time, (_, pyin_voiced) = time_call(
+            lambda: pyin_engine.estimate(y, RATE, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH), args.repeats)
+        yin_time, (_, yin_voiced) = time_call(
+            lambda: yin_engine.estimate(y, RATE, LIBROSA_FRAME_LENGTH, LIBROSA_HOP_LENGTH), args.repeats)
+
+        pyin_percent = np.count_nonzero(pyin_voiced) / len(pyin_voiced) * 100
+        yin_percent = np.count_nonzero(yin_voiced) / len(yin_voiced) * 100
+        num_frames = min(len(pyin_voiced), len(yin_voiced))
+        frame_agreement = np.mean(pyin_voiced[:num_frames] == yin_voiced[:num_frames]) * 100
+        same_decision = (pyin_percent > PITCH_VOICED_PERCENT_THRESHOLD) == (yin_percent > PITCH_VOICED_PERCENT_THRESHOLD)
+
+        speedups.append(pyin_time / yin_time)
+        diffs.append(abs(pyin_percent - yin_percent))
+        decisions.append(same_decision)
+        print(f"{name[:21]:<22}{len(y) / RATE:>7.1f}{pyin_time * 1000:>10.1f}{yin_time * 1000:>9.1f}"
+              f"{pyin_time / yin_time:>8.1f}x{pyin_percent:>8.1f}{yin_percent:>8.1f}{abs(pyin_percent - yin_percent):>8.1f}"
+              f"{frame_agreement:>7.1f}%{'same' if same_decision else 'DIFF':>10}")
+
+    print()
+    print(f"平均加速比: {np.mean(speedups):.1f}x (最小 {np.min(speedups):.1f}x)")
+    print(f"浊音百分比差异: 平均 {np.mean(diffs):.1f} 个百分点，最大 {np.max(diffs):.1f} 个百分点")
+    print(f"评分判断 (> {PITCH_VOICED_PERCENT_THRESHOLD}%) 一致: {sum(decisions)} / {len(decisions)}")
+
+
+if __name__ == "__main__":
+    main()
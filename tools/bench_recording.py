@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+录音交接路径基准测试：对比 "bytes 列表 + join + astype" 与预分配 RecordingBuffer 的耗时和峰值内存。
+
+两条路径都模拟一次完整录音 (逐块读入 CHUNK 个 int16 样本)，然后把整段录音交给分析：
+    - 原路径: frames.append(bytes) -> b''.join -> np.frombuffer -> astype(float32) / 32768 -> np.square 求 RMS
+    - 新路径: RecordingBuffer.write -> to_float32 (复用临时缓冲区) -> np.dot 求 RMS
+另外分别用两种输入运行完整的 analyze_recording，比较整个分析过程的峰值内存。
+
+用法 (在项目根目录运行):
+    python -m tools.bench_recording
+    python -m tools.bench_recording --seconds 15 --repeats 5
+"""
+
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+
+import numpy as np
+
+from audio.analysis import analyze_recording
+from audio.recording import RecordingBuffer
+from tools.bench_pitch import RATE, synthetic_take
+
+CHUNK = 1024 # 与 LearningWidget 的录音块大小一致
+RECORD_SECONDS_MAX = 15
+
+
+def record_chunks(take):
+    """把一段 float32 录音切成 PyAudio stream.read() 返回的 int16 bytes 块。"""
+    pcm = (take * 32767).astype(np.int16)
+    return [pcm[i:i + CHUNK].tobytes() for i in range(0, pcm.size, CHUNK)]
+
+
+def handoff_list(chunks):
+    """原路径：bytes 列表 -> join -> frombuffer -> astype / 32768。"""
+    frames = []
+    for data in chunks:
+        frames.append(data)
+    audio_data_bytes = b''.join(frames)
+    audio_data_np_int16 = np.frombuffer(audio_data_bytes, dtype=np.int16)
+    audio_data_np_float32 = audio_data_np_int16.astype(np.float32) / 32768.0
+    rms = float(np.sqrt(np.mean(np.square(audio_data_np_float32))))
+    return audio_data_np_float32, rms
+
+
+def handoff_buffer(chunks, buffer):
+    """新路径：写入预分配缓冲区 -> 零拷贝视图 -> 复用的 float32 临时缓冲区。"""
+    buffer.reset()
+    for data in chunks:
+        buffer.write(data)
+    audio_data_np_float32 = buffer.to_float32()
+    rms = float(np.sqrt(np.dot(audio_data_np_float32, audio_data_np_float32) / audio_data_np_float32.size))
+    return audio_data_np_float32, rms
+
+
+def quiet_analyze(samples, duration_sec):
+    """运行完整分析，屏蔽 analyze_recording 打印的分析过程。"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return analyze_recording(samples, RATE, duration_sec)
+
+
+def measure(func, repeats):
+    """返回多次调用中的最短耗时（秒）和单次调用的峰值新增内存（字节）。"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比录音交接路径的耗时和峰值内存")
+    parser.add_argument("--seconds", type=float, default=RECORD_SECONDS_MAX, help="模拟录音时长（秒）")
+    parser.add_argument("--repeats", type=int, default=5, help="重复运行次数，取最短耗时")
+    args = parser.parse_args()
+
+    take = synthetic_take(args.seconds, seed=1)
+    chunks = record_chunks(take)
+    # 缓冲区在控件创建时分配一次，不计入每次录音的开销；先转换一次让临时缓冲区也分配好
+    buffer = RecordingBuffer(RECORD_SECONDS_MAX * RATE, RATE)
+    handoff_buffer(chunks, buffer)
+
+    list_samples, list_rms = handoff_list(chunks)
+    buffer_samples, buffer_rms = handoff_buffer(chunks, buffer)
+    assert np.array_equal(list_samples, buffer_samples) and abs(list_rms - buffer_rms) < 1e-6
+
+    take_bytes = len(chunks) * CHUNK * 2
+    print(f"录音: {args.seconds:.1f}s, {len(chunks)} 块, int16 数据 {take_bytes / 1024:.0f} KiB")
+    print(f"{'path':<26}{'time(ms)':>10}{'peak(KiB)':>11}{'peak/take':>11}")
+
+    def report(name, func):
+        elapsed, peak = measure(func, args.repeats)
+        print(f"{name:<26}{elapsed * 1000:>10.2f}{peak / 1024:>11.0f}{peak / take_bytes:>10.1f}x")
+
+    report("handoff: list + join", lambda: handoff_list(chunks))
+    report("handoff: RecordingBuffer", lambda: handoff_buffer(chunks, buffer))
+
+    report("analyze: list + join", lambda: quiet_analyze(handoff_list(chunks)[0], args.seconds))
+    report("analyze: RecordingBuffer", lambda: quiet_analyze(handoff_buffer(chunks, buffer)[0], args.seconds))
+
+
+if __name__ == "__main__":
+    main()
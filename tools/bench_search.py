@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲搜索基准测试：测量 catalog.search.SongSearchIndex 的建立时间和每次按键的查询耗时。
+
+生成一个合成目录 (默认 10000 首歌，标题、主题和歌词由常用汉字和英文单词随机组成)，然后模拟逐字输入
+若干查询 (中文标题片段、歌词片段、英文前缀、多个关键词)，统计每次按键的耗时。
+最后测量修改少量歌曲后 sync() 增量更新的耗时。
+
+用法 (在项目根目录运行):
+    python -m tools.bench_search
+    python -m tools.bench_search --songs 10000 --lyrics 200
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from catalog.search import SongSearchIndex
+
+TARGET_MS = 5.0 # 每次按键的目标耗时
+ENGLISH_WORDS = ["twinkle", "little", "star", "happy", "birthday", "rainbow", "paw", "patrol", "ocean", "dream"]
+
+
+def synthetic_songs(num_songs, lyrics_length, seed=0):
+    """生成合成歌曲：标题 2-6 个字，歌词约 lyrics_length 个字 (含少量英文单词)。"""
+    rng = np.random.default_rng(seed)
+    chars = [chr(0x4E00 + i) for i in range(2500)] # 常用汉字区的前 2500 个字
+    weights = 1.0 / np.arange(1, len(chars) + 1) # 字频大致符合齐夫分布
+    weights /= weights.sum()
+
+    pool = iter(rng.choice(chars, size=num_songs * (lyrics_length + lyrics_length // 8 * 12 + 8), p=weights).tolist())
+
+    def phrase(length):
+        return "".join(next(pool) for _ in range(length))
+
+    songs = []
+    for i in range(num_songs):
+        lines = [phrase(int(rng.integers(5, 12))) for _ in range(max(1, lyrics_length // 8))]
+        lines.insert(int(rng.integers(0, len(lines))), " ".join(rng.choice(ENGLISH_WORDS, size=2)))
+        songs.append({
+            "id": f"song{i:05d}",
+            "title": phrase(int(rng.integers(2, 7))),
+            "theme": f"theme{i % 20}",
+            "lyrics": "\n".join(lines),
+        })
+    return songs
+
+
+def typing_latencies(index, queries):
+    """逐字输入每个查询，返回每次按键的耗时 (毫秒)。"""
+    latencies = []
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:end])
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量歌曲搜索索引的建立和查询耗时")
+    parser.add_argument("--songs", type=int, default=10000, help="合成目录的歌曲数")
+    parser.add_argument("--lyrics", type=int, default=200, help="每首歌歌词的大约字数")
+    parser.add_argument("--changed", type=int, default=50, help="增量更新时修改的歌曲数")
+    args = parser.parse_args()
+
+    songs = synthetic_songs(args.songs, args.lyrics)
+    index = SongSearchIndex()
+    start = time.perf_counter()
+    index.sync(songs)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    sample = songs[len(songs) // 3]
+    lyric_line = sample["lyrics"].split("\n")[1]
+    queries = [sample["title"], lyric_line[:6], "twinkle", "rainbow dre", f"{sample['title'][:2]} {lyric_line[:2]}",
+               "theme1", "没有这个字"]
+    assert sample["id"] in index.search(sample["title"], limit=10)
+
+    print(f"目录: {args.songs} 首歌, 歌词约 {args.lyrics} 字/首; 建立索引 {build_ms:.0f} ms")
+    latencies = sorted(typing_latencies(index, queries))
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{'keys':>6}{'median(ms)':>12}{'p95(ms)':>10}{'max(ms)':>10}")
+    print(f"{len(latencies):>6}{statistics.median(latencies):>12.2f}{p95:>10.2f}{latencies[-1]:>10.2f}")
+    if latencies[-1] > TARGET_MS:
+        print(f"警告: 最慢的一次按键超过了 {TARGET_MS} ms")
+
+    for song in songs[:args.changed]:
+        song["title"] += " remix"
+    start = time.perf_counter()
+    changed = index.sync(songs)
+    print(f"增量更新: {changed} 首歌变化, {(time.perf_counter() - start) * 1000:.0f} ms (全部重建 {build_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
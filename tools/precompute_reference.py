@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+离线预计算乐句参考特征。
+
+遍历 data/songs.json，截取每首歌 audio_full 中每个乐句的片段，提取参考特征 (逐帧 RMS 能量、
+基频轮廓、浊音标记、起始点时间和起始点网格)，写入音频旁边的 .reference.npz 文件
+(格式见 audio.reference.ReferenceSidecar)。运行时 ReferenceFeatureCache 直接按键读取，
+不再实时分析原曲音频。
+
+增量重建:
+    - 音频的大小和修改时间与文件中记录的一致、提取参数相同、所有乐句都已存在时跳过这首歌；
+    - 音频的修改时间变了但内容哈希没变 (例如重新检出) 时，已有乐句的特征直接复用，只更新记录；
+    - 乐句时间改变时只计算新的乐句，不再存在的乐句从文件中删除。
+需要重建的歌曲在进程池中并行处理。
+
+用法 (在项目根目录运行，audio_full 路径相对于项目根目录):
+    python -m tools.precompute_reference
+    python -m tools.precompute_reference --workers 4
+    python -m tools.precompute_reference --force        # 忽略已有文件，全部重新计算
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from audio.pitch import DEFAULT_PITCH_ENGINE, PITCH_ENGINES, get_pitch_engine
+from audio.reference import (ReferenceSidecar, extract_reference_features, load_phrase_audio,
+                             sidecar_params, sidecar_path, sidecar_phrase_key)
+
+RATE = 16000 # 与录音采样率一致
+SONGS_DATA_PATH = os.path.join('data', 'songs.json')
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-1 (十六进制字符串)。"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_audio_phrases(songs):
+    """
+    按音频文件汇总所有乐句的起止时间。
+
+    返回:
+        tuple: (音频绝对路径 -> 排好序的 [(start_time, end_time)], 缺失的音频路径列表)
+    """
+    phrases_by_audio, missing = {}, []
+    for song in songs:
+        audio_path = song.get('audio_full')
+        if not audio_path:
+            continue
+        if not os.path.exists(audio_path):
+            missing.append(audio_path)
+            continue
+        times = phrases_by_audio.setdefault(os.path.abspath(audio_path), set())
+        for phrase in song.get('phrases', []):
+            end_time = phrase.get('end_time')
+            times.add((float(phrase.get('start_time', 0.0)), float(end_time) if end_time is not None else None))
+    return {path: sorted(times, key=lambda t: (t[0], t[1] is None, t[1] or 0.0)) for path, times in phrases_by_audio.items()}, missing
+
+
+def _read_sidecar(audio_path):
+    """读取已有的预计算文件，返回 (meta, 乐句键 -> 特征字典)；文件不存在或损坏时返回 (None, {})。"""
+    path = sidecar_path(audio_path)
+    if not os.path.exists(path):
+        return None, {}
+    try:
+        sidecar = ReferenceSidecar(path)
+    except Exception as e:
+        print(f"  忽略无法读取的 {path}: {e}")
+        return None, {}
+    try:
+        phrases = {}
+        for key in sidecar.phrase_keys():
+            start, _, end = key.partition('-')
+            phrases[key] = sidecar.get(float(start), None if end == 'end' else float(end))
+        return sidecar.meta, phrases
+    finally:
+        sidecar.close()
+
+
+def _params_match(meta, sr, pitch_engine):
+    return meta is not None and all(meta.get(name) == value for name, value in sidecar_params(sr, pitch_engine).items())
+
+
+def _stat_matches(meta, stat):
+    return meta.get('source_size') == stat.st_size and meta.get('source_mtime_ns') == stat.st_mtime_ns
+
+
+def is_up_to_date(audio_path, phrase_times, sr, pitch_engine=DEFAULT_PITCH_ENGINE):
+    """预计算文件是否已经覆盖当前的音频和乐句 (只读取文件头部，不计算哈希)。"""
+    path = sidecar_path(audio_path)
+    if not os.path.exists(path):
+        return False
+    try:
+        sidecar = ReferenceSidecar(path)
+    except Exception:
+        return False
+    try:
+        keys = {sidecar_phrase_key(start, end) for start, end in phrase_times}
+        return _params_match(sidecar.meta, sr, pitch_engine) and _stat_matches(sidecar.meta, os.stat(audio_path)) \
+            and keys == sidecar.phrase_keys()
+    finally:
+        sidecar.close()
+
+
+def build_sidecar(audio_path, phrase_times, sr, force=False, pitch_engine=DEFAULT_PITCH_ENGINE):
+    """
+    为一个音频文件生成 (或增量更新) 预计算文件 (在工作进程中运行)。
+
+    返回:
+        tuple: (音频路径, 新计算的乐句数, 复用的乐句数)
+    """
+    stat = os.stat(audio_path)
+    meta, existing = (None, {}) if force else _read_sidecar(audio_path)
+    if _params_match(meta, sr, pitch_engine) and _stat_matches(meta, stat):
+        source_sha1 = meta.get('source_sha1') # 文件没有变化，沿用记录的哈希
+    else:
+        source_sha1 = file_sha1(audio_path)
+    if not _params_match(meta, sr, pitch_engine) or meta.get('source_sha1') != source_sha1:
+        existing = {} # 音频内容或提取参数变了，已有特征全部作废
+
+    arrays = {f"meta/{name}": np.asarray(value) for name, value in sidecar_params(sr, pitch_engine).items()}
+    pitch_engine = get_pitch_engine(pitch_engine)
+    arrays.update({
+        "meta/source_size": np.asarray(stat.st_size, dtype=np.int64),
+        "meta/source_mtime_ns": np.asarray(stat.st_mtime_ns, dtype=np.int64),
+        "meta/source_sha1": np.asarray(source_sha1),
+    })
+    computed = reused = 0
+    for start_time, end_time in phrase_times:
+        key = sidecar_phrase_key(start_time, end_time)
+        features = existing.get(key)
+        if features is None:
+            y = load_phrase_audio(audio_path, start_time, end_time, sr)
+            if y.size == 0:
+                print(f"  跳过空乐句 {os.path.basename(audio_path)} {key}")
+                continue
+            features = extract_reference_features(y, sr, pitch_engine)
+            computed += 1
+        else:
+            reused += 1
+        arrays.update({f"{key}/{name}": value for name, value in features.items()})
+
+    # 先写临时文件再替换，运行中的程序不会读到写了一半的文件
+    path = sidecar_path(audio_path)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, path)
+    return audio_path, computed, reused
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预计算乐句参考特征，写入音频旁边的 .reference.npz 文件")
+    parser.add_argument("--songs", default=SONGS_DATA_PATH, help="歌曲数据文件")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数 (默认为 CPU 核数)")
+    parser.add_argument("--sr", type=int, default=RATE, help="提取特征的采样率 (与录音采样率一致)")
+    parser.add_argument("--pitch-engine", choices=sorted(PITCH_ENGINES), default=DEFAULT_PITCH_ENGINE,
+                        help="音高检测引擎 (与程序中的 PITCH_ENGINE 一致)")
+    parser.add_argument("--force", action="store_true", help="忽略已有文件，全部重新计算")
+    args = parser.parse_args()
+
+    with open(args.songs, 'r', encoding='utf-8') as f:
+        songs = json.load(f)
+    phrases_by_audio, missing = collect_audio_phrases(songs)
+    for audio_path in missing:
+        print(f"音频文件不存在，跳过: {audio_path}")
+
+    stale = {path: times for path, times in phrases_by_audio.items()
+             if args.force or not is_up_to_date(path, times, args.sr, args.pitch_engine)}
+    print(f"{len(phrases_by_audio)} 个音频文件，{len(phrases_by_audio) - len(stale)} 个已是最新，{len(stale)} 个需要重建")
+    if not stale:
+        return
+
+    start = time.perf_counter()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(build_sidecar, path, times, args.sr, args.force, args.pitch_engine): path for path, times in stale.items()}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                _, computed, reused = future.result()
+                print(f"  {os.path.relpath(sidecar_path(path))}: 计算 {computed} 个乐句，复用 {reused} 个")
+            except Exception as e:
+                failures += 1
+                print(f"  处理失败 {path}: {e}")
+    print(f"完成，用时 {time.perf_counter() - start:.1f}s" + (f"，{failures} 个失败" if failures else ""))
+
+
+if __name__ == "__main__":
+    main()
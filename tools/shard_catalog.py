@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+把单文件 songs.json 转换为分片目录 (manifest.json + 每首歌一个详情文件，格式见 catalog.manifest)。
+
+转换后程序启动时只读取 manifest，乐句和歌词在选中歌曲时才读取。data/catalog/manifest.json
+存在时优先使用它，删除这个目录即可回到 songs.json。
+
+用法 (在项目根目录运行):
+    python -m tools.shard_catalog
+    python -m tools.shard_catalog --songs data/songs.json --out data/catalog
+"""
+
+import argparse
+import json
+import os
+
+from catalog.manifest import is_valid_song, write_sharded_catalog
+
+SONGS_DATA_PATH = os.path.join('data', 'songs.json')
+CATALOG_DIR = os.path.join('data', 'catalog')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 songs.json 转换为分片目录")
+    parser.add_argument("--songs", default=SONGS_DATA_PATH, help="单文件歌曲数据")
+    parser.add_argument("--out", default=CATALOG_DIR, help="输出目录")
+    args = parser.parse_args()
+
+    with open(args.songs, 'r', encoding='utf-8') as f:
+        songs = json.load(f)
+    skipped = sum(1 for song in songs if not is_valid_song(song))
+    manifest_path = write_sharded_catalog(songs, args.out)
+    print(f"已写入 {manifest_path}: {len(songs) - skipped} 首歌" + (f"，跳过 {skipped} 首无效歌曲" if skipped else ""))
+
+
+if __name__ == "__main__":
+    main()
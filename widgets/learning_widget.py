@@ -16,9 +16,18 @@ from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput, QMediaDevices # <---
 # 导入音频处理相关的库
 import pyaudio
 import numpy as np
-import librosa # 用于音频特征分析
-import scipy.signal # 可能在一些音频处理中用到，librosa 也依赖它
-from librosa import onset # 用于节奏（发声起始点）检测
+# 录音分析逻辑位于 audio 包中，在后台线程池中运行 (librosa 只在需要时导入，见 audio.warmup)
+from audio.analysis import analyze_recording, empty_result
+from audio.analysis_worker import AnalysisRunner, run_in_background
+from audio.capture import CallbackCapture
+from audio.devices import AudioDeviceService
+from audio.playback import ClipPlayer
+from audio.recording import RecordingBuffer
+from audio.pitch import DEFAULT_PITCH_ENGINE
+from audio.reference import ReferenceFeatureCache
+from audio.song_audio import SongAudioLoader
+from audio.streaming import StreamingAnalyzer
+from audio.warmup import warm_up_analysis
 
 # 定义音频参数 (保持不变)
 FORMAT = pyaudio.paInt16 # 录音格式 (16-bit integer)
@@ -27,9 +36,11 @@ RATE = 16000 # 采样率 (Hz)
 CHUNK = 1024 # 每次读取的音频帧数
 RECORD_SECONDS_MAX = 15 # 最大录音时长 (秒)
 
-# 定义 librosa 分析参数 (保持不变)
-LIBROSA_FRAME_LENGTH = 2048 # 分析窗口长度
-LIBROSA_HOP_LENGTH = 512 # 窗口之间的跳跃长度
+# 是否在录音过程中逐块做增量分析 (False 时停止录音后再用 librosa 分析整段录音)
+USE_STREAMING_ANALYSIS = True
+# 音高检测引擎: "yin" (向量化 NumPy，快，默认) 或 "pyin" (librosa，慢但更精确)
+# 整段分析、录音中的增量分析和原曲参考特征都使用这个引擎 (pyin 不能逐块分析，增量分析时在停止录音后整段估计音高)
+PITCH_ENGINE = DEFAULT_PITCH_ENGINE
 
 # 定义资源文件基础路径 (相对于当前脚本文件)
 ASSETS_BASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'assets')
@@ -38,13 +49,6 @@ ASSETS_BASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'assets')
 ICONS_PATH = os.path.join(ASSETS_BASE_PATH, 'images', 'icons')
 STAR_ICON_PATH = os.path.join(ICONS_PATH, 'star.png') # 星星图标路径
 
-# 定义星星奖励数量 (根据表现计算)
-STAR_REWARDS = {
-    "excellent": 3, # 表现优秀 (响亮、有音高、有节奏)
-    "good": 2,      # 表现良好 (至少满足两项指标)
-    "ok": 1,        # 表现一般 (至少满足一项可听见的指标)
-    "poor": 0       # 表现不佳 (非常安静或没有可听见的指标)
-}
 
 class LearningWidget(QWidget):
     """
@@ -56,12 +60,21 @@ class LearningWidget(QWidget):
     back_to_select = pyqtSignal() # 返回歌曲选择界面的信号
     stars_earned = pyqtSignal(int) # 获得星星时发出的信号 (参数为本次获得的星星数量)
     song_completed = pyqtSignal(str) # 歌曲完成时发出的信号 (参数为歌曲 ID)
+    attempt_recorded = pyqtSignal(str, int, object) # 一次录音分析完成 (参数为歌曲 ID、乐句索引、AnalysisResult)，在 stars_earned 之前发出
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, device_service=None, song_loader=None, score_aggregates=None):
         """
         构造函数，初始化学习界面的 UI 和各种组件。
+
+        参数:
+            parent (QWidget, optional): 父控件。
+            device_service (AudioDeviceService, optional): 共享的音频设备服务 (由 MainWindow 创建并启动)。
+                为 None 时自己创建一个并立即在后台初始化 (单独运行本控件测试时)。
+            song_loader (SongAudioLoader, optional): 与选歌界面共享的歌曲音频后台解码器，为 None 时自己创建一个。
+            score_aggregates (ScoreAggregates, optional): 各乐句的得分统计，用于显示乐句的最好成绩。
         """
         super().__init__(parent)
+        self._score_aggregates = score_aggregates
 
         # 设置对象名称，用于 QSS 样式表
         self.setObjectName("LearningWidget")
@@ -81,26 +94,45 @@ class LearningWidget(QWidget):
         self.media_player.errorOccurred.connect(self._on_media_error) # 播放错误信号
         self.media_player.positionChanged.connect(self._on_position_changed) # 播放位置变化信号
 
+        # 乐句片段播放：整首歌在后台解码一次 (选歌界面悬停或选中时就开始)，乐句片段是解码结果的视图，
+        # 通过 QAudioSink 精确播放乐句本身的样本 (解码失败时退回上面的 QMediaPlayer + setPosition 方式)
+        self._owns_song_loader = song_loader is None
+        self._song_loader = song_loader if song_loader is not None else SongAudioLoader(self)
+        self._song_loader.song_ready.connect(self._on_song_audio_ready)
+        self._song_loader.song_failed.connect(self._on_song_audio_failed)
+        self._song_audio_ready = False # 当前歌曲的音频是否已解码好 (或已退回媒体播放器)，决定 "听一听" 是否可用
+        self._clip_player = ClipPlayer(output_device, self)
+        self._clip_player.stopped.connect(self._on_phrase_playback_stopped)
+
         # --- 音频录制器 ---
-        self.audio = None # PyAudio 实例
-        self.stream = None # 录音流
-        self.frames = [] # 存储录制的音频帧
+        # PyAudio 实例和麦克风信息由共享的音频设备服务提供 (在后台初始化，见 self.audio / self.input_device_index)
+        self._owns_device_service = device_service is None
+        self._device_service = device_service if device_service is not None else AudioDeviceService(self)
+        self._device_service.ready.connect(self._on_device_service_ready)
+        self._device_service.input_availability_changed.connect(self._on_input_availability_changed)
+        self._device_service.default_input_changed.connect(self._on_default_input_changed)
+        # 回调模式的录音采集：进入本界面时打开输入流并保持 (预热)，录音只打开/关闭采集闸门
+        self._capture = None
+        self._last_capture_overruns = {"overruns": 0, "dropped_samples": 0, "input_overflows": 0}
+        # 预分配的录音缓冲区 (按最长录音时长分配一次，之后每次录音复用)
+        self._record_buffer = RecordingBuffer(RECORD_SECONDS_MAX * RATE, RATE)
+        self._stream_analyzer = None # 当前录音的增量分析器
         self.is_recording = False # 录音状态标志
-        self.input_device_index = None # 默认输入设备索引
-
-        try:
-            self.audio = pyaudio.PyAudio() # 初始化 PyAudio
-            default_input_device_info = self.audio.get_default_input_device_info() # 获取默认输入设备信息
-            self.input_device_index = default_input_device_info.get('index') # 获取设备索引
-            print(f"找到默认音频输入设备: {default_input_device_info.get('name')} (Index: {self.input_device_index})")
-        except Exception as e:
-            print(f"警告: 未找到默认音频输入设备或列举设备时发生错误: {e}")
-            print("录音功能可能无法使用。请检查麦克风设置。")
+        if self._owns_device_service:
+            self._device_service.start()
 
-        # 录音定时器，用于周期性读取音频流
+        # 录音定时器，用于周期性取走环形缓冲区中已采集的样本
         self._record_timer = QTimer(self)
         self._record_timer.timeout.connect(self._read_audio_stream)
-        self._record_start_time = None # 录音开始时间戳
+        self._record_start_time = None # 录音开始时间戳 (采集闸门打开的流时间)
+
+        # --- 音频分析 (后台线程池) ---
+        # 每次提交分析都会使之前的任务过期，重新录音或切换乐句时旧结果会被丢弃
+        self._analysis_runner = AnalysisRunner(self)
+        self._analysis_runner.result_ready.connect(self._on_analysis_ready)
+        self._analysis_runner.analysis_failed.connect(self._on_analysis_failed)
+        # 原曲乐句的参考特征缓存 (每个乐句只提取一次，用于旋律和节奏比对)
+        self._reference_cache = ReferenceFeatureCache(RATE, PITCH_ENGINE)
 
 
         # --- 歌曲数据和进度 ---
@@ -344,8 +376,11 @@ class LearningWidget(QWidget):
             song_data (dict): 包含歌曲信息的字典。
         """
         self.current_song_data = song_data
+        # 切换歌曲：丢弃上一首歌尚未返回的分析结果
+        self._analysis_runner.cancel()
         if not song_data:
             # 处理歌曲数据无效的情况
+            self._set_song_audio_ready(False)
             self.song_title_label.setText("加载歌曲失败")
             self.lyrics_label.setText("...")
             self.feedback_text_label.setText("请返回重新选择歌曲")
@@ -416,13 +451,14 @@ class LearningWidget(QWidget):
         # 停止并清除当前可能显示的角色动画
         self._stop_current_movie()
 
-        # 加载歌曲音频文件
+        # 加载歌曲音频文件：在后台解码 (选歌界面悬停时可能已经开始或已经完成)，解码好之前 "听一听" 不可用
         audio_path = song_data.get('audio_full')
+        self.media_player.setSource(QUrl()) # 媒体播放器只在解码失败时作为退回方式
         if audio_path and os.path.exists(audio_path):
-            # 设置媒体播放器的音频源
-            media_content = QUrl.fromLocalFile(os.path.abspath(audio_path))
-            self.media_player.setSource(media_content)
-            print(f"尝试加载音频: {os.path.abspath(audio_path)}")
+            self._set_song_audio_ready(self._song_loader.request(audio_path))
+            print(f"尝试加载音频: {os.path.abspath(audio_path)} ({'已解码' if self._song_audio_ready else '后台解码中'})")
+            # 在后台预先提取各乐句的参考特征，第一次评分时不必等待
+            run_in_background(self._reference_cache.prefetch_song, song_data)
             # 如果找到麦克风和音频系统正常，启用控制按钮，否则禁用录音
             if self.input_device_index is not None and self.audio is not None:
                 self._set_control_buttons_enabled(True)
@@ -431,7 +467,9 @@ class LearningWidget(QWidget):
                  self._set_control_buttons_enabled(True)
                  self.record_button.setEnabled(False)
                  # 提供不能录音的反馈
-                 if self.input_device_index is None:
+                 if not self._device_service.is_ready:
+                      self.feedback_text_label.setText("正在准备麦克风，请稍等...")
+                 elif self.input_device_index is None:
                       self.feedback_text_label.setText("未找到麦克风，只能听歌哦！")
                  elif self.audio is None:
                       self.feedback_text_label.setText("音频系统初始化失败，只能听歌哦！")
@@ -444,6 +482,7 @@ class LearningWidget(QWidget):
             self.feedback_text_label.setText(f"音频文件未找到: {audio_path}\n请返回选择其他歌曲或检查文件")
             self._stop_current_movie() # 停止并清除角色动画
             print(f"错误: 音频文件未找到或路径无效: {audio_path}")
+            self._set_song_audio_ready(False)
             self._set_control_buttons_enabled(False)
             self.record_button.setEnabled(False)
 
@@ -537,7 +576,12 @@ class LearningWidget(QWidget):
         self.lyrics_label.style().polish(self.lyrics_label) # 刷新样式
 
         # 更新反馈文本提示用户操作
-        self.feedback_text_label.setText(f"当前乐句 {self.current_phrase_index + 1} / {len(phrases)}\n请听一听 或 我来唱")
+        phrase_prompt = f"当前乐句 {self.current_phrase_index + 1} / {len(phrases)}"
+        phrase_stats = self._score_aggregates.phrase(self.current_song_data.get('id'), self.current_phrase_index) \
+            if self._score_aggregates is not None else None
+        if phrase_stats is not None:
+            phrase_prompt += f" (最好 ⭐ {phrase_stats.best}，练习 {phrase_stats.count} 次)"
+        self.feedback_text_label.setText(f"{phrase_prompt}\n请听一听 或 我来唱")
         # 停止并清除角色动画和指示器
         self._stop_current_movie()
         self._update_indicator_ui(False, False, False)
@@ -598,8 +642,13 @@ class LearningWidget(QWidget):
         if self.is_recording:
              self.toggle_recording()
 
-        # 检查媒体播放器是否已加载有效的音频源
-        if not self.media_player.source() or self.media_player.mediaStatus() == QMediaPlayer.MediaStatus.InvalidMedia:
+        # 优先使用后台解码好的歌曲音频，否则检查媒体播放器是否已加载有效的音频源
+        audio_path = self.current_song_data.get('audio_full') if self.current_song_data else None
+        song_audio = self._song_loader.peek(audio_path)
+        if song_audio is None and audio_path and os.path.exists(audio_path) and not self.media_player.source().isValid():
+             # 解码结果已被缓存淘汰 (或解码失败)：退回媒体播放器
+             self.media_player.setSource(QUrl.fromLocalFile(os.path.abspath(audio_path)))
+        if song_audio is None and (not self.media_player.source().isValid() or self.media_player.mediaStatus() == QMediaPlayer.MediaStatus.InvalidMedia):
              print("音频未加载或无效，无法播放")
              QMessageBox.warning(self, "播放失败", "歌曲音频加载失败，请检查文件。")
              return
@@ -608,9 +657,13 @@ class LearningWidget(QWidget):
         # 检查当前乐句索引是否有效
         if self.current_song_data and self.current_phrase_index < len(phrases):
             phrase_data = phrases[self.current_phrase_index]
+            # 如果正在播放，先停止播放 (停止时会重置乐句时间，所以要在计算乐句时间之前)
+            self.stop_playback()
+
             # 获取乐句的开始和结束时间 (转换为毫秒)
             self.current_phrase_start_time_ms = int(phrase_data.get('start_time', 0) * 1000)
-            duration_ms = self.media_player.duration() # 获取整个音频的总时长
+            # 获取整个音频的总时长
+            duration_ms = int(song_audio.duration_sec * 1000) if song_audio is not None else self.media_player.duration()
             default_end_time_ms = duration_ms if duration_ms > 0 else 10000 # 如果总时长未知，设一个默认值
             self.current_phrase_end_time_ms = int(phrase_data.get('end_time', default_end_time_ms / 1000.0) * 1000)
 
@@ -624,14 +677,18 @@ class LearningWidget(QWidget):
                  self.current_phrase_end_time_ms = min(self.current_phrase_end_time_ms, duration_ms)
 
 
-            # 如果播放器当前不是停止状态，先停止播放
-            if self.media_player.playbackState() != QMediaPlayer.PlaybackState.StoppedState:
-                self.media_player.stop()
-
-            # 设置播放位置到乐句开始时间，并开始播放
-            self.media_player.setPosition(self.current_phrase_start_time_ms)
-            self.media_player.play()
-            print(f"开始播放乐句 {self.current_phrase_index + 1} 从 {self.current_phrase_start_time_ms}ms 到 {self.current_phrase_end_time_ms}ms")
+            clip = song_audio.clip(self.current_phrase_start_time_ms / 1000.0, self.current_phrase_end_time_ms / 1000.0) \
+                if song_audio is not None else None
+            if self._clip_player.play(clip):
+                # 歌曲已解码：直接推送乐句本身的样本，播完即停
+                print(f"开始播放乐句 {self.current_phrase_index + 1} 片段 ({clip.duration_sec:.2f}s)")
+            else:
+                # 退回媒体播放器：设置播放位置到乐句开始时间，由 _on_position_changed 在结束前停止
+                if not self.media_player.source().isValid():
+                    self.media_player.setSource(QUrl.fromLocalFile(os.path.abspath(audio_path)))
+                self.media_player.setPosition(self.current_phrase_start_time_ms)
+                self.media_player.play()
+                print(f"开始播放乐句 {self.current_phrase_index + 1} 从 {self.current_phrase_start_time_ms}ms 到 {self.current_phrase_end_time_ms}ms")
 
             # 播放期间禁用控制按钮和返回按钮，防止干扰
             self._set_control_buttons_enabled(False)
@@ -654,9 +711,11 @@ class LearningWidget(QWidget):
         if self.is_recording:
              self.toggle_recording() # 这会停止录音并触发分析反馈
 
-        # 如果播放器当前不是停止状态，先停止播放
-        if self.media_player.playbackState() != QMediaPlayer.PlaybackState.StoppedState:
-             self.media_player.stop()
+        # 如果正在播放，先停止播放
+        self.stop_playback()
+
+        # 切换乐句：丢弃当前乐句尚未返回的分析结果
+        self._analysis_runner.cancel()
 
         # 移除歌词高亮的动态属性，恢复默认样式
         self.lyrics_label.setProperty("highlight", False)
@@ -705,9 +764,11 @@ class LearningWidget(QWidget):
         if self.is_recording: # 防止重复开始
             return
 
-        # 如果媒体播放器正在播放，先停止
-        if self.media_player.playbackState() != QMediaPlayer.PlaybackState.StoppedState:
-            self.media_player.stop()
+        # 如果正在播放，先停止
+        self.stop_playback()
+
+        # 重新录音：丢弃上一次录音尚未返回的分析结果
+        self._analysis_runner.cancel()
 
         # 移除歌词高亮动态属性
         self.lyrics_label.setProperty("highlight", False)
@@ -719,15 +780,14 @@ class LearningWidget(QWidget):
         self._stop_current_movie()
         self._update_indicator_ui(False, False, False)
 
-        self.frames = [] # 清空之前录制的音频帧
+        self._record_buffer.reset() # 清空之前录制的音频 (复用同一块内存)
+        # 每次录音使用新的增量分析器，录音过程中逐块更新能量、音高和起始点状态
+        self._stream_analyzer = StreamingAnalyzer(RATE, pitch_engine=PITCH_ENGINE) if USE_STREAMING_ANALYSIS else None
         try:
-            # 打开音频输入流
-            self.stream = self.audio.open(format=FORMAT,
-                                         channels=CHANNELS,
-                                         rate=RATE,
-                                         input=True,
-                                         frames_per_buffer=CHUNK,
-                                         input_device_index=self.input_device_index)
+            # 输入流通常在进入界面时已经打开 (预热)，这里只需打开采集闸门，第一个音节不会被截掉
+            if self._capture is None or not self._capture.is_open:
+                self._open_input_stream(raise_errors=True)
+            self._record_start_time = self._capture.open_gate()
 
             self.is_recording = True # 设置录音状态标志
             self.record_button.setText("停止录音 (Stop)") # 更新按钮文本
@@ -740,9 +800,7 @@ class LearningWidget(QWidget):
             self.record_button.setEnabled(True) # 录音按钮本身是启用的，用于停止
             self.back_button.setEnabled(False)
 
-            self._record_start_time = None # 重置录音开始时间
-
-            # 启动定时器，定期读取音频流
+            # 启动定时器，定期取走已采集的样本
             self._record_timer.start(int(CHUNK / RATE * 1000))
             print("开始录音...")
 
@@ -769,11 +827,8 @@ class LearningWidget(QWidget):
 
             print(f"录音启动失败: {e}")
             QMessageBox.critical(self, "录音失败", f"无法启动录音设备：{e}\n请检查麦克风连接和权限设置。")
-            # 清理音频流资源
-            if self.stream:
-                self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
+            # 清理音频流资源 (下次录音时重新打开)
+            self._release_input_stream()
 
     def stop_recording(self):
         """停止音频录制并触发分析。"""
@@ -781,11 +836,15 @@ class LearningWidget(QWidget):
             return
 
         self._record_timer.stop() # 停止定时器
-        # 清理音频流资源
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-            self.stream = None
+        # 关闭采集闸门 (输入流保持打开)，并取走环形缓冲区中剩余的样本 (录音结尾不丢失)
+        capture = self._capture
+        if capture:
+            stop_time = capture.close_gate()
+            capture.drain(self._consume_samples)
+            self._report_capture_overruns(capture)
+            if capture.start_sample is not None and capture.stop_sample is not None:
+                print(f"采集闸门: 流时间 {self._record_start_time:.3f}s - {stop_time:.3f}s，"
+                      f"样本 {capture.start_sample} - {capture.stop_sample}")
 
         self.is_recording = False # 更新录音状态标志
         self.record_button.setText("我来唱 (Record)") # 恢复按钮文本
@@ -801,7 +860,7 @@ class LearningWidget(QWidget):
              self.record_button.setEnabled(False)
         self.back_button.setEnabled(True)
 
-        print(f"停止录音。共录制 {len(self.frames)} 块音频数据。")
+        print(f"停止录音。共录制 {self._record_buffer.num_samples} 个样本 ({self._record_buffer.duration_sec:.2f}s)。")
         # 更新反馈文本提示正在分析
         self.feedback_text_label.setText("录音完成！正在分析...")
         # 停止并清除角色动画和指示器 (分析后 _display_feedback 会更新)
@@ -815,233 +874,244 @@ class LearningWidget(QWidget):
 
 
         # 触发音频分析和反馈流程
-        self.analyze_and_provide_feedback(self.frames)
+        self.analyze_and_provide_feedback(self._record_buffer)
 
     def _read_audio_stream(self):
-        """定时器调用的槽函数，读取音频流数据。"""
-        if not self.is_recording or self.stream is None:
+        """定时器调用的槽函数，取走环形缓冲区中已采集的样本。"""
+        if not self.is_recording or self._capture is None or not self._capture.is_open:
             return
 
         try:
-            # 从流中读取音频数据
-            data = self.stream.read(CHUNK, exception_on_overflow=False) # exception_on_overflow=False 防止溢出时抛异常
-            self.frames.append(data) # 将读取的数据块添加到帧列表
+            # 界面卡顿期间积累的样本会在这里一次取完，不会丢失
+            self._capture.drain(self._consume_samples)
 
-            # 检查是否达到最大录音时长
-            recorded_duration = len(self.frames) * CHUNK / RATE
-            if recorded_duration >= RECORD_SECONDS_MAX:
+            # 检查是否达到最大录音时长 (缓冲区已写满)
+            if self._record_buffer.is_full:
                  print(f"达到最大录音时长 ({RECORD_SECONDS_MAX}s)，自动停止录音。")
                  self.stop_recording() # 达到最大时长则自动停止录音
 
-        except IOError as e:
-             # 忽略一些常见的 IOError，尤其在流结束时
-             pass
         except Exception as e:
             print(f"读取音频流时发生未知错误: {e}")
             self.stop_recording() # 发生未知错误则停止录音
 
+    def _consume_samples(self, samples):
+        """把从环形缓冲区取出的样本写入录音缓冲区，并交给增量分析器。"""
+        chunk = self._record_buffer.write(samples) # 直接写入预分配的缓冲区
+        if self._stream_analyzer is not None and chunk.size > 0:
+            self._stream_analyzer.feed(chunk) # 增量分析当前数据块 (缓冲区视图，不复制)
+
+    @property
+    def capture_overruns(self):
+        """
+        最近一次录音的采集溢出统计。
+
+        返回:
+            dict: {"overruns": 环形缓冲区写满次数, "dropped_samples": 丢弃的样本数,
+                   "input_overflows": 驱动报告的输入溢出次数}
+        """
+        return dict(self._last_capture_overruns)
+
+    def _report_capture_overruns(self, capture):
+        """记录并打印一次录音的采集溢出情况。"""
+        self._last_capture_overruns = {
+            "overruns": capture.overruns,
+            "dropped_samples": capture.dropped_samples,
+            "input_overflows": capture.input_overflows,
+        }
+        if capture.overruns or capture.input_overflows:
+            print(f"警告: 录音期间发生采集溢出 (环形缓冲区 {capture.overruns} 次，"
+                  f"丢弃 {capture.dropped_samples / RATE * 1000:.0f}ms 音频；驱动输入溢出 {capture.input_overflows} 次)")
+
+
+    def start_background_warmup(self):
+        """在后台导入分析依赖并预热音高/起始点分析 (选歌界面显示之后调用)。"""
+        run_in_background(warm_up_analysis, RATE, PITCH_ENGINE)
+
+    # --- 音频设备 (由共享的 AudioDeviceService 提供) ---
+    @property
+    def audio(self):
+        """共享的 PyAudio 实例，音频系统尚未初始化或初始化失败时为 None。"""
+        return self._device_service.pyaudio
+
+    @property
+    def input_device_index(self):
+        """默认输入设备索引，没有麦克风时为 None。"""
+        return self._device_service.default_input_index if self._device_service.has_input else None
+
+    def _on_device_service_ready(self):
+        """槽函数：音频系统初始化完成。如果本界面正在显示，立即预热输入流。"""
+        if self.isVisible():
+            self._open_input_stream()
+
+    def _on_input_availability_changed(self, available):
+        """槽函数：麦克风被插入或拔出。"""
+        if not available:
+            if self.is_recording:
+                self.stop_recording()
+            self._release_input_stream()
+        elif self.isVisible():
+            self._open_input_stream()
+        # 录音按钮只在有歌曲且不在录音时跟随麦克风可用性变化
+        if self.current_song_data and not self.is_recording:
+            self.record_button.setEnabled(available)
+            if not available:
+                self.feedback_text_label.setText("未找到麦克风，只能听歌哦！")
+
+    def _on_default_input_changed(self, device_index):
+        """槽函数：插拔后默认麦克风变成了另一个设备，输入流改用新设备 (正在进行的录音会停止)。"""
+        if self._capture is not None and self._capture.is_open and self._capture.input_device_index != device_index:
+            self._release_input_stream()
+            if self.isVisible():
+                self._open_input_stream()
+
+    # --- 输入流生命周期 (进入界面时打开，离开或关闭时释放) ---
+    def _open_input_stream(self, raise_errors=False):
+        """
+        打开并预热长期使用的输入流 (采集闸门保持关闭)。
+
+        参数:
+            raise_errors (bool): 打开失败时是否抛出异常 (开始录音时需要向用户报告错误)。
+
+        返回:
+            bool: 输入流是否已打开。
+        """
+        if self.audio is None or self.input_device_index is None:
+            return False
+        if self._capture is not None and self._capture.is_open:
+            return True
+        # 每次打开都按当前设备信息新建 (热插拔后 PyAudio 实例或设备索引可能已经变化)
+        self._capture = CallbackCapture(self.audio, RATE, CHUNK, self.input_device_index)
+        try:
+            self._capture.open()
+            print("录音输入流已打开 (预热)。")
+            return True
+        except Exception as e:
+            print(f"打开录音输入流失败: {e}")
+            if raise_errors:
+                raise
+            return False
+
+    def _release_input_stream(self):
+        """停止正在进行的录音并释放输入流。"""
+        if self.is_recording:
+            self.stop_recording()
+        if self._capture is not None and self._capture.is_open:
+            try:
+                self._capture.close()
+                print("录音输入流已释放。")
+            except Exception as e:
+                print(f"释放录音输入流时发生错误: {e}")
+
+    def showEvent(self, event):
+        """进入学习界面：预先打开输入流，点击录音时无需等待设备打开。"""
+        super().showEvent(event)
+        self._open_input_stream()
+
+    def hideEvent(self, event):
+        """离开学习界面 (切换回选歌界面)：释放输入流。窗口最小化等系统事件不释放。"""
+        super().hideEvent(event)
+        if not event.spontaneous():
+            self._release_input_stream()
 
     def _set_control_buttons_enabled(self, enabled):
-        """启用或禁用听一听和下一句按钮。"""
-        self.listen_button.setEnabled(enabled)
+        """启用或禁用听一听和下一句按钮 (歌曲音频准备好之前听一听始终不可用)。"""
+        self.listen_button.setEnabled(enabled and self._song_audio_ready)
         self.next_button.setEnabled(enabled)
 
 
     # --- 音频分析和反馈方法 ---
-    def analyze_and_provide_feedback(self, audio_frames):
+    def analyze_and_provide_feedback(self, recording):
         """
-        分析录制的音频帧（能量、音高、节奏）并提供反馈。
+        提交录制的音频到后台线程池进行分析（能量、音高、节奏）。
+
+        参数:
+            recording (RecordingBuffer): 本次录音的缓冲区。
 
-        根据分析结果计算星星数量，选择角色动画，更新指示器，并显示反馈文本。
+        分析在工作线程中完成，结果通过 _on_analysis_ready 回到 GUI 线程后
+        才会计算星星、显示反馈并发出 stars_earned 信号。
         """
-        if not audio_frames:
-            # 如果没有录到音频数据
-            feedback_message = "哎呀，好像没有听到声音，再靠近麦克风一点试试，或者大声一点唱？你发出声音就很棒！"
-            selected_character_name = 'chase' # 鼓励尝试的角色
-            stars_earned_for_phrase = STAR_REWARDS["poor"] # 0 星
-
-            # 调用 _display_feedback 更新界面
-            self._display_feedback(feedback_message, selected_character_name, stars_earned_for_phrase, False, False, False)
+        if not self.current_song_data or self.current_phrase_index >= len(self.current_song_data.get('phrases', [])):
+            return
+        phrase_index = self.current_phrase_index
+        audio_path = self.current_song_data.get('audio_full')
+        phrase_data = self.current_song_data['phrases'][phrase_index]
+        reference_cache = self._reference_cache
+
+        if recording.num_samples == 0:
+            # 如果没有录到音频数据，直接显示结果，不需要后台分析
+            self._analysis_runner.cancel()
             print("没有录到音频数据，跳过分析。")
-            # 触发 0 星信号，以便主窗口保存这次尝试
-            if self.current_song_data and self.current_phrase_index < len(self.current_song_data.get('phrases', [])):
-                 self._phrase_stars[self.current_phrase_index] = stars_earned_for_phrase
-                 self.stars_earned.emit(stars_earned_for_phrase)
+            self._apply_analysis_result(phrase_index, empty_result())
             return
 
-        try:
-            # 将音频帧合并并转换为 numpy 数组 (int16 -> float32)
-            audio_data_bytes = b''.join(audio_frames)
-            audio_data_np_int16 = np.frombuffer(audio_data_bytes, dtype=np.int16)
-            audio_data_np_float32 = audio_data_np_int16.astype(np.float32) / 32768.0 # 归一化到 [-1.0, 1.0]
-
-
-            # --- 音量分析 (RMS 能量) ---
-            rms_energy = 0
-            if audio_data_np_float32.size > 0:
-                rms_energy = np.sqrt(np.mean(np.square(audio_data_np_float32)))
-            print(f"录音音频 RMS 能量 (float32): {rms_energy}")
-
-            # 音量阈值 (根据 float32 数据调整)
-            rms_quiet_threshold = 0.005 # 能听见的声音阈值
-            rms_medium_threshold = 0.03 # 足够响亮的声音阈值
-            rms_loud_threshold = 0.15   # 非常响亮的声音阈值
-
-            is_audible = rms_energy > rms_quiet_threshold # 是否能听见
-            is_loud_enough = rms_energy > rms_medium_threshold # 是否足够响亮
-            is_very_loud = rms_energy > rms_loud_threshold # 是否非常响亮
-
-
-            # --- 音高分析 (使用 librosa) ---
-            has_discernible_pitch = False # 是否检测到明显的音高
-            pitch_detected_percentage = 0 # 检测到音高的帧数百分比
-            if is_audible: # 只在声音可听见时尝试检测音高
-                 try:
-                      f0, voiced_flag, voiced_probabilities = librosa.pyin(
-                          y=audio_data_np_float32,
-                          fmin=librosa.note_to_hz('C2'), # 最小检测频率 (低音 C)
-                          fmax=librosa.note_to_hz('C6'), # 最大检测频率 (高音 C)
-                          sr=RATE, # 采样率
-                          frame_length=LIBROSA_FRAME_LENGTH, # 分析窗口长度
-                          hop_length=LIBROSA_HOP_LENGTH # 窗口跳跃长度
-                      )
-                      voiced_frames_count = np.sum(voiced_flag) # 统计检测到音高的帧数
-                      total_frames = len(voiced_flag) # 总帧数
-                      pitch_detected_percentage = (voiced_frames_count / total_frames) * 100 if total_frames > 0 else 0 # 计算百分比
-                      # 设定阈值：例如，需要在至少 30% 的帧中检测到音高才算有明显的音高
-                      has_discernible_pitch = pitch_detected_percentage > 30
-
-                      print(f"Voiced frames percentage: {pitch_detected_percentage:.2f}%")
-
-                 except Exception as e:
-                     print(f"Librosa pitch analysis failed (after audible check): {e}")
-                     has_discernible_pitch = False # 分析失败则认为没有音高
-
-
-            # --- 节奏分析 (使用 librosa.onset) ---
-            has_discernible_rhythm = False # 是否检测到明显的节奏
-            num_onsets = 0 # 检测到的发声起始点数量
-            if is_audible: # 只在声音可听见时尝试检测节奏
-                 try:
-                      # 检测声音起始点 (onset)，单位为帧
-                      onset_frames = onset.onset_detect(y=audio_data_np_float32, sr=RATE,
-                                                        hop_length=LIBROSA_HOP_LENGTH,
-                                                        units='frames') # 获取帧索引
-
-                      num_onsets = len(onset_frames) # 统计发声起始点数量
-                      print(f"检测到 {num_onsets} 个声音起始点 (Onsets)")
-
-                      # 简单检查：对于录音时长，是否检测到合理数量的发声点？
-                      # 根据录音时长和典型发声速率（例如每秒 0.8 个发声点）估算所需最小发声点数量
-                      recorded_duration_sec = len(audio_frames) * CHUNK / RATE # 录音时长（秒）
-                      min_onsets_required = max(1, int(recorded_duration_sec * 0.8)) # 至少需要 1 个发声点（如果时长 > ~1.25s）
-
-                      # 如果检测到的发声点数量达到或超过最小需求，认为有节奏感
-                      has_discernible_rhythm = num_onsets >= min_onsets_required
-                      print(f"Recorded duration: {recorded_duration_sec:.2f}s, Min onsets required: {min_onsets_required}, Detected onsets: {num_onsets}, Has rhythm: {has_discernible_rhythm}")
-
-                 except Exception as e:
-                     print(f"Librosa onset analysis failed (after audible check): {e}")
-                     has_discernible_rhythm = False # 分析失败则认为没有节奏
-
-
-            # --- 综合反馈逻辑和星星奖励 --- (优化反馈文字和角色选择)
-            feedback_message = "你尝试啦！" # 默认基础反馈
-            selected_character_name = 'chase' # 默认角色
-            stars_earned_for_phrase = 0 # 本乐句获得的星星数初始化为 0
-
-            # 根据分析结果确定表现类别
-            if not is_audible:
-                 category = "silent"
-                 stars_earned_for_phrase = STAR_REWARDS["poor"] # 不可听见 -> 0 星
-            elif is_loud_enough and has_discernible_pitch and has_discernible_rhythm:
-                 category = "excellent"
-                 stars_earned_for_phrase = STAR_REWARDS["excellent"] # 优秀 -> 3 星
-            elif (is_loud_enough and has_discernible_pitch) or \
-                 (is_loud_enough and has_discernible_rhythm) or \
-                 (has_discernible_pitch and has_discernible_rhythm and not is_very_loud): # 良好 (至少满足两项指标，且不非常响亮，避免与 Excellent 重叠)
-                 category = "good"
-                 stars_earned_for_phrase = STAR_REWARDS["good"] # 良好 -> 2 星
-            elif is_audible: # 可听见，但未达到良好的标准 (可能只满足一项或没有满足，但至少能听到声音)
-                 category = "ok"
-                 stars_earned_for_phrase = STAR_REWARDS["ok"] # 一般 -> 1 星
-            else: # 兜底情况 (理论上应被 is_audible 检查覆盖)
-                 category = "poor"
-                 stars_earned_for_phrase = STAR_REWARDS["poor"] # 0 星
-
-
-            # 根据表现类别和具体指标选择反馈信息和角色
-            if category == "silent":
-                 feedback_message = "哎呀，好像没有听到声音，再大声一点试试？我很期待听到你的歌声！"
-                 selected_character_name = 'chase' # 鼓励尝试的角色
-            elif category == "excellent":
-                 feedback_message = "哇！太棒了！你唱得又响亮、又有音调、还有节奏感！你真是一位小歌星！"
-                 selected_character_name = 'marshall' # 自信/有活力的角色
-            elif category == "good":
-                 if is_loud_enough and has_discernible_pitch:
-                      feedback_message = "声音响亮，旋律也很棒！你唱得真好听！"
-                      selected_character_name = 'skye' # 有音乐感/甜美的角色
-                 elif is_loud_enough and has_discernible_rhythm:
-                      feedback_message = "声音响亮，而且发声很有节奏感！跟着拍子唱太酷啦！"
-                      selected_character_name = 'marshall' # 有活力的角色
-                 elif has_discernible_pitch and has_discernible_rhythm: # 可听见，有音高有节奏，但不非常响亮
-                      feedback_message = "声音小小的，但唱得很有音调和节奏呢！轻轻地唱也很棒！"
-                      selected_character_name = 'skye' # 有音乐感/甜美的角色
-                 else: # 兜底情况，理论上不会发生
-                      feedback_message = "你唱得很棒！"
-                      selected_character_name = 'chase'
-            elif category == "ok":
-                 # 对于一般表现，提供更具体的鼓励
-                 parts = [] # 记录满足了哪些指标
-                 if is_very_loud: # 如果声音非常响亮
-                      feedback_message = "哇！你的声音真洪亮！太有活力了！"
-                      selected_character_name = 'marshall' # 有活力的角色
-                 else: # 不非常响亮，检查其他指标
-                     if is_loud_enough: # 足够响亮 (但未达到非常响亮)
-                          parts.append("声音很响亮")
-                     if has_discernible_pitch: # 有音高
-                          parts.append("声音很有音调")
-                     if has_discernible_rhythm: # 有节奏
-                          parts.append("发声很有节奏感")
-
-                     if len(parts) > 0:
-                          # 组合反馈，或者使用更简单友好的语句
-                          feedback_message = f"你发出声音啦！很棒！我们听到你唱了！" # 基础尝试的反馈
-                          # 可选：反馈具体做到的部分：f"你发出声音啦！很棒！{', '.join(parts)}！下次再试试把它们都唱出来？"
-                     else: # 可听见，但没有满足响亮/音高/节奏的阈值
-                          feedback_message = "你尝试啦，很棒！我听到你发出声音了！再大声、再有音调一点点试试看？"
-
-                     selected_character_name = 'chase' # 鼓励尝试的角色
-
-            else: # category == "poor" (兜底，包括不可听见的情况，不可听见已在开头处理)
-                 feedback_message = "你尝试啦，很棒！我们再来一次？"
-                 selected_character_name = 'chase' # 鼓励尝试的角色
-                 stars_earned_for_phrase = STAR_REWARDS["poor"] # 确保是 0 星
-
-            # 检查选择的角色是否存在对应的 QMovie，如果不存在则使用第一个加载的角色或清空
-            if selected_character_name not in self._character_movies:
-                 print(f"警告: 角色 '{selected_character_name}' 的 QMovie 未加载，尝试使用第一个可用的角色。")
-                 selected_character_name = next(iter(self._character_movies), None) # 获取字典中的第一个键（角色名）
-                 if selected_character_name:
-                      print(f"  - 使用备选角色: '{selected_character_name}'")
-                 else:
-                      print("  - 没有可用的角色动画加载。")
-
-            # 调用 _display_feedback 方法更新界面显示反馈、角色动画和指示器，并触发星星动画
-            self._display_feedback(feedback_message, selected_character_name, stars_earned_for_phrase, is_audible, has_discernible_pitch, has_discernible_rhythm)
+        if self._stream_analyzer is not None:
+            # 增量分析器在录音过程中已经处理了绝大部分数据，这里只需处理最后一个窗口
+            stream_analyzer = self._stream_analyzer
+            self._stream_analyzer = None
+            self._analysis_runner.submit(
+                lambda is_cancelled: stream_analyzer.finalize(reference_cache.get_features(audio_path, phrase_data)),
+                context=phrase_index)
+            return
 
+        recorded_duration_sec = recording.duration_sec # 录音时长（秒）
 
-        except Exception as e:
-            # 处理音频分析过程中发生的错误
-            print(f"音频分析失败: {e}")
-            self.feedback_text_label.setText("分析声音时遇到问题...")
-            # 停止并清除角色动画和指示器
-            self._stop_current_movie()
-            self._update_indicator_ui(False, False, False)
-            # 触发 0 星信号，表示本次分析失败
-            if self.current_song_data and self.current_phrase_index < len(self.current_song_data.get('phrases', [])):
-                 self._phrase_stars[self.current_phrase_index] = 0
-                 self.stars_earned.emit(0)
+        def analyze(is_cancelled):
+            # 在分析线程中把缓冲区转换为 float32 (写入复用的临时缓冲区，归一化到 [-1.0, 1.0])。
+            # 分析线程池只有一个线程，新录音的任务一定在这个任务结束后才会使用临时缓冲区；
+            # 如果这期间已经开始了新的录音，本次结果会因为任务过期而被丢弃。
+            audio_data_np_float32 = recording.to_float32()
+            return analyze_recording(audio_data_np_float32, RATE, recorded_duration_sec, is_cancelled,
+                                     pitch_engine=PITCH_ENGINE,
+                                     reference=reference_cache.get_features(audio_path, phrase_data))
+
+        self._analysis_runner.submit(analyze, context=phrase_index)
+
+
+    def discard_pending_analysis(self):
+        """丢弃尚未返回的分析结果 (例如切换用户时，上一个用户的录音不应记到新用户名下)。"""
+        self._analysis_runner.cancel()
+
+    def _on_analysis_ready(self, phrase_index, result):
+        """槽函数：最新一次录音的分析结果已返回 GUI 线程。"""
+        self._apply_analysis_result(phrase_index, result)
+
+
+    def _on_analysis_failed(self, phrase_index, error_message):
+        """槽函数：最新一次录音的分析过程中发生错误。"""
+        print(f"音频分析失败: {error_message}")
+        self.feedback_text_label.setText("分析声音时遇到问题...")
+        # 停止并清除角色动画和指示器
+        self._stop_current_movie()
+        self._update_indicator_ui(False, False, False)
+        # 触发 0 星信号，表示本次分析失败
+        if self.current_song_data and phrase_index < len(self._phrase_stars):
+             self._phrase_stars[phrase_index] = 0
+             self.stars_earned.emit(0)
+
+
+    def _apply_analysis_result(self, phrase_index, result):
+        """根据分析结果记录星星、选择角色并更新界面。"""
+        if not self.current_song_data or phrase_index >= len(self._phrase_stars):
+            return
+
+        selected_character_name = result.character_name
+        # 检查选择的角色是否存在对应的 QMovie，如果不存在则使用第一个加载的角色或清空
+        if selected_character_name not in self._character_movies:
+             print(f"警告: 角色 '{selected_character_name}' 的 QMovie 未加载，尝试使用第一个可用的角色。")
+             selected_character_name = next(iter(self._character_movies), None) # 获取字典中的第一个键（角色名）
+             if selected_character_name:
+                  print(f"  - 使用备选角色: '{selected_character_name}'")
+             else:
+                  print("  - 没有可用的角色动画加载。")
+
+        # 调用 _display_feedback 方法更新界面显示反馈、角色动画和指示器，并触发星星动画
+        self._display_feedback(result.message, selected_character_name, result.stars,
+                               result.is_audible, result.has_discernible_pitch, result.has_discernible_rhythm)
+
+        # 记录本乐句得分并触发信号 (0 星也会发出，以便主窗口保存这次尝试)
+        self._phrase_stars[phrase_index] = result.stars
+        self.attempt_recorded.emit(self.current_song_data.get('id', ''), phrase_index, result)
+        self.stars_earned.emit(result.stars)
 
 
     # --- 新增方法：显示反馈 (包含角色动画、指示器和星星动画触发) ---
@@ -1092,13 +1162,13 @@ class LearningWidget(QWidget):
          self._update_indicator_ui(vol_on, pitch_on, rhythm_on)
 
          # **更新当前乐句获得的星星数量**
-         # 这个逻辑已经在 analyze_and_provide_feedback 中处理，这里不再重复，但保留注释提醒
+         # 这个逻辑已经在 _apply_analysis_result 中处理，这里不再重复，但保留注释提醒
          # if self.current_song_data and self.current_phrase_index < len(self.current_song_data.get('phrases', [])):
          #      self._phrase_stars[self.current_phrase_index] = stars_earned
          #      print(f"乐句 {self.current_phrase_index + 1} 获得星星：{stars_earned}")
 
          # **触发 stars_earned 信号**
-         # 信号已经在 analyze_and_provide_feedback 或其错误处理中发出，确保星星数量被传递
+         # 信号已经在 _apply_analysis_result 或 _on_analysis_failed 中发出，确保星星数量被传递
          # self.stars_earned.emit(stars_earned) # 确保只发出一次信号
 
          # **触发星星动画**
@@ -1209,32 +1279,67 @@ class LearningWidget(QWidget):
         self._animated_star_labels = [child for child in self.children() if isinstance(child, QLabel) and child.graphicsEffect()]
 
 
-    # --- 播放相关槽函数 --- (保持不变)
+    # --- 播放相关槽函数 ---
+    def _set_song_audio_ready(self, ready):
+        """更新歌曲音频的准备状态 ("听一听" 按钮显示加载中或可用)。"""
+        self._song_audio_ready = ready
+        self.listen_button.setText("听一听 (Listen)" if ready or not self.current_song_data else "听一听 (加载中...)")
+        self.listen_button.setToolTip("" if ready else "正在准备歌曲音频，请稍等...")
+        if not ready:
+            self.listen_button.setEnabled(False)
+        elif not self.is_recording and not self._clip_player.is_playing and \
+                self.current_phrase_index < len(self.current_song_data.get('phrases', [])):
+            self.listen_button.setEnabled(True)
+
+    def _on_song_audio_ready(self, audio_path):
+        """后台解码完成：如果是当前歌曲，"听一听" 变为可用。"""
+        if self.current_song_data and audio_path == self.current_song_data.get('audio_full') and not self._song_audio_ready:
+            print(f"歌曲音频已解码: {audio_path}")
+            self._set_song_audio_ready(True)
+
+    def _on_song_audio_failed(self, audio_path, error_message):
+        """后台解码失败：如果是当前歌曲，退回媒体播放器 (QMediaPlayer + setPosition) 播放。"""
+        if not self.current_song_data or audio_path != self.current_song_data.get('audio_full'):
+            return
+        print(f"歌曲音频解码失败，改用媒体播放器: {error_message}")
+        self.media_player.setSource(QUrl.fromLocalFile(os.path.abspath(audio_path)))
+        self._set_song_audio_ready(True)
+
+    def stop_playback(self):
+        """停止正在进行的乐句播放 (片段播放器或媒体播放器)。"""
+        self._clip_player.stop()
+        if self.media_player.playbackState() != QMediaPlayer.PlaybackState.StoppedState:
+            self.media_player.stop()
+
     def _on_playback_state_changed(self, state):
         """媒体播放状态变化时的槽函数。"""
         print(f"播放状态变化: {state}")
         if state == QMediaPlayer.PlaybackState.StoppedState:
-             print("播放已停止")
-             # 移除歌词高亮动态属性
-             self.lyrics_label.setProperty("highlight", False)
-             self.lyrics_label.style().polish(self.lyrics_label) # 刷新样式
+             self._on_phrase_playback_stopped()
 
-             self.current_phrase_start_time_ms = -1
-             self.current_phrase_end_time_ms = -1
+    def _on_phrase_playback_stopped(self):
+        """乐句播放结束 (片段播完、媒体播放器停止或被打断) 时恢复界面状态。"""
+        print("播放已停止")
+        # 移除歌词高亮动态属性
+        self.lyrics_label.setProperty("highlight", False)
+        self.lyrics_label.style().polish(self.lyrics_label) # 刷新样式
 
-             # 如果不是正在录音，恢复控制按钮和返回按钮状态
-             if not self.is_recording:
-                self._set_control_buttons_enabled(True)
-                # 录音按钮状态取决于麦克风可用性
-                if self.input_device_index is not None and self.audio is not None:
-                     self.record_button.setEnabled(True)
-                else:
-                     self.record_button.setEnabled(False)
-                self.back_button.setEnabled(True)
+        self.current_phrase_start_time_ms = -1
+        self.current_phrase_end_time_ms = -1
+
+        # 如果不是正在录音，恢复控制按钮和返回按钮状态
+        if not self.is_recording:
+            self._set_control_buttons_enabled(True)
+            # 录音按钮状态取决于麦克风可用性
+            if self.input_device_index is not None and self.audio is not None:
+                self.record_button.setEnabled(True)
+            else:
+                self.record_button.setEnabled(False)
+            self.back_button.setEnabled(True)
 
 
     def _on_position_changed(self, position):
-        """媒体播放位置变化时的槽函数，用于在乐句结束时停止播放。"""
+        """媒体播放位置变化时的槽函数，用于在乐句结束时停止播放 (只用于片段尚未解码好时的退回方式)。"""
         if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState and self.current_phrase_end_time_ms != -1:
              # 添加一个小的缓冲（例如 50ms），确保播放器在乐句结束前一点点停止，避免突然中断感
              if position >= self.current_phrase_end_time_ms - 50:
@@ -1271,24 +1376,24 @@ class LearningWidget(QWidget):
         self._animated_star_labels = [] # 清空列表引用
 
 
-        # 停止媒体播放器
-        if self.media_player.playbackState() != QMediaPlayer.PlaybackState.StoppedState:
-            self.media_player.stop()
-        # 停止录音
-        if self.is_recording:
-            self.stop_recording()
+        # 停止播放 (片段播放器和媒体播放器)
+        self.stop_playback()
+        # 停止录音并释放输入流
+        self._release_input_stream()
+
+        # 取消并等待后台分析任务结束，避免关闭后仍有结果返回
+        self._analysis_runner.cancel()
+        self._analysis_runner.wait_for_done(2000)
 
         # 停止并清除当前角色动画
         self._stop_current_movie()
 
 
-        # 终止 PyAudio 实例，释放音频设备资源
-        if hasattr(self, 'audio') and self.audio:
-             try:
-                self.audio.terminate()
-                print("PyAudio 资源已释放")
-             except Exception as e:
-                print(f"释放 PyAudio 资源时发生错误: {e}")
+        # 终止 PyAudio 实例，释放音频设备资源 (共享的设备服务和歌曲解码器由 MainWindow 负责清理)
+        if self._owns_device_service:
+            self._device_service.terminate()
+        if self._owns_song_loader:
+            self._song_loader.wait_for_done(2000)
 
         # 调用父类的 closeEvent 处理函数
         super().closeEvent(event)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+歌曲列表的模型和绘制代理。
+
+选歌界面不再为每首歌创建一个 QPushButton，而是用 SongListModel (QAbstractListModel) 保存
+每首歌的显示状态，由 QListView 只绘制可见的行：几千首歌时控件数量、布局时间和内存都与
+可见行数有关，与歌曲总数无关。SongButtonDelegate 借用隐藏的 QPushButton#songButton
+作为样式模板，用当前样式 (包括 style.qss 中按 unlocked/unlockable 属性区分的规则和
+:hover/:pressed 状态) 把每一行画成与原来完全相同的按钮。
+"""
+
+import sys
+from bisect import bisect_right
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt
+from PyQt6.QtWidgets import QPushButton, QStyle, QStyledItemDelegate, QStyleOptionButton
+
+SONG_BUTTON_SIZE = QSize(250, 60) # 每首歌按钮的大小 (与原来的固定按钮一致)
+
+SongIdRole = Qt.ItemDataRole.UserRole + 1 # 歌曲 ID
+UnlockedRole = Qt.ItemDataRole.UserRole + 2 # 是否已解锁
+UnlockableRole = Qt.ItemDataRole.UserRole + 3 # 星星是否足够解锁
+
+
+class SongListModel(QAbstractListModel):
+    """
+    歌曲列表模型：每行一首歌。
+
+    每行的显示状态 (文本、是否已解锁、星星是否足够解锁) 在第一次被读取时计算并缓存；
+    进度变化时只重新计算可能改变的行 (解锁状态变了的歌曲，以及解锁要求在新旧星星数之间的歌曲)，
+    真正改变的行发出 dataChanged，开销与变化的歌曲数量成正比。
+
+    set_filter() 只显示一部分歌曲 (例如搜索结果，按给定的顺序)；下面的 "行" 都是歌曲在完整列表中的位置，
+    模型索引的行号是它在当前显示的列表中的位置。
+
+    参数:
+        songs (list): 歌曲数据列表 (缺少 ID 或 ID 重复的条目被跳过)。
+        user_progress (dict): 用户进度 ({"total_stars", "unlocked_song_ids"})。
+        score_aggregates (ScoreAggregates, optional): 得分统计，显示在已解锁歌曲的提示中。
+    """
+
+    def __init__(self, songs, user_progress, score_aggregates=None, parent=None):
+        super().__init__(parent)
+        self.score_aggregates = score_aggregates
+        self._songs = []
+        self._rows = {} # 歌曲 ID -> 行号
+        for song_data in songs:
+            song_id = song_data.get("id")
+            if not song_id or song_id in self._rows:
+                print(f"Warning: Skipping song data with missing or duplicate ID: {song_data}")
+                continue
+            self._rows[song_id] = len(self._songs)
+            self._songs.append(song_data)
+        self._states = [None] * len(self._songs) # 行号 -> 缓存的显示状态 (见 _compute_state)，None 表示尚未计算
+        self._visible = None # 显示的行号列表 (按显示顺序)，None 表示显示全部歌曲
+        self._visible_positions = None # 行号 -> 在显示列表中的位置
+        self._stars = user_progress.get("total_stars", 0)
+        self._unlocked = set(user_progress.get("unlocked_song_ids", []))
+
+        # 按解锁所需星星排序，星星数变化时用二分查找找出 "能否解锁" 改变了的歌曲
+        thresholds = sorted((self.unlock_stars(song_data), row) for row, song_data in enumerate(self._songs))
+        self._unlock_thresholds = [stars for stars, _ in thresholds]
+        self._threshold_rows = [row for _, row in thresholds]
+
+    @staticmethod
+    def unlock_stars(song_data):
+        """解锁所需的星星数量，没有指定时为最大整数 (表示不可解锁)。"""
+        return song_data.get("unlock_stars_required", sys.maxsize)
+
+    @property
+    def total_stars(self):
+        """当前显示的星星数。"""
+        return self._stars
+
+    def song(self, song_id):
+        """返回歌曲数据，不存在时返回 None。"""
+        row = self._rows.get(song_id)
+        return self._songs[row] if row is not None else None
+
+    def index_of(self, song_id):
+        """返回歌曲所在行的索引，不存在或没有显示时返回无效索引。"""
+        position = self._position(self._rows.get(song_id))
+        return self.index(position, 0) if position is not None else QModelIndex()
+
+    def is_unlocked(self, song_id):
+        return song_id in self._unlocked
+
+    @property
+    def song_count(self):
+        """歌曲总数 (不受 set_filter 影响)。"""
+        return len(self._songs)
+
+    def set_filter(self, song_ids):
+        """
+        只显示给定的歌曲 (按给定的顺序，不存在的 ID 被忽略)；song_ids 为 None 时显示全部歌曲。
+
+        视图只重新绘制可见的行，与歌曲总数无关。
+        """
+        self.beginResetModel()
+        if song_ids is None:
+            self._visible = self._visible_positions = None
+        else:
+            self._visible = [row for row in map(self._rows.get, song_ids) if row is not None]
+            self._visible_positions = {row: position for position, row in enumerate(self._visible)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._songs) if self._visible is None else len(self._visible)
+
+    def flags(self, index):
+        row = self._row(index)
+        if row is None:
+            return Qt.ItemFlag.NoItemFlags
+        _, is_unlocked, can_unlock_now = self._state(row)
+        # 解锁歌曲和星星足够的锁定歌曲可以点击，其余禁用 (仍然显示提示)
+        return Qt.ItemFlag.ItemIsEnabled if is_unlocked or can_unlock_now else Qt.ItemFlag.NoItemFlags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        row = self._row(index)
+        if row is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._state(row)[0]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._tooltip(row)
+        if role == SongIdRole:
+            return self._songs[row]["id"]
+        if role == UnlockedRole:
+            return self._state(row)[1]
+        if role == UnlockableRole:
+            return self._state(row)[2]
+        return None
+
+    def set_progress(self, user_progress):
+        """
+        按新的进度更新显示状态。
+
+        返回:
+            int: 显示状态改变了的行数。
+        """
+        old_stars, old_unlocked = self._stars, self._unlocked
+        self._stars = user_progress.get("total_stars", 0)
+        self._unlocked = set(user_progress.get("unlocked_song_ids", []))
+        low, high = sorted((old_stars, self._stars))
+        rows = {self._rows[song_id] for song_id in old_unlocked ^ self._unlocked if song_id in self._rows}
+        rows.update(self._threshold_rows[bisect_right(self._unlock_thresholds, low):
+                                         bisect_right(self._unlock_thresholds, high)])
+        changed = 0
+        for row in rows:
+            old_state = self._states[row]
+            if old_state is None: # 还没有显示过，显示时再计算
+                continue
+            self._states[row] = None
+            if self._state(row) != old_state:
+                changed += 1
+                position = self._position(row)
+                if position is not None:
+                    index = self.index(position, 0)
+                    self.dataChanged.emit(index, index)
+        return changed
+
+    def _row(self, index):
+        """模型索引对应的行号 (歌曲在完整列表中的位置)，无效时返回 None。"""
+        if not index.isValid():
+            return None
+        position = index.row()
+        if self._visible is None:
+            return position if 0 <= position < len(self._songs) else None
+        return self._visible[position] if 0 <= position < len(self._visible) else None
+
+    def _position(self, row):
+        """行号在当前显示列表中的位置，没有显示时返回 None。"""
+        if row is None or self._visible is None:
+            return row
+        return self._visible_positions.get(row)
+
+    def _state(self, row):
+        state = self._states[row]
+        if state is None:
+            state = self._states[row] = self._compute_state(self._songs[row])
+        return state
+
+    def _compute_state(self, song_data):
+        """
+        根据当前进度计算一首歌的显示状态。
+
+        返回:
+            tuple: (按钮文本, 是否已解锁, 星星是否足够解锁)
+        """
+        song_id = song_data["id"]
+        song_title = song_data.get("title", song_id) # 获取歌曲标题，如果没有则使用 ID
+        is_unlocked = song_id in self._unlocked # 判断歌曲是否已解锁
+        unlock_stars = self.unlock_stars(song_data)
+        can_unlock_now = self._stars >= unlock_stars # 判断用户星星是否足够解锁
+
+        # 构建按钮显示的文本
+        button_text = song_title
+        if not is_unlocked and unlock_stars != sys.maxsize: # 如果锁定且需要星星解锁
+            button_text = f"{song_title} (需要 ⭐ {unlock_stars})"
+        elif not is_unlocked and unlock_stars == sys.maxsize: # 如果锁定且不可用（不需要星星）
+            button_text = f"{song_title} (锁定)" # 指示锁定但没有星星要求
+        return button_text, is_unlocked, can_unlock_now
+
+    def _tooltip(self, row):
+        """按当前进度生成提示 (显示时才生成，星星数和得分统计变化时不需要更新模型)。"""
+        song_data = self._songs[row]
+        song_id = song_data["id"]
+        song_title = song_data.get("title", song_id)
+        _, is_unlocked, can_unlock_now = self._state(row)
+        unlock_stars = self.unlock_stars(song_data)
+        if is_unlocked:
+            tooltip = f"点击开始 {song_title}"
+            # 练习过的歌曲附带得分统计 (直接读取统计结果，不扫描历史)
+            song_stats = self.score_aggregates.song(song_id) if self.score_aggregates is not None else None
+            if song_stats is not None:
+                tooltip += (f"\n最好成绩 ⭐ {song_stats.best_total}，练习 {song_stats.count} 次，"
+                            f"平均每句 ⭐ {song_stats.mean:.1f}")
+            return tooltip
+        if can_unlock_now: # 如果星星足够解锁
+            return f"点击解锁这首歌！需要 ⭐ {unlock_stars}"
+        if unlock_stars != sys.maxsize:
+            return f"需要 ⭐ {unlock_stars} 颗星星解锁。您还差 ⭐ {max(0, unlock_stars - self._stars)} 颗。"
+        return "这首歌暂时无法解锁。"
+
+
+class SongButtonDelegate(QStyledItemDelegate):
+    """
+    把每一行画成 QPushButton#songButton 的代理。
+
+    每种状态组合 (unlocked, unlockable) 有一个隐藏的模板按钮，设置了与原来相同的对象名称和动态属性，
+    所以样式表规则照常生效；绘制时只是用模板按钮的样式和字体画一个 CE_PushButton。
+
+    参数:
+        parent (QWidget): 模板按钮的父控件 (选歌界面)，样式表由它继承。
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self._parent_widget = parent
+        self._templates = {} # (unlocked, unlockable) -> 隐藏的模板按钮
+        self.pressed_row = -1 # 鼠标按下的行 (绘制 :pressed 状态)
+
+    def sizeHint(self, option, index):
+        return SONG_BUTTON_SIZE
+
+    def paint(self, painter, option, index):
+        is_unlocked, can_unlock_now = bool(index.data(UnlockedRole)), bool(index.data(UnlockableRole))
+        template = self._template(is_unlocked, can_unlock_now)
+
+        button_option = QStyleOptionButton()
+        button_option.initFrom(template)
+        button_option.rect = QRect(option.rect.topLeft(), SONG_BUTTON_SIZE)
+        button_option.rect.moveCenter(option.rect.center())
+        button_option.text = index.data(Qt.ItemDataRole.DisplayRole) or ""
+        button_option.state = QStyle.StateFlag.State_None
+        if index.flags() & Qt.ItemFlag.ItemIsEnabled:
+            button_option.state |= QStyle.StateFlag.State_Enabled
+            if option.state & QStyle.StateFlag.State_MouseOver:
+                button_option.state |= QStyle.StateFlag.State_MouseOver
+            button_option.state |= QStyle.StateFlag.State_Sunken if index.row() == self.pressed_row \
+                else QStyle.StateFlag.State_Raised
+
+        painter.save()
+        painter.setFont(template.font())
+        template.style().drawControl(QStyle.ControlElement.CE_PushButton, button_option, painter, template)
+        painter.restore()
+
+    def refresh_style(self):
+        """样式表改变后重新应用模板按钮的样式。"""
+        for template in self._templates.values():
+            template.style().unpolish(template)
+            template.style().polish(template)
+
+    def _template(self, is_unlocked, can_unlock_now):
+        key = (is_unlocked, can_unlock_now)
+        template = self._templates.get(key)
+        if template is None:
+            template = QPushButton(self._parent_widget)
+            template.setObjectName("songButton") # 与原来的按钮相同，QSS 规则照常匹配
+            template.setFixedSize(SONG_BUTTON_SIZE)
+            template.setProperty("unlocked", is_unlocked)
+            template.setProperty("unlockable", can_unlock_now)
+            template.hide()
+            template.ensurePolished()
+            self._templates[key] = template
+        return template
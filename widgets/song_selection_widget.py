@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 import sys
 # Import QApplication for testing
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QLabel, QApplication, QFrame, QMessageBox
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QApplication, QFrame, QMessageBox, QListView,
+                             QAbstractItemView, QLineEdit)
 # Import QIcon if you are using icons for buttons (not in current style, but good practice)
 # Import QUrl, QStandardPaths if needed, but seems not used in this widget directly
-from PyQt6.QtCore import Qt, pyqtSignal, QUrl, QStandardPaths # Keep QUrl, QStandardPaths just in case
+from PyQt6.QtCore import Qt, pyqtSignal, QUrl, QStandardPaths, QEvent # Keep QUrl, QStandardPaths just in case
+
+from audio.analysis_worker import run_in_background
+from catalog.search import SongSearchIndex, song_lyrics_text
+from widgets.song_list import (SONG_BUTTON_SIZE, SongButtonDelegate, SongListModel, SongIdRole, UnlockableRole,
+                               UnlockedRole)
 
 
 class SongSelectionWidget(QWidget):
@@ -16,9 +22,11 @@ class SongSelectionWidget(QWidget):
     # 定义信号
     song_selected = pyqtSignal(str) # 选中歌曲时发出信号 (参数为歌曲 ID)
     try_unlock_song_signal = pyqtSignal(str) # 用户尝试解锁歌曲时发出信号 (参数为歌曲 ID)
+    song_hovered = pyqtSignal(str) # 鼠标移到已解锁歌曲按钮上时发出信号 (参数为歌曲 ID，用于提前在后台解码歌曲音频)
+    _search_index_built = pyqtSignal(object, object) # 后台准备的搜索数据 (新建立的 SongSearchIndex 或 None、歌曲 ID -> 歌词)
 
 
-    def __init__(self, songs_data=None, user_progress=None, parent=None):
+    def __init__(self, songs_data=None, user_progress=None, parent=None, score_aggregates=None):
         """
         构造函数，初始化歌曲选择界面的 UI。
 
@@ -26,6 +34,7 @@ class SongSelectionWidget(QWidget):
             songs_data (list, optional): 歌曲数据列表. Defaults to None.
             user_progress (dict, optional): 用户进度数据字典. Defaults to None.
             parent (QWidget, optional): 父控件. Defaults to None.
+            score_aggregates (ScoreAggregates, optional): 每首歌的得分统计，显示在已解锁歌曲的提示中. Defaults to None.
         """
         super().__init__(parent)
 
@@ -76,111 +85,141 @@ class SongSelectionWidget(QWidget):
         # 样式由 QSS 控制
         layout.addWidget(self.stars_display_label)
 
-        # 创建一个容器控件来存放歌曲按钮
-        self.songs_container_widget = QWidget()
-        self.songs_layout = QVBoxLayout(self.songs_container_widget) # 容器内使用垂直布局
-        self.songs_layout.setAlignment(Qt.AlignmentFlag.AlignCenter) # 容器内的按钮居中对齐
-        self.songs_layout.setContentsMargins(0,0,0,0) # 移除容器的默认边距
-        self.songs_layout.setSpacing(15) # 按钮之间的间距
-        layout.addWidget(self.songs_container_widget) # 将容器添加到主布局
-
-        # 初次填充歌曲按钮
-        self._populate_song_buttons()
+        # 搜索框：在后台建立的索引中按歌名、主题和歌词搜索，列表只显示结果 (索引建立好之前不可用)
+        self.search_index = None
+        self.search_edit = QLineEdit()
+        self.search_edit.setObjectName("songSearchEdit") # 设置对象名称用于 QSS
+        self.search_edit.setPlaceholderText("正在准备搜索…")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setEnabled(False)
+        self.search_edit.textChanged.connect(self._on_search_text_changed)
+        self._search_index_built.connect(self._on_search_index_built)
+        layout.addWidget(self.search_edit, 0, Qt.AlignmentFlag.AlignHCenter)
+
+        # 歌曲列表：模型保存每首歌的显示状态，视图只绘制可见的行 (代理把每一行画成原来的歌曲按钮)
+        self.song_model = SongListModel(self.songs, self.user_progress, score_aggregates, self)
+        self.song_list_view = QListView()
+        self.song_list_view.setObjectName("songListView") # 设置对象名称用于 QSS
+        self.song_list_view.setModel(self.song_model)
+        self.song_delegate = SongButtonDelegate(self)
+        self.song_list_view.setItemDelegate(self.song_delegate)
+        self.song_list_view.setUniformItemSizes(True) # 所有行一样高，不需要逐行测量
+        # 分批布局：显示全部歌曲或搜索结果改变时，每次事件循环只布局一批行，按键和首次显示不必等几千行布局完
+        self.song_list_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.song_list_view.setBatchSize(1000)
+        self.song_list_view.setSpacing(15 // 2) # 行与行之间的间距 (两侧各一半，与原来按钮的间距一致)
+        self.song_list_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.song_list_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel) # 平滑滚动
+        self.song_list_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.song_list_view.setFrameShape(QFrame.Shape.NoFrame)
+        self.song_list_view.viewport().setAutoFillBackground(False) # 透出选歌界面的背景
+        self.song_list_view.setMouseTracking(True) # 悬停时发出 entered 信号
+        # 宽度刚好容纳按钮、间距和滚动条，按钮在界面中居中
+        self.song_list_view.setFixedWidth(SONG_BUTTON_SIZE.width() + 2 * self.song_list_view.spacing()
+                                          + self.song_list_view.verticalScrollBar().sizeHint().width())
+        self.song_list_view.clicked.connect(self._on_song_clicked)
+        self.song_list_view.entered.connect(self._on_song_entered)
+        self.song_list_view.viewport().installEventFilter(self) # 绘制按钮的按下状态
+        layout.addWidget(self.song_list_view, 1, Qt.AlignmentFlag.AlignHCenter) # 将列表添加到主布局
+        self.search_edit.setFixedWidth(self.song_list_view.width())
+
+        # 搜索没有结果时的提示 (代替列表显示)
+        self.no_results_label = QLabel("没有找到这样的歌曲。")
+        self.no_results_label.setObjectName("noSearchResultsLabel") # 设置对象名称用于 QSS
+        self.no_results_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.no_results_label.hide()
+        layout.addWidget(self.no_results_label, 1)
 
-        # 在底部添加弹性空间，将内容推向中心或顶部
-        layout.addStretch()
+        # 如果没有歌曲数据，显示提示信息
+        if self.song_model.rowCount() == 0:
+             no_songs_label = QLabel("没有可用的歌曲。")
+             no_songs_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+             no_songs_label.setStyleSheet("font-size: 18px; color: #888;") # 保留一点基础样式
+             layout.addWidget(no_songs_label)
+             self.song_list_view.hide()
+             self.search_edit.hide()
+             layout.addStretch()
 
         self.setLayout(layout) # 设置主布局
 
 
-    def _populate_song_buttons(self):
-        """清除现有按钮，并根据当前歌曲数据和用户进度重新创建按钮。"""
-        # 移除所有旧的歌曲按钮
-        while self.songs_layout.count():
-            item = self.songs_layout.takeAt(0) # 取出布局中的第一个项目
-            widget = item.widget() # 获取项目中的控件 (按钮)
-            if widget:
-                widget.deleteLater() # 安排删除控件
-
-        self.song_buttons = {} # 重置歌曲 ID 到按钮对象的映射字典
+    def build_search_index(self, song_reader=None):
+        """
+        在后台建立搜索索引；已经有索引时 (例如歌曲目录变了) 增量更新，只重新索引内容变了的歌曲。
 
-        # 如果没有歌曲数据，显示提示信息
-        if not self.songs:
-             no_songs_label = QLabel("没有可用的歌曲。")
-             no_songs_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-             no_songs_label.setStyleSheet("font-size: 18px; color: #888;") # 保留一点基础样式
-             self.songs_layout.addWidget(no_songs_label)
+        参数:
+            song_reader (callable, optional): song_reader(歌曲 ID) -> 完整歌曲数据，歌曲数据只是目录条目
+                (不含歌词) 时用来读取歌词，在后台线程中调用 (例如 SongCatalog.read_song)。
+        """
+        run_in_background(self._prepare_search_index, list(self.songs), song_reader, self.search_index is None)
+
+
+    def _prepare_search_index(self, songs, song_reader, build):
+        """在后台线程中读取每首歌的歌词；还没有索引时同时建立索引 (新的索引对象只在这个线程中使用)。"""
+        lyrics = {}
+        for song_data in songs:
+            song_id = song_data.get("id")
+            full_song = song_reader(song_id) if song_reader is not None and song_id else None
+            lyrics[song_id] = song_lyrics_text(full_song if full_song is not None else song_data)
+        index = None
+        if build:
+            index = SongSearchIndex()
+            index.sync(songs, lambda song_data: lyrics.get(song_data["id"], ""))
+        self._search_index_built.emit(index, lyrics)
+
+
+    def _on_search_index_built(self, index, lyrics):
+        """槽函数：后台的搜索数据准备好了，启用搜索框。"""
+        if index is not None:
+            self.search_index = index
         else:
-            # 获取用户已解锁的歌曲 ID 列表和当前总星星数
-            unlocked_ids = self.user_progress.get("unlocked_song_ids", [])
-            current_stars = self.user_progress.get("total_stars", 0)
-
-            # 遍历歌曲数据，为每首歌曲创建按钮
-            for song_data in self.songs:
-                 song_id = song_data.get("id") # 安全获取歌曲 ID
-                 if not song_id: # 如果歌曲数据无效（没有 ID），跳过
-                      print(f"Warning: Skipping song data with missing ID: {song_data}")
-                      continue
-
-                 song_title = song_data.get("title", song_id) # 获取歌曲标题，如果没有则使用 ID
-                 is_unlocked = song_id in unlocked_ids # 判断歌曲是否已解锁
-                 # 获取解锁所需的星星数量，如果没有指定则设为最大整数（表示不可解锁）
-                 unlock_stars = song_data.get("unlock_stars_required", sys.maxsize)
-                 can_unlock_now = current_stars >= unlock_stars # 判断用户星星是否足够解锁
-
-                 # 构建按钮显示的文本
-                 button_text = song_title
-                 if not is_unlocked and unlock_stars != sys.maxsize: # 如果锁定且需要星星解锁
-                     button_text = f"{song_title} (需要 ⭐ {unlock_stars})"
-                 elif not is_unlocked and unlock_stars == sys.maxsize: # 如果锁定且不可用（不需要星星）
-                     button_text = f"{song_title} (锁定)" # 指示锁定但没有星星要求
-
-                 button = QPushButton(button_text) # 创建按钮
-                 button.setObjectName("songButton") # 设置对象名称用于 QSS
-                 button.setFixedSize(250, 60) # 固定按钮大小
-
-                 # 断开按钮之前可能连接的所有信号，防止重复连接
-                 try: button.clicked.disconnect()
-                 except (TypeError, RuntimeError): pass # 如果没有连接或信号已断开则忽略异常
-
-                 # 设置动态属性，用于 QSS 根据状态改变样式
-                 button.setProperty("unlocked", is_unlocked)
-                 button.setProperty("unlockable", can_unlock_now)
-                 button.style().polish(button) # 刷新样式以立即应用动态属性变化
-
-
-                 if is_unlocked:
-                     button.setEnabled(True) # 解锁歌曲按钮启用
-                     button.clicked.connect(self._on_song_button_clicked) # 连接点击信号到选择歌曲槽函数
-                     button.setToolTip(f"点击开始 {song_title}") # 设置鼠标悬停提示
-
-                 else: # 锁定歌曲
-                     if can_unlock_now: # 如果星星足够解锁
-                         button.setEnabled(True) # 启用按钮
-                         # 连接点击信号到尝试解锁槽函数
-                         button.clicked.connect(lambda checked, song_id=song_id: self._try_unlock_song(song_id))
-                         button.setToolTip(f"点击解锁这首歌！需要 ⭐ {unlock_stars}")
-                     else: # 如果星星不足或不可解锁
-                         button.setEnabled(False) # 禁用按钮
-                         # 设置鼠标悬停提示
-                         if unlock_stars != sys.maxsize:
-                              button.setToolTip(f"需要 ⭐ {unlock_stars} 颗星星解锁。您还差 ⭐ {max(0, unlock_stars - current_stars)} 颗。")
-                         else:
-                              button.setToolTip("这首歌暂时无法解锁。")
-
-
-                 button.setProperty("song_id", song_id) # 使用属性存储歌曲 ID
-                 self.songs_layout.addWidget(button) # 将按钮添加到容器布局
-                 self.song_buttons[song_id] = button # 存储按钮引用
-
-
-    def _on_song_button_clicked(self):
-        """槽函数：处理点击已解锁歌曲按钮的事件。"""
-        sender_button = self.sender() # 获取发送信号的按钮对象
-        song_id = sender_button.property("song_id") # 获取按钮存储的歌曲 ID
-
-        print(f"选中已解锁歌曲: ID='{song_id}'")
-        self.song_selected.emit(song_id) # 触发 song_selected 信号，传递歌曲 ID
+            changed = self.search_index.sync(self.songs, lambda song_data: lyrics.get(song_data["id"], ""))
+            print(f"搜索索引已更新: {changed} 首歌曲变化。")
+        self.search_edit.setPlaceholderText("搜索歌名、主题或歌词")
+        self.search_edit.setEnabled(True)
+        if self.search_edit.text():
+            self._on_search_text_changed(self.search_edit.text())
+
+
+    def _on_search_text_changed(self, text):
+        """槽函数：搜索框内容改变时更新列表 (只显示搜索结果，按匹配程度排序；清空时显示全部歌曲)。"""
+        if self.search_index is None:
+            return
+        self.song_delegate.pressed_row = -1
+        song_ids = self.search_index.search(text) if text.strip() else None
+        self.song_model.set_filter(song_ids)
+        has_results = song_ids is None or bool(song_ids)
+        self.song_list_view.setVisible(has_results)
+        self.no_results_label.setVisible(not has_results)
+
+
+    def _on_song_clicked(self, index):
+        """槽函数：处理点击歌曲的事件 (已解锁的歌曲开始学习，星星足够的锁定歌曲尝试解锁)。"""
+        song_id = index.data(SongIdRole)
+        if index.data(UnlockedRole):
+            print(f"选中已解锁歌曲: ID='{song_id}'")
+            self.song_selected.emit(song_id) # 触发 song_selected 信号，传递歌曲 ID
+        elif index.data(UnlockableRole):
+            self._try_unlock_song(song_id)
+
+
+    def _on_song_entered(self, index):
+        """槽函数：鼠标移到已解锁歌曲上时发出 song_hovered 信号 (提前在后台解码歌曲音频)。"""
+        if index.data(UnlockedRole):
+            self.song_hovered.emit(index.data(SongIdRole))
+
+
+    def eventFilter(self, watched, event):
+        """事件过滤器：记录列表中鼠标按下的行，用于绘制按钮的按下状态。"""
+        if watched is self.song_list_view.viewport():
+            if event.type() == QEvent.Type.MouseButtonPress and event.button() == Qt.MouseButton.LeftButton:
+                index = self.song_list_view.indexAt(event.position().toPoint())
+                self.song_delegate.pressed_row = index.row() if index.flags() & Qt.ItemFlag.ItemIsEnabled else -1
+                watched.update()
+            elif event.type() == QEvent.Type.MouseButtonRelease and self.song_delegate.pressed_row >= 0:
+                self.song_delegate.pressed_row = -1
+                watched.update()
+        return super().eventFilter(watched, event)
 
 
     def _try_unlock_song(self, song_id):
@@ -188,7 +227,7 @@ class SongSelectionWidget(QWidget):
         # 这个方法只会在按钮被启用（即 can_unlock_now 为 True）时触发
         print(f"尝试解锁歌曲 (通过按钮点击): {song_id}")
         # 在歌曲数据中查找对应的歌曲
-        song_data = next((s for s in self.songs if s.get("id") == song_id), None)
+        song_data = self.song_model.song(song_id)
 
         # 再次检查歌曲是否存在且当前是否锁定 (双重保险)
         if song_data and song_id not in self.user_progress.get("unlocked_song_ids", []):
@@ -210,13 +249,17 @@ class SongSelectionWidget(QWidget):
         """
         根据新的用户进度数据更新歌曲选择界面的显示。
 
-        这个方法由主窗口调用，例如在用户星星数变化或歌曲解锁后。
+        这个方法由主窗口调用，例如在用户星星数变化或歌曲解锁后。列表不会重建，
+        只有显示状态变了的行会被重绘，开销与变化的歌曲数量成正比。
         """
         self.user_progress = user_progress # 更新用户进度数据
         # 更新星星显示标签
         self.stars_display_label.setText(f"你现在有 ⭐ {self.user_progress.get('total_stars', 0)} 颗星星！")
-        # 根据新的进度重新填充和更新歌曲按钮状态
-        self._populate_song_buttons()
+
+        # 模型只重新计算状态可能改变的歌曲，视图只重绘其中可见的行
+        updated = self.song_model.set_progress(self.user_progress)
+        if updated:
+            print(f"更新了 {updated} 首歌曲的显示状态。")
 
 
 # 如果直接运行此文件进行测试
@@ -239,6 +282,7 @@ if __name__ == '__main__':
     QLabel#selectionStarsLabel {
         font-size: 18px; color: #FFD700;
     }
+    QListView#songListView { border: none; }
     QPushButton#songButton {
         font-size: 18px; padding: 10px; border-radius: 8px; border: none; min-width: 200px; font-weight: bold;
     }
@@ -289,6 +333,7 @@ if __name__ == '__main__':
     # 创建 SongSelectionWidget 实例并显示
     song_select_widget = SongSelectionWidget(songs_data=test_songs_data, user_progress=test_user_progress)
     song_select_widget.show()
+    song_select_widget.build_search_index() # 测试数据没有歌词，只按歌名和主题搜索
 
     # 运行应用事件循环
     exit_code = app.exec()